@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 from database import get_db
+from services.pax_services import get_pax_price_map, resolve_pax_services
 import json
+import csv
+import io
+import base64
 
 admin_bookings_bp = Blueprint('admin_bookings', __name__)
 
@@ -25,38 +29,106 @@ def admin_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-@admin_bookings_bp.route('/bookings', methods=['GET'])
-@admin_required
-def get_all_bookings():
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_COLUMNS = [
+    'id', 'flight_number', 'created_at', 'user_id', 'user_nickname', 'user_virtual_id',
+    'seat', 'serve_class', 'passenger_name', 'pax_service', 'pax_total', 'valid', 'note',
+    'departure', 'arrival', 'flight_datetime'
+]
+
+def encode_cursor(created_at, booking_id):
+    raw = f'{created_at}:{booking_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
 
-    flight_filter = request.args.get('flight_number', '')
+def decode_cursor(cursor_value):
+    padded = cursor_value + '=' * (-len(cursor_value) % 4)
+    created_at, booking_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':', 1)
+    return int(created_at), booking_id
 
-    query = '''
-            SELECT b.*, u.nickname, u.virtual_id, s.flight_number as flight_number_full
+def build_bookings_filters(args):
+    """Translates query string filters into a WHERE clause; raises ValueError on bad input"""
+    conditions = []
+    params = []
+
+    flight_filter = args.get('flight_number', '')
+    if flight_filter:
+        conditions.append('b.flight_number LIKE %s')
+        params.append(f'%{flight_filter}%')
+
+    valid = args.get('valid')
+    if valid not in (None, ''):
+        conditions.append('b.valid = %s')
+        params.append(1 if valid.lower() in ('1', 'true') else 0)
+
+    serve_class = args.get('serve_class')
+    if serve_class:
+        conditions.append('b.serve_class = %s')
+        params.append(serve_class)
+
+    range_filters = [
+        ('created_from', 'b.created_at >= %s'),
+        ('created_to', 'b.created_at < %s'),
+        ('flight_from', 's.datetime >= %s'),
+        ('flight_to', 's.datetime < %s')
+    ]
+    for arg_name, condition in range_filters:
+        value = args.get(arg_name)
+        if value not in (None, ''):
+            conditions.append(condition)
+            params.append(int(value))
+
+    return conditions, params
+
+def bookings_select(columns, conditions):
+    query = f'''
+            SELECT {columns}
             FROM bookings b
                      LEFT JOIN users u ON b.user_id = u.id
                      LEFT JOIN schedule s ON b.flight_number = s.flight_number
-            WHERE 1 = 1
             '''
-    params = []
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    return query
 
-    if flight_filter:
-        query += ' AND b.flight_number LIKE %s'
-        params.append(f'%{flight_filter}%')
+@admin_bookings_bp.route('/bookings', methods=['GET'])
+@admin_required
+def get_all_bookings():
+    try:
+        conditions, params = build_bookings_filters(request.args)
+        limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
 
-    query += ' ORDER BY b.created_at DESC'
+        cursor_value = request.args.get('cursor')
+        if cursor_value:
+            created_at, last_id = decode_cursor(cursor_value)
+            conditions.append('(b.created_at < %s OR (b.created_at = %s AND b.id < %s))')
+            params.extend([created_at, created_at, last_id])
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid filter or cursor'}), 400
+
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+
+    query = bookings_select('''b.id, b.flight_number, b.created_at, b.user_id, b.seat, b.serve_class,
+                   b.passenger_name, b.valid, b.note, u.nickname, u.virtual_id''', conditions)
+    query += ' ORDER BY b.created_at DESC, b.id DESC LIMIT %s'
+    params.append(limit + 1)
 
     cursor.execute(query, params)
     bookings = cursor.fetchall()
 
+    has_more = len(bookings) > limit
+    bookings = bookings[:limit]
+
     result = []
     for booking in bookings:
         result.append({
             'id': booking['id'],
             'flight_number': booking['flight_number'],
             'created_at': booking['created_at'],
+            'user_id': booking['user_id'],
             'user_nickname': booking['nickname'],
             'user_virtual_id': booking['virtual_id'],
             'seat': booking['seat'],
@@ -66,7 +138,96 @@ def get_all_bookings():
             'note': booking['note']
         })
 
-    return jsonify(result)
+    next_cursor = None
+    if has_more and bookings:
+        next_cursor = encode_cursor(bookings[-1]['created_at'], bookings[-1]['id'])
+
+    return jsonify({
+        'bookings': result,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'limit': limit
+    })
+
+def export_row(booking, price_map):
+    pax_total = sum(float(service['price'] or 0) for service in resolve_pax_services(booking['pax_service'], price_map))
+    return {
+        'id': booking['id'],
+        'flight_number': booking['flight_number'],
+        'created_at': booking['created_at'],
+        'user_id': booking['user_id'],
+        'user_nickname': booking['nickname'],
+        'user_virtual_id': booking['virtual_id'],
+        'seat': booking['seat'],
+        'serve_class': booking['serve_class'],
+        'passenger_name': booking['passenger_name'],
+        'pax_service': booking['pax_service'],
+        'pax_total': round(pax_total, 2),
+        'valid': bool(booking['valid']),
+        'note': booking['note'],
+        'departure': booking['departure'],
+        'arrival': booking['arrival'],
+        'flight_datetime': booking['flight_datetime']
+    }
+
+def iter_export_rows(conditions, params):
+    price_map = get_pax_price_map()
+
+    # Dedicated unbuffered cursor: rows are pulled from the server in chunks
+    cursor = get_db().cursor(dictionary=True, buffered=False)
+    query = bookings_select('''b.id, b.flight_number, b.created_at, b.user_id, b.seat, b.serve_class,
+                   b.passenger_name, b.pax_service, b.valid, b.note, u.nickname, u.virtual_id,
+                   s.departure, s.arrival, s.datetime as flight_datetime''', conditions)
+    query += ' ORDER BY b.created_at DESC, b.id DESC'
+
+    cursor.execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            yield [export_row(row, price_map) for row in rows]
+    finally:
+        cursor.close()
+
+def generate_ndjson(conditions, params):
+    for chunk in iter_export_rows(conditions, params):
+        yield ''.join(json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in chunk)
+
+def generate_csv(conditions, params):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for chunk in iter_export_rows(conditions, params):
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+@admin_bookings_bp.route('/bookings/export', methods=['GET'])
+@admin_required
+def export_bookings():
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Unsupported export format'}), 400
+
+    try:
+        conditions, params = build_bookings_filters(request.args)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid filter'}), 400
+
+    if export_format == 'csv':
+        generator = generate_csv(conditions, params)
+        mimetype = 'text/csv'
+    else:
+        generator = generate_ndjson(conditions, params)
+        mimetype = 'application/x-ndjson'
+
+    response = Response(stream_with_context(generator), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=bookings.{export_format}'
+    return response
 
 @admin_bookings_bp.route('/bookings/<booking_id>', methods=['GET'])
 @admin_required
@@ -92,55 +253,11 @@ def get_booking_detail(booking_id):
     if not booking:
         return jsonify({'error': 'Booking not found'}), 404
 
-    pax_services = []
-    pax_service_data = booking['pax_service']
-
-    if pax_service_data:
-        try:
-            if isinstance(pax_service_data, str) and ',' in pax_service_data:
-                service_names = [name.strip() for name in pax_service_data.split(',')]
-
-                for service_name in service_names:
-                    if service_name:
-                        cursor.execute(
-                            'SELECT name, price FROM pax_service WHERE name = %s',
-                            (service_name,)
-                        )
-                        pax_info = cursor.fetchone()
-
-                        if pax_info:
-                            pax_services.append({
-                                'name': pax_info['name'],
-                                'price': pax_info['price']
-                            })
-                        else:
-                            pax_services.append({
-                                'name': service_name,
-                                'price': 0
-                            })
-
-            elif isinstance(pax_service_data, str) and pax_service_data.strip():
-                service_name = pax_service_data.strip()
-                cursor.execute(
-                    'SELECT name, price FROM pax_service WHERE name = %s',
-                    (service_name,)
-                )
-                pax_info = cursor.fetchone()
-
-                if pax_info:
-                    pax_services.append({
-                        'name': pax_info['name'],
-                        'price': pax_info['price']
-                    })
-                else:
-                    pax_services.append({
-                        'name': service_name,
-                        'price': 0
-                    })
-
-        except Exception as e:
-            print(f"Error parsing pax_service: {e}")
-            pax_services = []
+    try:
+        pax_services = resolve_pax_services(booking['pax_service'])
+    except Exception as e:
+        print(f"Error parsing pax_service: {e}")
+        pax_services = []
 
     return jsonify({
         'id': booking['id'],
@@ -1,9 +1,75 @@
 from flask import Blueprint, request, jsonify, session
 from database import get_db
 from services.utils import login_required
+from services.user_stats import get_user_stats as load_user_stats, mark_user_stats_dirty
+import base64
+import threading
+import time
 
 admin_users_bp = Blueprint('admin_users', __name__)
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Totals are only a hint for the pager, so a slightly stale count is fine
+USER_COUNT_TTL = 60
+USER_COUNT_CACHE_SIZE = 256
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+def encode_cursor(user_id):
+    return base64.urlsafe_b64encode(str(user_id).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor_value):
+    padded = cursor_value + '=' * (-len(cursor_value) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode()).decode())
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_users_filters(search, group_filter, status_filter):
+    """Nickname prefix match (uses idx_users_nickname); numeric input also matches ids exactly"""
+    conditions = []
+    params = []
+
+    if search:
+        if search.isdigit():
+            conditions.append('(nickname LIKE %s OR virtual_id = %s OR social_id = %s)')
+            params.extend([escape_like(search) + '%', int(search), int(search)])
+        else:
+            conditions.append('nickname LIKE %s')
+            params.append(escape_like(search) + '%')
+
+    if group_filter:
+        conditions.append('user_group = %s')
+        params.append(group_filter)
+
+    if status_filter:
+        conditions.append('status = %s')
+        params.append(status_filter)
+
+    return conditions, params
+
+def count_users(cursor, conditions, params):
+    key = (tuple(conditions), tuple(params))
+    now = time.time()
+
+    cached = _count_cache.get(key)
+    if cached and now - cached[1] < USER_COUNT_TTL:
+        return cached[0]
+
+    query = 'SELECT COUNT(*) as total FROM users'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    cursor.execute(query, params)
+    total = cursor.fetchone()['total']
+
+    with _count_lock:
+        if len(_count_cache) >= USER_COUNT_CACHE_SIZE:
+            _count_cache.clear()
+        _count_cache[key] = (total, now)
+    return total
+
 @admin_users_bp.route('/users', methods=['GET'])
 @login_required
 def get_all_users():
@@ -19,12 +85,22 @@ def get_all_users():
     if not admin_user or admin_user['user_group'] not in ['HQ', 'STF']:
         return jsonify({"error": "Admin access required"}), 403
 
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    search = request.args.get('search', '')
+    per_page = min(max(request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    search = request.args.get('search', '').strip()
     group_filter = request.args.get('group', '')
     status_filter = request.args.get('status', '')
 
+    conditions, params = build_users_filters(search, group_filter, status_filter)
+    total = count_users(cursor, conditions, params)
+
+    cursor_value = request.args.get('cursor')
+    if cursor_value:
+        try:
+            conditions.append('id < %s')
+            params.append(decode_cursor(cursor_value))
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid cursor"}), 400
+
     query = '''
             SELECT id,
                    nickname,
@@ -37,38 +113,25 @@ def get_all_users():
                    status,
                    pending
             FROM users
-            WHERE 1 = 1
             '''
-    params = []
-
-    if search:
-        query += ' AND (nickname LIKE %s OR virtual_id LIKE %s)'
-        params.extend([f'%{search}%', f'%{search}%'])
-
-    if group_filter:
-        query += ' AND user_group = %s'
-        params.append(group_filter)
-
-    if status_filter:
-        query += ' AND status = %s'
-        params.append(status_filter)
-
-    count_query = f'SELECT COUNT(*) as total FROM ({query}) AS count_query'
-    cursor.execute(count_query, params)
-    total = cursor.fetchone()['total']
-
-    query += ' ORDER BY id DESC LIMIT %s OFFSET %s'
-    params.extend([per_page, (page - 1) * per_page])
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY id DESC LIMIT %s'
+    params.append(per_page + 1)
 
     cursor.execute(query, params)
     users = cursor.fetchall()
 
+    has_more = len(users) > per_page
+    users = users[:per_page]
+
     return jsonify({
         'users': users,
         'total': total,
-        'page': page,
         'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page
+        'total_pages': (total + per_page - 1) // per_page,
+        'next_cursor': encode_cursor(users[-1]['id']) if has_more else None,
+        'has_more': has_more
     })
 
 @admin_users_bp.route('/users/<int:user_id>', methods=['GET'])
@@ -86,10 +149,12 @@ def get_user_details(user_id):
     if not admin_user or admin_user['user_group'] not in ['HQ', 'STF']:
         return jsonify({"error": "Admin access required"}), 403
 
-    cursor.execute(
-        'SELECT * FROM users WHERE id = %s',
-        (user_id,)
-    )
+    cursor.execute('''
+        SELECT id, nickname, created_at, virtual_id, social_id, miles, bonuses, user_group,
+               subgroup, link, pfp_url AS pfp, metadata, pending, status
+        FROM users
+        WHERE id = %s
+    ''', (user_id,))
     user = cursor.fetchone()
 
     if not user:
@@ -117,7 +182,7 @@ def update_user(user_id):
         return jsonify({"error": "No data provided"}), 400
 
     cursor.execute(
-        'SELECT * FROM users WHERE id = %s',
+        'SELECT id FROM users WHERE id = %s',
         (user_id,)
     )
     current_user = cursor.fetchone()
@@ -149,6 +214,7 @@ def update_user(user_id):
             update_values
         )
         db.commit()
+        mark_user_stats_dirty()
 
         return jsonify({"message": "User updated successfully"}), 200
 
@@ -174,7 +240,7 @@ def delete_user(user_id):
         return jsonify({"error": "Cannot delete your own account"}), 400
 
     cursor.execute(
-        'SELECT * FROM users WHERE id = %s',
+        'SELECT id FROM users WHERE id = %s',
         (user_id,)
     )
     user = cursor.fetchone()
@@ -188,6 +254,7 @@ def delete_user(user_id):
         cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
 
         db.commit()
+        mark_user_stats_dirty()
         return jsonify({"message": "User deleted successfully"}), 200
 
     except Exception as e:
@@ -208,17 +275,6 @@ def get_user_stats():
     if not admin_user or admin_user['user_group'] not in ['HQ', 'STF']:
         return jsonify({"error": "Admin access required"}), 403
 
-    cursor.execute('''
-                   SELECT COUNT(*)                                        as total_users,
-                          COUNT(CASE WHEN status = 'active' THEN 1 END)   as active_users,
-                          COUNT(CASE WHEN status = 'inactive' THEN 1 END) as inactive_users,
-                          COUNT(CASE WHEN user_group = 'HQ' THEN 1 END)   as hq_users,
-                          COUNT(CASE WHEN user_group = 'STF' THEN 1 END)  as staff_users,
-                          COUNT(CASE WHEN user_group = 'PAX' THEN 1 END)  as passenger_users,
-                          SUM(miles)                                      as total_miles
-                   FROM users
-                   ''')
-    stats = cursor.fetchone()
-
-    return jsonify(stats)
+    force = request.args.get('refresh', 'false').lower() == 'true'
+    return jsonify(load_user_stats(force=force))
     
\ No newline at end of file
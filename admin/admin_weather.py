@@ -1,18 +1,48 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request, session, current_app, Response
 import requests
 import os
 import time
 import json
+import threading
 from datetime import datetime, timedelta
 from database import get_db
+from services.http_client import get_session, CircuitBreaker
+from services.metrics import registry
 
 admin_weather_bp = Blueprint('admin_weather', __name__)
 
 CHECKWX_API_KEY = os.getenv('CHECKWX_API_KEY', '2da1148c40ec422d965fe7757444d715')
 CHECKWX_API_URL = 'https://api.checkwx.com/metar'
+CHECKWX_TIMEOUT = (3.05, 10)
 
 CACHE_DURATION = 300
 MAX_CACHE_ENTRIES = 100
+# Expired rows stay servable (marked stale) for this long while they are revalidated
+MAX_STALE_AGE = 3600
+# Bump when the compact record layout below changes; older rows are re-normalized on read
+WEATHER_CACHE_FORMAT = 1
+
+CHECKWX_DAILY_QUOTA = int(os.getenv('CHECKWX_DAILY_QUOTA', 2000))
+
+checkwx_breaker = CircuitBreaker('checkwx', failure_threshold=5, reset_timeout=60)
+
+cache_hits = registry.counter('weather_cache_hits_total', 'Weather requests served from a fresh cache row')
+cache_misses = registry.counter('weather_cache_misses_total', 'Weather requests with no usable cache row')
+cache_stale = registry.counter('weather_cache_stale_total', 'Weather requests served from an expired cache row')
+upstream_requests = registry.counter('weather_upstream_requests_total', 'CheckWX calls by outcome', ('status',))
+upstream_latency = registry.histogram('weather_upstream_latency_seconds', 'CheckWX response time', ('status',))
+upstream_rejected = registry.counter('weather_upstream_rejected_total', 'CheckWX calls skipped by the circuit breaker')
+entry_age = registry.histogram(
+    'weather_cache_entry_age_seconds', 'Age of cache rows at the time they are served',
+    buckets=(30, 60, 120, 300, 600, 1800, 3600)
+)
+
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+class WeatherServiceUnavailable(Exception):
+    pass
 
 def check_admin_access():
     if 'user_id' not in session:
@@ -38,7 +68,7 @@ def cleanup_old_cache():
     cursor = db.cursor()
 
     current_time = int(time.time())
-    cursor.execute('DELETE FROM weather_cache WHERE expires_at < %s', (current_time,))
+    cursor.execute('DELETE FROM weather_cache WHERE expires_at < %s', (current_time - MAX_STALE_AGE,))
 
     cursor.execute('SELECT COUNT(*) FROM weather_cache')
     count_result = cursor.fetchone()
@@ -58,22 +88,60 @@ def cleanup_old_cache():
     db.commit()
 
 def get_cached_weather(icao_code):
-    """Получение данных из кэша"""
+    """Получение данных из кэша, включая устаревшие (stale) записи"""
     db = get_db()
     cursor = db.cursor(dictionary=True)
 
     current_time = int(time.time())
     cursor.execute(
-        'SELECT data FROM weather_cache WHERE icao_code = %s AND expires_at > %s',
-        (icao_code.upper(), current_time)
+        'SELECT data, expires_at FROM weather_cache WHERE icao_code = %s AND expires_at > %s',
+        (icao_code.upper(), current_time - MAX_STALE_AGE)
     )
 
-    result = cursor.fetchone()
-    if result:
-        return result['data']
-    return None
+    return cursor.fetchone()
+
+def _pick(source, *fields):
+    if not isinstance(source, dict):
+        return None
+    picked = {field: source.get(field) for field in fields if source.get(field) is not None}
+    return picked or None
+
+def compact_station(item):
+    """Keeps only the METAR fields the admin weather UI renders"""
+    return {
+        'icao': item.get('icao'),
+        'station': _pick(item.get('station'), 'name'),
+        'observed': item.get('observed'),
+        'flight_category': item.get('flight_category'),
+        'wind': _pick(item.get('wind'), 'degrees', 'speed_kts', 'gust_kts'),
+        'visibility': _pick(item.get('visibility'), 'meters', 'meters_text', 'miles'),
+        'clouds': [_pick(cloud, 'code', 'text', 'feet') for cloud in item.get('clouds') or []],
+        'conditions': [_pick(cond, 'code', 'text') for cond in item.get('conditions') or []],
+        'temperature': _pick(item.get('temperature'), 'celsius'),
+        'dewpoint': _pick(item.get('dewpoint'), 'celsius'),
+        'humidity': _pick(item.get('humidity'), 'percent'),
+        'barometer': _pick(item.get('barometer'), 'hpa', 'hg'),
+        'raw_text': item.get('raw_text')
+    }
 
-def set_cached_weather(icao_code, data):
+def build_cache_record(api_data, keep_raw=False):
+    record = {
+        'v': WEATHER_CACHE_FORMAT,
+        'results': api_data.get('results', 0),
+        'data': [compact_station(item) for item in api_data.get('data', []) if isinstance(item, dict)]
+    }
+    if keep_raw:
+        record['raw'] = api_data
+    return record
+
+def decode_cache_record(text):
+    record = json.loads(text)
+    if record.get('v') != WEATHER_CACHE_FORMAT:
+        # Legacy rows hold the full CheckWX response
+        record = build_cache_record(record)
+    return record
+
+def set_cached_weather(icao_code, record):
     db = get_db()
     cursor = db.cursor()
 
@@ -88,56 +156,171 @@ def set_cached_weather(icao_code, data):
         data = VALUES(data), 
         created_at = VALUES(created_at), 
         expires_at = VALUES(expires_at)
-    ''', (icao_code.upper(), json.dumps(data), current_time, expires_at))
+    ''', (icao_code.upper(), json.dumps(record, separators=(',', ':')), current_time, expires_at))
 
     db.commit()
 
 def fetch_weather_from_api(icao_code):
+    if not checkwx_breaker.allow_request():
+        upstream_rejected.inc()
+        raise WeatherServiceUnavailable('Weather service temporarily unavailable')
+
     headers = {
         'X-API-Key': CHECKWX_API_KEY
     }
 
     url = f"{CHECKWX_API_URL}/{icao_code}/decoded"
-    response = requests.get(url, headers=headers, timeout=10)
+    record_quota_usage()
+    started = time.perf_counter()
+    try:
+        response = get_session('checkwx').get(url, headers=headers, timeout=CHECKWX_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        status = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'connection_error'
+        upstream_requests.inc(status=status)
+        upstream_latency.observe(time.perf_counter() - started, status=status)
+        checkwx_breaker.record_failure()
+        raise
+
+    upstream_requests.inc(status=response.status_code)
+    upstream_latency.observe(time.perf_counter() - started, status=response.status_code)
 
     if response.status_code == 200:
+        checkwx_breaker.record_success()
         return response.json()
     elif response.status_code == 401:
+        checkwx_breaker.record_failure()
         raise Exception('Invalid API key')
     elif response.status_code == 404:
+        checkwx_breaker.record_success()
         raise Exception('Station not found')
     else:
+        checkwx_breaker.record_failure()
         raise Exception(f'Weather API error: {response.status_code}')
 
-@admin_weather_bp.route('/get/weather/<icao_code>', methods=['GET'])
-def get_weather(icao_code):
-    if not icao_code or len(icao_code) != 4:
-        return jsonify({'error': 'Invalid ICAO code'}), 400
-
+def record_quota_usage():
     try:
-        cleanup_old_cache()
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute('''
+            INSERT INTO weather_api_usage (day, calls)
+            VALUES (UTC_DATE(), 1)
+            ON DUPLICATE KEY UPDATE calls = calls + 1
+        ''')
+        db.commit()
+    except Exception as e:
+        print(f"Could not record weather API usage: {e}")
+
+def get_quota_usage(days=7):
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        'SELECT day, calls FROM weather_api_usage ORDER BY day DESC LIMIT %s',
+        (days,)
+    )
+    history = [{'day': str(row['day']), 'calls': row['calls']} for row in cursor.fetchall()]
 
-        cached_data = get_cached_weather(icao_code)
+    today = datetime.utcnow().date().isoformat()
+    used_today = next((row['calls'] for row in history if row['day'] == today), 0)
 
-        if cached_data:
-            data = json.loads(cached_data)
-            from_cache = True
-        else:
-            data = fetch_weather_from_api(icao_code)
-            from_cache = False
+    return {
+        'daily_quota': CHECKWX_DAILY_QUOTA,
+        'used_today': used_today,
+        'remaining_today': max(0, CHECKWX_DAILY_QUOTA - used_today),
+        'history': history
+    }
 
+def revalidate_weather(app, icao_code, keep_raw=False):
+    try:
+        with app.app_context():
+            data = fetch_weather_from_api(icao_code)
             if data.get('results', 0) > 0:
-                set_cached_weather(icao_code, data)
+                set_cached_weather(icao_code, build_cache_record(data, keep_raw))
+    except Exception as e:
+        print(f"Weather revalidation failed for {icao_code}: {e}")
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(icao_code)
 
-        response_data = data.copy()
-        response_data['cache_info'] = {
-            'from_cache': from_cache,
+def schedule_revalidation(icao_code, keep_raw=False):
+    icao_code = icao_code.upper()
+
+    if checkwx_breaker.state == CircuitBreaker.OPEN:
+        return False
+
+    with _revalidating_lock:
+        if icao_code in _revalidating:
+            return False
+        _revalidating.add(icao_code)
+
+    app = current_app._get_current_object()
+    threading.Thread(target=revalidate_weather, args=(app, icao_code, keep_raw), daemon=True).start()
+    return True
+
+def record_payload(record, full=False):
+    if full:
+        return dict(record['raw'])
+    return {'results': record['results'], 'data': record['data']}
+
+def load_weather(icao_code, full=False):
+    """Returns (data, cache_info); serves stale rows while refreshing them in the background.
+
+    With full=True the untouched CheckWX response is returned, and kept in the cache row.
+    """
+    cached = get_cached_weather(icao_code)
+    current_time = int(time.time())
+
+    record = decode_cache_record(cached['data']) if cached else None
+    if record and full and 'raw' not in record:
+        record = None
+
+    if record:
+        stale = cached['expires_at'] <= current_time
+        if stale:
+            cache_stale.inc()
+            schedule_revalidation(icao_code, keep_raw='raw' in record)
+        else:
+            cache_hits.inc()
+        entry_age.observe(current_time - (cached['expires_at'] - CACHE_DURATION))
+
+        return record_payload(record, full), {
+            'from_cache': True,
+            'stale': stale,
             'cache_duration': CACHE_DURATION,
-            'cached_until': int(time.time()) + CACHE_DURATION if from_cache else None
+            'cached_until': cached['expires_at']
         }
 
+    cache_misses.inc()
+    data = fetch_weather_from_api(icao_code)
+    record = build_cache_record(data, keep_raw=full)
+    if record['results'] > 0:
+        set_cached_weather(icao_code, record)
+
+    return record_payload(record, full), {
+        'from_cache': False,
+        'stale': False,
+        'cache_duration': CACHE_DURATION,
+        'cached_until': None
+    }
+
+@admin_weather_bp.route('/get/weather/<icao_code>', methods=['GET'])
+def get_weather(icao_code):
+    if not icao_code or len(icao_code) != 4:
+        return jsonify({'error': 'Invalid ICAO code'}), 400
+
+    try:
+        cleanup_old_cache()
+
+        full = request.args.get('full', 'false').lower() == 'true'
+        response_data, cache_info = load_weather(icao_code, full)
+        response_data['cache_info'] = cache_info
+
         return jsonify(response_data)
 
+    except WeatherServiceUnavailable:
+        return jsonify({
+            'error': 'Weather service temporarily unavailable',
+            'retry_after': checkwx_breaker.retry_after()
+        }), 503
     except requests.exceptions.Timeout:
         return jsonify({'error': 'Weather API timeout'}), 504
     except requests.exceptions.ConnectionError:
@@ -166,31 +349,25 @@ def get_multiple_weather():
 
         results = []
         from_cache_count = 0
+        stale_count = 0
 
         for station in station_list:
-            cached_data = get_cached_weather(station)
-
-            if cached_data:
-                station_data = json.loads(cached_data)
-                station_data['cache_info'] = {
-                    'from_cache': True,
-                    'cache_duration': CACHE_DURATION
-                }
-                results.append(station_data)
+            try:
+                station_data, cache_info = load_weather(station)
+            except Exception as e:
+                print(f"Error fetching weather for {station}: {e}")
+                continue
+
+            if not cache_info['from_cache'] and station_data.get('results', 0) == 0:
+                continue
+
+            station_data['cache_info'] = cache_info
+            results.append(station_data)
+
+            if cache_info['from_cache']:
                 from_cache_count += 1
-            else:
-                try:
-                    station_data = fetch_weather_from_api(station)
-                    if station_data.get('results', 0) > 0:
-                        set_cached_weather(station, station_data)
-                        station_data['cache_info'] = {
-                            'from_cache': False,
-                            'cache_duration': CACHE_DURATION
-                        }
-                        results.append(station_data)
-                except Exception as e:
-                    print(f"Error fetching weather for {station}: {e}")
-                    continue
+            if cache_info['stale']:
+                stale_count += 1
 
         combined_data = {
             'results': len(results),
@@ -199,7 +376,9 @@ def get_multiple_weather():
                 'total_stations': len(station_list),
                 'from_cache': from_cache_count,
                 'from_api': len(results) - from_cache_count,
-                'cache_duration': CACHE_DURATION
+                'stale': stale_count,
+                'cache_duration': CACHE_DURATION,
+                'upstream': checkwx_breaker.state
             }
         }
 
@@ -264,11 +443,40 @@ def get_cache_status():
                 'max_entries': MAX_CACHE_ENTRIES,
                 'cache_duration_seconds': CACHE_DURATION,
                 'cache_duration_minutes': CACHE_DURATION // 60,
+                'max_stale_age_seconds': MAX_STALE_AGE,
+                'circuit_breaker': checkwx_breaker.snapshot(),
                 'oldest_entries': oldest_entries,
                 'newest_entries': newest_entries
-            }
+            },
+            'metrics': get_weather_metrics(),
+            'quota': get_quota_usage()
         })
 
     except Exception as e:
         return jsonify({'error': f'Error getting cache status: {str(e)}'}), 500
-        
\ No newline at end of file
+        
+
+def get_weather_metrics():
+    hits = cache_hits.value()
+    stale = cache_stale.value()
+    misses = cache_misses.value()
+    lookups = hits + stale + misses
+
+    return {
+        'hits': hits,
+        'stale': stale,
+        'misses': misses,
+        'hit_ratio': round((hits + stale) / lookups, 4) if lookups else None,
+        'fresh_hit_ratio': round(hits / lookups, 4) if lookups else None,
+        'upstream_requests': upstream_requests.snapshot(),
+        'upstream_rejected': upstream_rejected.value(),
+        'upstream_latency': upstream_latency.snapshot(),
+        'entry_age': entry_age.snapshot()
+    }
+
+@admin_weather_bp.route('/weather/metrics', methods=['GET'])
+def get_weather_metrics_text():
+    if not check_admin_access():
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    return Response(registry.render_text(prefix='weather_'), mimetype='text/plain; version=0.0.4')
@@ -1,12 +1,23 @@
 from flask import Blueprint, jsonify, request, session
 from database import get_db
+from services.response_cache import cached_response, bump_generation
+from services.media import media_url_from_value, image_urls
 import time
-import base64
 
 about_us_bp = Blueprint('about_us', __name__)
 
+# Everything except the legacy image blob; images are served from /api/media
+ABOUT_US_COLUMNS = '''id, name, description, image_url, about_group, subgroup, link, role, position,
+    years_experience, fleet_type, registration_number, capacity, first_flight, display_order, is_active'''
+
+
+def serialize_item(item):
+    item.update(image_urls(item.pop('image_url')))
+    return item
+
 
 @about_us_bp.route('/get/about_us', methods=['GET'])
+@cached_response('about_us')
 def get_about_us():
     try:
         group_filter = request.args.get('group')
@@ -16,7 +27,7 @@ def get_about_us():
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        query = "SELECT * FROM about_us"
+        query = f"SELECT {ABOUT_US_COLUMNS} FROM about_us"
         conditions = []
         params = []
 
@@ -37,17 +48,7 @@ def get_about_us():
         query += " ORDER BY display_order, name"
 
         cursor.execute(query, params)
-        items = cursor.fetchall()
-
-        for item in items:
-            if item.get('image'):
-                try:
-                    if isinstance(item['image'], bytes):
-                        item['image'] = base64.b64encode(item['image']).decode('utf-8')
-                except:
-                    item['image'] = None
-            else:
-                item['image'] = None
+        items = [serialize_item(item) for item in cursor.fetchall()]
 
         return jsonify(items)
 
@@ -56,26 +57,18 @@ def get_about_us():
 
 
 @about_us_bp.route('/get/about_us/<int:item_id>', methods=['GET'])
+@cached_response('about_us')
 def get_about_us_item(item_id):
     try:
         db = get_db()
         cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM about_us WHERE id = %s", (item_id,))
+        cursor.execute(f"SELECT {ABOUT_US_COLUMNS} FROM about_us WHERE id = %s", (item_id,))
         item = cursor.fetchone()
 
         if not item:
             return jsonify({'error': 'Item not found'}), 404
 
-        if item.get('image'):
-            try:
-                if isinstance(item['image'], bytes):
-                    item['image'] = base64.b64encode(item['image']).decode('utf-8')
-            except:
-                item['image'] = None
-        else:
-            item['image'] = None
-
-        return jsonify(item)
+        return jsonify(serialize_item(item))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -106,16 +99,10 @@ def create_about_us_item():
         if not user or user['user_group'] not in ['HQ', 'STF']:
             return jsonify({'error': 'Insufficient permissions'}), 403
 
-        image_data = None
-        if data.get('image') and isinstance(data['image'], str) and data['image'].startswith('data:image'):
-            if 'base64,' in data['image']:
-                base64_str = data['image'].split('base64,')[1]
-                image_data = base64.b64decode(base64_str)
-        elif data.get('image') and isinstance(data['image'], str):
-            image_data = data['image']
+        image_url = media_url_from_value(cursor, data.get('image'))
 
         cursor.execute('''
-                       INSERT INTO about_us (name, description, image, about_group, subgroup, link,
+                       INSERT INTO about_us (name, description, image_url, about_group, subgroup, link,
                                              role, position, years_experience, fleet_type,
                                              registration_number, capacity, first_flight,
                                              display_order, is_active)
@@ -123,7 +110,7 @@ def create_about_us_item():
                        ''', (
                            data['name'],
                            data.get('description', ''),
-                           image_data,
+                           image_url,
                            data['about_group'],
                            data.get('subgroup', ''),
                            data.get('link', ''),
@@ -139,6 +126,7 @@ def create_about_us_item():
                        ))
 
         db.commit()
+        bump_generation('about_us')
         return jsonify({'message': 'Item created successfully', 'id': cursor.lastrowid}), 201
 
     except Exception as e:
@@ -169,14 +157,9 @@ def update_about_us_item(item_id):
         if not cursor.fetchone():
             return jsonify({'error': 'Item not found'}), 404
 
-        image_data = None
-        if 'image' in data:
-            if data['image'] and isinstance(data['image'], str) and data['image'].startswith('data:image'):
-                if 'base64,' in data['image']:
-                    base64_str = data['image'].split('base64,')[1]
-                    image_data = base64.b64decode(base64_str)
-            elif data['image'] and isinstance(data['image'], str):
-                image_data = data['image']
+        image_url = None
+        if data.get('image'):
+            image_url = media_url_from_value(cursor, data['image'])
 
         update_fields = []
         params = []
@@ -184,7 +167,7 @@ def update_about_us_item(item_id):
         field_mapping = {
             'name': 'name',
             'description': 'description',
-            'image': 'image',
+            'image': 'image_url',
             'about_group': 'about_group',
             'subgroup': 'subgroup',
             'link': 'link',
@@ -201,9 +184,9 @@ def update_about_us_item(item_id):
 
         for json_field, db_field in field_mapping.items():
             if json_field in data:
-                if json_field == 'image' and image_data is not None:
+                if json_field == 'image' and image_url is not None:
                     update_fields.append(f"{db_field} = %s")
-                    params.append(image_data)
+                    params.append(image_url)
                 elif json_field != 'image':
                     update_fields.append(f"{db_field} = %s")
                     params.append(data[json_field])
@@ -216,6 +199,7 @@ def update_about_us_item(item_id):
         query = f"UPDATE about_us SET {', '.join(update_fields)} WHERE id = %s"
         cursor.execute(query, params)
         db.commit()
+        bump_generation('about_us')
 
         return jsonify({'message': 'Item updated successfully'})
 
@@ -244,6 +228,7 @@ def delete_about_us_item(item_id):
 
         cursor.execute("DELETE FROM about_us WHERE id = %s", (item_id,))
         db.commit()
+        bump_generation('about_us')
 
         if cursor.rowcount == 0:
             return jsonify({'error': 'Item not found'}), 404
@@ -255,6 +240,7 @@ def delete_about_us_item(item_id):
 
 
 @about_us_bp.route('/get/about_us/groups', methods=['GET'])
+@cached_response('about_us')
 def get_about_us_groups():
     try:
         db = get_db()
@@ -268,6 +254,7 @@ def get_about_us_groups():
 
 
 @about_us_bp.route('/get/about_us/types', methods=['GET'])
+@cached_response('about_us')
 def get_about_us_types():
     try:
         group_filter = request.args.get('group')
@@ -291,6 +278,7 @@ def get_about_us_types():
 
 
 @about_us_bp.route('/get/about_us/departments', methods=['GET'])
+@cached_response('about_us')
 def get_about_us_departments():
     try:
         group_filter = request.args.get('group')
@@ -1,12 +1,28 @@
 from flask import Blueprint, request, jsonify, session
 from services.utils import login_required
 from database import get_db
+from services.response_cache import cached_response, bump_generation
 import json
 from services.db_utils import handle_db_locks
+from services.pax_services import invalidate_pax_price_map
+from services.media import media_url_from_value, is_image_value, image_urls
 
 configs_bp = Blueprint('configs', __name__)
 
 
+def split_config_image(cursor, value):
+    """configs.image also holds JSON (seatmaps); only image payloads move to the media store"""
+    if is_image_value(value):
+        return None, media_url_from_value(cursor, value)
+    return value, None
+
+
+def config_image(config):
+    if config['image_url']:
+        return config['image_url']
+    return config['image'] if config['image'] is not None else ""
+
+
 @configs_bp.route('/get/config/<int:config_id>', methods=['GET'])
 @handle_db_locks(max_retries=5)
 def get_config(config_id):
@@ -14,7 +30,7 @@ def get_config(config_id):
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM configs WHERE id = %s", (config_id,))
+        cursor.execute("SELECT id, name, description, image, image_url FROM configs WHERE id = %s", (config_id,))
         config = cursor.fetchone()
 
         if not config:
@@ -24,7 +40,7 @@ def get_config(config_id):
             "id": config['id'],
             "name": config['name'],
             "description": config['description'] if config['description'] is not None else "",
-            "image": config['image'] if config['image'] is not None else ""
+            "image": config_image(config)
         }
 
         return jsonify(config_info), 200
@@ -41,7 +57,7 @@ def get_config_by_name(config_name):
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM configs WHERE name = %s", (config_name,))
+        cursor.execute("SELECT id, name, description, image, image_url FROM configs WHERE name = %s", (config_name,))
         config = cursor.fetchone()
 
         if not config:
@@ -51,7 +67,7 @@ def get_config_by_name(config_name):
             "id": config['id'],
             "name": config['name'],
             "description": config['description'] if config['description'] is not None else "",
-            "image": config['image'] if config['image'] is not None else ""
+            "image": config_image(config)
         }
 
         return jsonify(config_info), 200
@@ -81,19 +97,22 @@ def post_config():
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM configs WHERE name = %s", (data['name'],))
+        cursor.execute("SELECT id FROM configs WHERE name = %s", (data['name'],))
         existing_config = cursor.fetchone()
 
         if existing_config:
             return jsonify({"error": "Config with this name already exists"}), 409
 
+        image, image_url = split_config_image(cursor, image)
+
         cursor.execute('''
-                       INSERT INTO configs (name, description, image)
-                       VALUES (%s, %s, %s)
+                       INSERT INTO configs (name, description, image, image_url)
+                       VALUES (%s, %s, %s, %s)
                        ''', (
                            data['name'],
                            data['description'],
-                           image
+                           image,
+                           image_url
                        ))
 
         config_id = cursor.lastrowid
@@ -121,7 +140,7 @@ def put_config(config_id):
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM configs WHERE id = %s", (config_id,))
+        cursor.execute("SELECT id FROM configs WHERE id = %s", (config_id,))
         config = cursor.fetchone()
 
         if not config:
@@ -130,18 +149,23 @@ def put_config(config_id):
         update_fields = []
         update_values = []
 
-        updatable_fields = ['name', 'description', 'image']
+        updatable_fields = ['name', 'description']
 
         for field in updatable_fields:
             if field in data:
                 update_fields.append(f"{field} = %s")
                 update_values.append(data[field])
 
+        if 'image' in data:
+            image, image_url = split_config_image(cursor, data['image'])
+            update_fields.extend(["image = %s", "image_url = %s"])
+            update_values.extend([image, image_url])
+
         if not update_fields:
             return jsonify({"error": "No fields to update"}), 400
 
         if 'name' in data:
-            cursor.execute("SELECT * FROM configs WHERE name = %s AND id != %s", (data['name'], config_id))
+            cursor.execute("SELECT id FROM configs WHERE name = %s AND id != %s", (data['name'], config_id))
             existing_config = cursor.fetchone()
             if existing_config:
                 return jsonify({"error": "Config with this name already exists"}), 409
@@ -167,7 +191,7 @@ def delete_config(config_id):
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM configs WHERE id = %s", (config_id,))
+        cursor.execute("SELECT id FROM configs WHERE id = %s", (config_id,))
         config = cursor.fetchone()
 
         if not config:
@@ -216,6 +240,7 @@ def get_seatmap_configs():
 
 
 @configs_bp.route('/get/pax_services', methods=['GET'])
+@cached_response('pax_service')
 @handle_db_locks(max_retries=5)
 def get_pax_services():
     try:
@@ -223,7 +248,7 @@ def get_pax_services():
         cursor = db.cursor(dictionary=True)
 
         cursor.execute('''
-                       SELECT name, description, price
+                       SELECT name, description, price, image_url
                        FROM pax_service
                        WHERE price > 0
                        ORDER BY name
@@ -236,7 +261,8 @@ def get_pax_services():
             result.append({
                 'name': service['name'],
                 'description': service['description'],
-                'price': float(service['price']) if service['price'] else 0.0
+                'price': float(service['price']) if service['price'] else 0.0,
+                **image_urls(service['image_url'])
             })
 
         return jsonify(result), 200
@@ -271,17 +297,20 @@ def create_pax_service():
 
     try:
         cursor.execute('''
-                       INSERT INTO pax_service (name, description, groupname, subgroupname, price)
-                       VALUES (%s, %s, %s, %s, %s)
+                       INSERT INTO pax_service (name, description, groupname, subgroupname, price, image_url)
+                       VALUES (%s, %s, %s, %s, %s, %s)
                        ''', (
                            data['name'],
                            data.get('description', ''),
                            data.get('groupname', 'Custom Services'),
                            data.get('subgroupname', 'General'),
-                           data['price']
+                           data['price'],
+                           media_url_from_value(cursor, data.get('image'))
                        ))
 
         db.commit()
+        bump_generation('pax_service')
+        invalidate_pax_price_map()
         return jsonify({"message": "PAX service created successfully"}), 201
 
     except Exception as e:
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from services.utils import login_required
 from database import get_db
+from services.response_cache import cached_response, bump_generation
 import json
 from datetime import datetime
 from services.db_utils import handle_db_locks
@@ -8,6 +9,7 @@ from services.db_utils import handle_db_locks
 flight_configs_bp = Blueprint('flight_configs', __name__)
 
 @flight_configs_bp.route('/get/flight_configs/<config_type>', methods=['GET'])
+@cached_response('flight_configs')
 @handle_db_locks(max_retries=5)
 def get_flight_configs_by_type(config_type):
     try:
@@ -109,6 +111,7 @@ def create_flight_config():
 
         config_id = cursor.lastrowid
         db.commit()
+        bump_generation('flight_configs')
 
         return jsonify({
             "success": True,
@@ -175,6 +178,7 @@ def update_flight_config(config_id):
             cursor.execute(update_query, update_values)
 
         db.commit()
+        bump_generation('flight_configs')
         return jsonify({
             "success": True,
             "message": "Config updated successfully"
@@ -201,6 +205,7 @@ def delete_flight_config(config_id):
 
         cursor.execute('UPDATE flight_configs SET is_active = 0 WHERE id = %s', (config_id,))
         db.commit()
+        bump_generation('flight_configs')
 
         return jsonify({
             "success": True,
@@ -212,6 +217,7 @@ def delete_flight_config(config_id):
         return jsonify({"error": "Something went wrong"}), 500
 
 @flight_configs_bp.route('/get/flight_configs', methods=['GET'])
+@cached_response('flight_configs')
 @handle_db_locks(max_retries=5)
 def get_all_flight_configs():
     try:
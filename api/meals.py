@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from services.utils import login_required
 from database import get_db
+from services.response_cache import cached_response, bump_generation
 from services.db_utils import handle_db_locks
 
 meals_bp = Blueprint('meals', __name__)
@@ -27,6 +28,7 @@ def safe_get_image(image_data):
 
 
 @meals_bp.route('/get/meals/<serve_class>', methods=['GET'])
+@cached_response('meals')
 @handle_db_locks(max_retries=5)
 def get_meals_by_class(serve_class):
     try:
@@ -87,6 +89,7 @@ def post_meal():
 
         meal_id = cursor.lastrowid
         db.commit()
+        bump_generation('meals')
         return jsonify({"message": "Meal created successfully", "meal_id": meal_id}), 201
 
     except Exception as e:
@@ -112,6 +115,7 @@ def delete_meal(meal_id):
 
         cursor.execute("DELETE FROM meals WHERE id = %s", (meal_id,))
         db.commit()
+        bump_generation('meals')
         return jsonify({"message": f"Meal {meal_id} deleted successfully"}), 200
 
     except Exception as e:
@@ -120,6 +124,7 @@ def delete_meal(meal_id):
 
 
 @meals_bp.route('/get/all_meals', methods=['GET'])
+@cached_response('meals')
 @handle_db_locks(max_retries=5)
 def get_all_meals():
     try:
@@ -185,6 +190,7 @@ def update_meal(meal_id):
         update_query = f"UPDATE meals SET {', '.join(update_fields)} WHERE id = %s"
         cursor.execute(update_query, update_values)
         db.commit()
+        bump_generation('meals')
 
         return jsonify({"message": "Meal updated successfully", "meal_id": meal_id}), 200
 
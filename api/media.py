@@ -0,0 +1,40 @@
+from flask import Blueprint, request, jsonify, Response
+from database import get_db
+from services.db_utils import handle_db_locks
+from services.media import get_media, IMAGE_VARIANTS
+
+media_bp = Blueprint('media', __name__)
+
+# The URL changes whenever the content does, so clients may keep a copy forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+@media_bp.route('/media/<string:media_hash>', methods=['GET'])
+@media_bp.route('/media/<string:media_hash>/<string:variant>', methods=['GET'])
+@handle_db_locks(max_retries=5)
+def get_media_file(media_hash, variant=None):
+    if len(media_hash) != 64 or not all(c in '0123456789abcdef' for c in media_hash):
+        return jsonify({"error": "Media not found"}), 404
+    if variant is not None and variant not in IMAGE_VARIANTS:
+        return jsonify({"error": "Unknown variant"}), 404
+
+    etag = f'"{media_hash}/{variant}"' if variant else f'"{media_hash}"'
+    headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL}
+
+    # Content is addressed by its hash, so a matching ETag needs no database lookup
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+
+    try:
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        media = get_media(cursor, media_hash, variant)
+
+        if not media:
+            return jsonify({"error": "Media not found"}), 404
+
+        return Response(bytes(media['data']), mimetype=media['content_type'], headers=headers)
+
+    except Exception as e:
+        print(f"Error getting media {media_hash}: {e}")
+        return jsonify({"error": "Something went wrong"}), 500
@@ -2,10 +2,22 @@ from flask import Blueprint, request, jsonify, session
 from database import get_db
 import time
 from services.firebase_admin import FirebaseAdmin
+from services.notification_outbox import enqueue_notification, get_outbox_message
 
 notifications_bp = Blueprint('notifications', __name__)
 
 
+def is_admin(user_id):
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        'SELECT user_group FROM users WHERE id = %s',
+        (user_id,)
+    )
+    user = cursor.fetchone()
+    return bool(user) and user['user_group'] in ['HQ', 'STF']
+
+
 @notifications_bp.route('/push/subscribe', methods=['POST'])
 def push_subscribe():
     try:
@@ -17,29 +29,28 @@ def push_subscribe():
             return jsonify({'error': 'Token is required'}), 400
 
         db = get_db()
+        cursor = db.cursor()
 
         # Если пользователь авторизован в сессии, используем его ID
         if 'user_id' in session and not user_id:
             user_id = session['user_id']
 
-        # Проверяем, существует ли уже токен
-        existing = db.execute(
-            'SELECT id FROM push_subscriptions WHERE fcm_token = ?',
-            (token,)
-        ).fetchone()
-
-        if existing:
-            return jsonify({'message': 'Token already exists'}), 200
-
-        # Сохраняем токен
-        db.execute(
+        # Сохраняем токен одним upsert: 1 - новый, 2 - обновлён, 0 - без изменений
+        now = int(time.time())
+        cursor.execute(
             '''INSERT INTO push_subscriptions
-                   (user_id, fcm_token, created_at)
-               VALUES (?, ?, ?)''',
-            (user_id, token, int(time.time()))
+                   (user_id, fcm_token, created_at, updated_at)
+               VALUES (%s, %s, %s, %s)
+               ON DUPLICATE KEY UPDATE
+                   user_id = COALESCE(VALUES(user_id), user_id),
+                   updated_at = VALUES(updated_at)''',
+            (user_id, token, now, now)
         )
         db.commit()
 
+        if cursor.rowcount != 1:
+            return jsonify({'message': 'Token already exists'}), 200
+
         # Подписываем на общие темы
         try:
             FirebaseAdmin.subscribe_to_topic([token], 'all_users')
@@ -65,13 +76,15 @@ def push_unsubscribe():
             return jsonify({'error': 'Token is required'}), 400
 
         db = get_db()
+        cursor = db.cursor(dictionary=True)
 
         # Отписываем от тем перед удалением
         try:
-            subscription = db.execute(
-                'SELECT user_id FROM push_subscriptions WHERE fcm_token = ?',
+            cursor.execute(
+                'SELECT user_id FROM push_subscriptions WHERE fcm_token = %s',
                 (token,)
-            ).fetchone()
+            )
+            subscription = cursor.fetchone()
 
             if subscription:
                 user_id = subscription['user_id']
@@ -81,8 +94,8 @@ def push_unsubscribe():
         except Exception as e:
             print(f"Topic unsubscription warning: {e}")
 
-        db.execute(
-            'DELETE FROM push_subscriptions WHERE fcm_token = ?',
+        cursor.execute(
+            'DELETE FROM push_subscriptions WHERE fcm_token = %s',
             (token,)
         )
         db.commit()
@@ -101,14 +114,16 @@ def get_user_tokens():
             return jsonify({'error': 'Not authenticated'}), 401
 
         db = get_db()
+        cursor = db.cursor(dictionary=True)
 
-        tokens = db.execute(
-            'SELECT fcm_token, created_at FROM push_subscriptions WHERE user_id = ?',
+        cursor.execute(
+            'SELECT fcm_token, created_at FROM push_subscriptions WHERE user_id = %s',
             (session['user_id'],)
-        ).fetchall()
+        )
+        tokens = cursor.fetchall()
 
         return jsonify({
-            'tokens': [dict(token) for token in tokens]
+            'tokens': tokens
         }), 200
 
     except Exception as e:
@@ -130,39 +145,37 @@ def send_test_notification():
 
         if test_type == 'personal':
             # Отправляем текущему пользователю
-            result = FirebaseAdmin.send_to_user(
-                session['user_id'],
+            outbox_id = enqueue_notification(
+                'user',
                 title,
                 body,
-                data={'url': '/', 'type': 'test'}
+                data={'url': '/', 'type': 'test'},
+                target_id=session['user_id'],
+                admin_user_id=session['user_id']
             )
-            message = "Тестовое уведомление отправлено вам"
+            message = "Тестовое уведомление поставлено в очередь для вас"
 
         elif test_type == 'broadcast':
             # Отправляем всем пользователям (только для админов)
-            db = get_db()
-            user = db.execute(
-                'SELECT user_group FROM users WHERE id = ?',
-                (session['user_id'],)
-            ).fetchone()
-
-            if not user or user['user_group'] not in ['HQ', 'STF']:
+            if not is_admin(session['user_id']):
                 return jsonify({'error': 'Admin access required'}), 403
 
-            result = FirebaseAdmin.send_broadcast(
+            outbox_id = enqueue_notification(
+                'all',
                 title,
                 body,
-                data={'url': '/', 'type': 'test_broadcast'}
+                data={'url': '/', 'type': 'test_broadcast'},
+                admin_user_id=session['user_id']
             )
-            message = f"Тестовое уведомление отправлено всем пользователям ({len(result) if result else 0} получателей)"
+            message = "Тестовое уведомление поставлено в очередь для всех пользователей"
 
         else:
             return jsonify({'error': 'Invalid test type'}), 400
 
         return jsonify({
             'message': message,
-            'result': result
-        }), 200
+            'outbox_id': outbox_id
+        }), 202
 
     except Exception as e:
         print(f"Error in send_test_notification: {e}")
@@ -176,13 +189,7 @@ def send_custom_notification():
             return jsonify({'error': 'Not authenticated'}), 401
 
         # Проверяем права админа
-        db = get_db()
-        user = db.execute(
-            'SELECT user_group FROM users WHERE id = ?',
-            (session['user_id'],)
-        ).fetchone()
-
-        if not user or user['user_group'] not in ['HQ', 'STF']:
+        if not is_admin(session['user_id']):
             return jsonify({'error': 'Admin access required'}), 403
 
         data = request.get_json()
@@ -202,44 +209,69 @@ def send_custom_notification():
             'timestamp': str(int(time.time()))
         }
 
-        if target == 'all':
-            result = FirebaseAdmin.send_broadcast(title, body, notification_data)
-            message = f"Уведомление отправлено всем пользователям"
+        if target not in ('all', 'user', 'topic'):
+            return jsonify({'error': 'Invalid target'}), 400
 
-        elif target == 'user':
-            if not target_id:
-                return jsonify({'error': 'target_id required for user target'}), 400
-            result = FirebaseAdmin.send_to_user(target_id, title, body, notification_data)
-            message = f"Уведомление отправлено пользователю {target_id}"
+        if target != 'all' and not target_id:
+            return jsonify({'error': f'target_id required for {target} target'}), 400
 
-        elif target == 'topic':
-            if not target_id:
-                return jsonify({'error': 'target_id required for topic target'}), 400
-            result = FirebaseAdmin.send_to_topic(target_id, title, body, notification_data)
-            message = f"Уведомление отправлено в тему {target_id}"
+        outbox_id = enqueue_notification(
+            target,
+            title,
+            body,
+            data=notification_data,
+            target_id=target_id if target != 'all' else None,
+            admin_user_id=session['user_id']
+        )
 
+        if target == 'all':
+            message = f"Уведомление поставлено в очередь для всех пользователей"
+        elif target == 'user':
+            message = f"Уведомление поставлено в очередь для пользователя {target_id}"
         else:
-            return jsonify({'error': 'Invalid target'}), 400
+            message = f"Уведомление поставлено в очередь для темы {target_id}"
 
         # Логируем отправку уведомления
-        db.execute(
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute(
             '''INSERT INTO notification_logs
-                   (admin_user_id, title, body, target, target_id, sent_at)
-               VALUES (?, ?, ?, ?, ?, ?)''',
-            (session['user_id'], title, body, target, target_id, int(time.time()))
+                   (admin_user_id, title, body, target, target_id, outbox_id, sent_at)
+               VALUES (%s, %s, %s, %s, %s, %s, %s)''',
+            (session['user_id'], title, body, target, target_id, outbox_id, int(time.time()))
         )
         db.commit()
 
         return jsonify({
             'message': message,
-            'sent_count': len(result) if result else 0
-        }), 200
+            'outbox_id': outbox_id
+        }), 202
 
     except Exception as e:
         print(f"Error in send_custom_notification: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@notifications_bp.route('/push/outbox/<int:outbox_id>', methods=['GET'])
+def get_outbox_status(outbox_id):
+    try:
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+
+        message = get_outbox_message(outbox_id)
+        if not message:
+            return jsonify({'error': 'Notification not found'}), 404
+
+        if message['admin_user_id'] != session['user_id'] and session.get('user_group') not in ['HQ', 'STF']:
+            return jsonify({'error': 'Access denied'}), 403
+
+        return jsonify({'notification': message}), 200
+
+    except Exception as e:
+        print(f"Error in get_outbox_status: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @notifications_bp.route('/push/stats', methods=['GET'])
 def get_notification_stats():
     try:
@@ -247,26 +279,24 @@ def get_notification_stats():
             return jsonify({'error': 'Not authenticated'}), 401
 
         # Проверяем права админа
-        db = get_db()
-        user = db.execute(
-            'SELECT user_group FROM users WHERE id = ?',
-            (session['user_id'],)
-        ).fetchone()
-
-        if not user or user['user_group'] not in ['HQ', 'STF']:
+        if not is_admin(session['user_id']):
             return jsonify({'error': 'Admin access required'}), 403
 
         # Статистика по подпискам
-        stats = db.execute('''
-                           SELECT COUNT(*)                as total_subscriptions,
-                                  COUNT(DISTINCT user_id) as unique_users,
-                                  COUNT(*)                as active_tokens
-                           FROM push_subscriptions
-                           WHERE fcm_token IS NOT NULL
-                           ''').fetchone()
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute('''
+                       SELECT COUNT(*)                as total_subscriptions,
+                              COUNT(DISTINCT user_id) as unique_users,
+                              COUNT(*)                as active_tokens
+                       FROM push_subscriptions
+                       WHERE fcm_token IS NOT NULL
+                       ''')
+        stats = cursor.fetchone()
 
         return jsonify({
-            'stats': dict(stats)
+            'stats': stats,
+            'firebase': FirebaseAdmin.status()
         }), 200
 
     except Exception as e:
@@ -3,6 +3,7 @@ from database import get_db
 from datetime import datetime
 from services.utils import login_required
 from services.db_utils import handle_db_locks
+from services.flight_notifications import notify_flight_change
 
 schedule_bp = Blueprint('schedule', __name__)
 
@@ -217,6 +218,12 @@ def put_schedule(flight_id):
         cursor.execute(update_query, update_values)
 
         db.commit()
+
+        try:
+            notify_flight_change(flight, data)
+        except Exception as e:
+            print(f"Flight change notification error: {e}")
+
         return jsonify({"message": f"Flight {flight_id} updated successfully"}), 200
 
     except Exception as e:
@@ -1,11 +1,19 @@
 from flask import Blueprint, request, jsonify, session
-from database import get_db, execute_with_retry
+from database import execute_with_retry
 from services.utils import login_required
-from datetime import datetime
-import time
+from services.user_stats import mark_user_stats_dirty
+from services.ledger import (
+    validate_entry, post_transactions, import_transactions, parse_csv_rows, flight_accrual_rows,
+    LedgerError, MAX_BULK_TRANSACTIONS, MAX_IMPORT_ROWS
+)
+import base64
+import json
 
 transactions_bp = Blueprint('transactions', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 def check_admin_permissions():
     user_id = session.get('user_id')
     if not user_id:
@@ -41,72 +49,233 @@ def create_transaction():
     if not data:
         return jsonify({"error": "No JSON data received"}), 400
 
-    required_fields = ['user_id', 'amount', 'description', 'type']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({"error": f"Missing required field: {field}"}), 400
-
     try:
-        user_result = execute_with_retry(
-            'SELECT id, nickname, miles FROM users WHERE id = %s',
-            (data['user_id'],)
-        )
-        user = user_result.fetchone()
-
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-
-        if data.get('booking_id'):
-            booking_result = execute_with_retry(
-                'SELECT id, flight_number FROM bookings WHERE id = %s',
-                (data['booking_id'],)
-            )
-            booking = booking_result.fetchone()
-
-            if not booking:
-                return jsonify({"error": "Booking not found"}), 404
-
-        amount = data['amount']
-        if not isinstance(amount, (int, float)) or abs(amount) > 1000000:
-            return jsonify({"error": "Invalid amount"}), 400
-
-        execute_with_retry(''' \
-                           INSERT INTO transactions (user_id, booking_id, amount, description, type, admin_user_id,
-                                                     created_at)
-                           VALUES (%s, %s, %s, %s, %s, %s, %s)
-                           ''', (
-                               data['user_id'],
-                               data.get('booking_id'),
-                               amount,
-                               data['description'],
-                               data['type'],
-                               session['user_id'],
-                               int(datetime.now().timestamp())
-                           ))
-
-        new_balance = user['miles'] + amount
-        execute_with_retry(
-            'UPDATE users SET miles = %s WHERE id = %s',
-            (new_balance, data['user_id'])
-        )
+        if request.headers.get('Idempotency-Key') and 'idempotency_key' not in data:
+            data['idempotency_key'] = request.headers['Idempotency-Key']
+        entry = validate_entry(data)
+
+        results, changed = post_transactions([entry], session['user_id'])
+        if changed:
+            mark_user_stats_dirty()
+        result = results[0]
 
-        print(f"Transaction created: user_id={data['user_id']}, amount={amount}, new_balance={new_balance}, admin={session['user_id']}")
+        print(f"Transaction created: user_id={result['user_id']}, amount={result['amount']}, new_balance={result['new_balance']}, admin={session['user_id']}, replayed={result['replayed']}")
 
+        # A replay describes the transaction stored the first time
         return jsonify({
-            "message": "Transaction created successfully",
+            "message": "Transaction already applied" if result['replayed'] else "Transaction created successfully",
             "transaction": {
-                "user_id": data['user_id'],
-                "amount": amount,
-                "description": data['description'],
-                "type": data['type'],
-                "new_balance": new_balance
+                "id": result['id'],
+                "user_id": result['user_id'],
+                "amount": result['amount'],
+                "description": result['description'],
+                "type": result['type'],
+                "idempotency_key": result['idempotency_key'],
+                "new_balance": result['new_balance']
             }
-        }), 201
+        }), 200 if result['replayed'] else 201
 
+    except LedgerError as e:
+        return jsonify({"error": e.message}), e.status
     except Exception as e:
         print(f"Transaction creation error: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@transactions_bp.route('/post/transactions/bulk', methods=['POST'])
+@login_required
+def create_transactions_bulk():
+    has_permission, message = check_admin_permissions()
+    if not has_permission:
+        return jsonify({"error": message}), 403
+
+    data = request.get_json()
+    if not data or not isinstance(data.get('transactions'), list) or not data['transactions']:
+        return jsonify({"error": "transactions must be a non-empty list"}), 400
+
+    if len(data['transactions']) > MAX_BULK_TRANSACTIONS:
+        return jsonify({"error": f"At most {MAX_BULK_TRANSACTIONS} transactions per request"}), 400
+
+    try:
+        entries = []
+        for index, item in enumerate(data['transactions']):
+            try:
+                entries.append(validate_entry(item if isinstance(item, dict) else {}))
+            except LedgerError as e:
+                return jsonify({"error": f"Transaction {index}: {e.message}"}), e.status
+
+        keys = [entry['idempotency_key'] for entry in entries]
+        if len(set(keys)) != len(keys):
+            return jsonify({"error": "Duplicate idempotency_key in request"}), 400
+
+        # All or nothing: one DB transaction for every row and balance
+        results, changed = post_transactions(entries, session['user_id'])
+        if changed:
+            mark_user_stats_dirty()
+
+        applied = sum(1 for result in results if not result['replayed'])
+        print(f"Bulk transactions: {applied} applied, {len(results) - applied} replayed, admin={session['user_id']}")
+
+        return jsonify({
+            "message": "Transactions processed successfully",
+            "applied": applied,
+            "replayed": len(results) - applied,
+            "transactions": [{
+                "id": result['id'],
+                "user_id": result['user_id'],
+                "booking_id": result['booking_id'],
+                "amount": result['amount'],
+                "idempotency_key": result['idempotency_key'],
+                "replayed": result['replayed'],
+                "new_balance": result['new_balance']
+            } for result in results]
+        }), 201 if applied else 200
+
+    except LedgerError as e:
+        return jsonify({"error": e.message}), e.status
+    except Exception as e:
+        print(f"Bulk transaction error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def summarize_import(results):
+    return {
+        "applied": sum(1 for result in results if result['status'] == 'applied'),
+        "replayed": sum(1 for result in results if result['status'] == 'replayed'),
+        "failed": sum(1 for result in results if result['status'] == 'error'),
+        "results": results
+    }
+
+@transactions_bp.route('/post/transactions/import', methods=['POST'])
+@login_required
+def import_transactions_file():
+    has_permission, message = check_admin_permissions()
+    if not has_permission:
+        return jsonify({"error": message}), 403
+
+    try:
+        upload = request.files.get('file')
+        if upload:
+            content = upload.read().decode('utf-8-sig')
+            rows = json.loads(content) if upload.filename.lower().endswith('.json') else parse_csv_rows(content)
+        elif request.mimetype == 'text/csv':
+            rows = parse_csv_rows(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True)
+            rows = data.get('transactions') if isinstance(data, dict) else data
+
+        if not isinstance(rows, list) or not rows:
+            return jsonify({"error": "No transactions found in upload"}), 400
+        if len(rows) > MAX_IMPORT_ROWS:
+            return jsonify({"error": f"At most {MAX_IMPORT_ROWS} rows per import"}), 400
+
+        results, changed = import_transactions(rows, session['user_id'])
+        if changed:
+            mark_user_stats_dirty()
+
+        summary = summarize_import(results)
+        print(f"Transaction import: {summary['applied']} applied, {summary['replayed']} replayed, {summary['failed']} failed, admin={session['user_id']}")
+        return jsonify(summary), 200
+
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Could not parse upload: {e}"}), 400
+    except Exception as e:
+        print(f"Transaction import error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@transactions_bp.route('/post/transactions/accrue/<flight_number>', methods=['POST'])
+@login_required
+def accrue_flight_miles(flight_number):
+    has_permission, message = check_admin_permissions()
+    if not has_permission:
+        return jsonify({"error": message}), 403
+
+    data = request.get_json() or {}
+    amount = data.get('amount')
+    class_amounts = data.get('class_amounts') or {}
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not isinstance(class_amounts, dict):
+        return jsonify({"error": "amount is required and class_amounts must map serve class to amount"}), 400
+
+    try:
+        rows = flight_accrual_rows(flight_number, amount, class_amounts, data.get('description'), bool(data.get('force')))
+        if not rows:
+            return jsonify({"error": "No valid bookings found for this flight"}), 404
+
+        results, changed = import_transactions(rows, session['user_id'])
+        if changed:
+            mark_user_stats_dirty()
+
+        summary = summarize_import(results)
+        print(f"Miles accrual for {flight_number}: {summary['applied']} applied, {summary['replayed']} replayed, {summary['failed']} failed, admin={session['user_id']}")
+        return jsonify(summary), 200
+
+    except LedgerError as e:
+        return jsonify({"error": e.message}), e.status
+    except Exception as e:
+        print(f"Miles accrual error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+def encode_cursor(created_at, transaction_id):
+    raw = f'{created_at}:{transaction_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor_value):
+    padded = cursor_value + '=' * (-len(cursor_value) % 4)
+    created_at, transaction_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':', 1)
+    return int(created_at), int(transaction_id)
+
+def get_transactions_page(column, value, args):
+    """Newest first, keyset paginated on (created_at, id); served from idx_transactions_user / idx_transactions_booking"""
+    limit = min(max(args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    conditions = [f't.{column} = %s']
+    params = [value]
+
+    cursor_value = args.get('cursor')
+    if cursor_value:
+        created_at, last_id = decode_cursor(cursor_value)
+        conditions.append('(t.created_at < %s OR (t.created_at = %s AND t.id < %s))')
+        params.extend([created_at, created_at, last_id])
+
+    params.append(limit + 1)
+    result = execute_with_retry(f'''
+        SELECT t.id, t.user_id, t.booking_id, t.amount, t.balance_after, t.balance_estimated, t.description, t.type,
+               t.admin_user_id, t.created_at, u.nickname AS admin_nickname
+        FROM transactions t
+                 LEFT JOIN users u ON t.admin_user_id = u.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT %s
+    ''', params)
+    transactions = result.fetchall()
+
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+
+    result_list = []
+    for transaction in transactions:
+        result_list.append({
+            'id': transaction['id'],
+            'user_id': transaction['user_id'],
+            'booking_id': transaction['booking_id'],
+            'amount': float(transaction['amount']),
+            'balance_after': float(transaction['balance_after']) if transaction['balance_after'] is not None else None,
+            'balance_estimated': bool(transaction['balance_estimated']),
+            'description': transaction['description'],
+            'type': transaction['type'],
+            'admin_user_id': transaction['admin_user_id'],
+            'admin_nickname': transaction['admin_nickname'],
+            'created_at': transaction['created_at']
+        })
+
+    next_cursor = None
+    if has_more and transactions:
+        next_cursor = encode_cursor(transactions[-1]['created_at'], transactions[-1]['id'])
+
+    return {
+        'transactions': result_list,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'limit': limit
+    }
+
 @transactions_bp.route('/get/transactions/user/<int:user_id>', methods=['GET'])
 @login_required
 def get_user_transactions(user_id):
@@ -117,34 +286,12 @@ def get_user_transactions(user_id):
         if user_id != current_user_id and current_user_group not in ['HQ', 'STF']:
             return jsonify({"error": "Access denied"}), 403
 
-        result = execute_with_retry(''' \
-                                    SELECT t.*, u.nickname as admin_nickname
-                                    FROM transactions t
-                                             LEFT JOIN users u ON t.admin_user_id = u.id
-                                    WHERE t.user_id = %s
-                                    ORDER BY t.created_at DESC
-                                    ''', (user_id,))
-
-        transactions = result.fetchall()
-
-        result_list = []
-        for transaction in transactions:
-            amount = float(transaction['amount'])
-
-            result_list.append({
-                'id': transaction['id'],
-                'user_id': transaction['user_id'],
-                'booking_id': transaction['booking_id'],
-                'amount': amount,
-                'description': transaction['description'],
-                'type': transaction['type'],
-                'admin_user_id': transaction['admin_user_id'],
-                'admin_nickname': transaction['admin_nickname'],
-                'created_at': transaction['created_at'],
-                'created_at_formatted': datetime.fromtimestamp(transaction['created_at']).strftime('%Y-%m-%d %H:%M:%S')
-            })
-
-        return jsonify(result_list), 200
+        try:
+            page = get_transactions_page('user_id', user_id, request.args)
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        return jsonify(page), 200
 
     except Exception as e:
         print(f"Get transactions error: {e}")
@@ -158,34 +305,13 @@ def get_booking_transactions(booking_id):
         if not has_permission:
             return jsonify({"error": message}), 403
 
-        result = execute_with_retry(''' \
-                                    SELECT t.*, u.nickname as admin_nickname
-                                    FROM transactions t
-                                             LEFT JOIN users u ON t.admin_user_id = u.id
-                                    WHERE t.booking_id = %s
-                                    ORDER BY t.created_at DESC
-                                    ''', (booking_id,))
-
-        transactions = result.fetchall()
-
-        result_list = []
-        for transaction in transactions:
-            result_list.append({
-                'id': transaction['id'],
-                'user_id': transaction['user_id'],
-                'booking_id': transaction['booking_id'],
-                'amount': float(transaction['amount']),
-                'description': transaction['description'],
-                'type': transaction['type'],
-                'admin_user_id': transaction['admin_user_id'],
-                'admin_nickname': transaction['admin_nickname'],
-                'created_at': transaction['created_at'],
-                'created_at_formatted': datetime.fromtimestamp(transaction['created_at']).strftime('%Y-%m-%d %H:%M:%S')
-            })
-
-        return jsonify(result_list), 200
+        try:
+            page = get_transactions_page('booking_id', booking_id, request.args)
+        except (ValueError, TypeError):
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        return jsonify(page), 200
 
     except Exception as e:
         print(f"Get booking transactions error: {e}")
         return jsonify({"error": "Internal server error"}), 500
-        
\ No newline at end of file
@@ -2,8 +2,10 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify, session
 from database import get_db
 from services.utils import login_required
-import hashlib
+from services.passwords import make_password_hash, PasswordHashingBusy, busy_response
 from services.db_utils import handle_db_locks
+from services.user_stats import mark_user_stats_dirty
+from services.media import media_url_from_value
 
 users_bp = Blueprint('users', __name__)
 
@@ -15,7 +17,12 @@ def get_user(user_id):
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+        cursor.execute('''
+            SELECT id, nickname, created_at, virtual_id, social_id, miles, bonuses, user_group,
+                   subgroup, link, pfp_url, metadata, pending, status
+            FROM users
+            WHERE id = %s
+        ''', (user_id,))
         user = cursor.fetchone()
 
         if not user:
@@ -32,7 +39,7 @@ def get_user(user_id):
             "user_group": user['user_group'],
             "subgroup": user['subgroup'],
             "link": user['link'] if user['link'] is not None else "",
-            "pfp": user['pfp'] if user['pfp'] is not None else "",
+            "pfp": user['pfp_url'] if user['pfp_url'] is not None else "",
             "metadata": user['metadata'] if user['metadata'] is not None else "",
             "pending": user['pending'] if user['pending'] is not None else "",
             "status": user['status'] if user['status'] is not None else ""
@@ -66,7 +73,7 @@ def put_user(user_id):
 
     try:
         cursor.execute(
-            "SELECT * FROM users WHERE id = %s",
+            "SELECT id FROM users WHERE id = %s",
             (user_id,)
         )
         user = cursor.fetchone()
@@ -79,7 +86,7 @@ def put_user(user_id):
 
         updatable_fields = [
             'nickname', 'virtual_id', 'social_id', 'miles', 'bonuses',
-            'user_group', 'subgroup', 'link', 'pfp', 'metadata', 'pending', 'status'
+            'user_group', 'subgroup', 'link', 'metadata', 'pending', 'status'
         ]
 
         for field in updatable_fields:
@@ -87,6 +94,10 @@ def put_user(user_id):
                 update_fields.append(f"{field} = %s")
                 update_values.append(data[field])
 
+        if 'pfp' in data:
+            update_fields.append("pfp_url = %s")
+            update_values.append(media_url_from_value(cursor, data['pfp']))
+
         if not update_fields:
             return jsonify({"error": "No fields to update"}), 400
 
@@ -96,6 +107,7 @@ def put_user(user_id):
         cursor.execute(update_query, update_values)
 
         db.commit()
+        mark_user_stats_dirty()
         return jsonify({"message": f"User {user_id} updated successfully"}), 200
 
     except Exception as e:
@@ -120,7 +132,7 @@ def delete_user(user_id):
 
     try:
         cursor.execute(
-            "SELECT * FROM users WHERE id = %s",
+            "SELECT id FROM users WHERE id = %s",
             (user_id,)
         )
         user = cursor.fetchone()
@@ -130,6 +142,7 @@ def delete_user(user_id):
 
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
         db.commit()
+        mark_user_stats_dirty()
 
         return jsonify({"message": f"User {user_id} deleted successfully"}), 200
 
@@ -156,7 +169,7 @@ def post_user():
             if field not in data:
                 return jsonify({"error": f"Missing required field: {field}"}), 400
 
-        password_hash = hashlib.sha256(data['password'].encode()).hexdigest()
+        password_hash = make_password_hash(data['password'])
 
         miles = 0
         bonuses = ''
@@ -170,7 +183,7 @@ def post_user():
         db = get_db()
         cursor = db.cursor(dictionary=True)
 
-        cursor.execute("SELECT * FROM users WHERE nickname = %s", (data['nickname'],))
+        cursor.execute("SELECT id FROM users WHERE nickname = %s", (data['nickname'],))
         existing_user = cursor.fetchone()
 
         if existing_user:
@@ -178,7 +191,7 @@ def post_user():
 
         cursor.execute('''
                   INSERT INTO users (nickname, created_at, virtual_id, social_id, miles, bonuses,
-                                     user_group, subgroup, link, pfp, metadata, pending, status, password_hash)
+                                     user_group, subgroup, link, pfp_url, metadata, pending, status, password_hash)
                   VALUES (%s, %s, NULL, NULL, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                   ''', (
                       data['nickname'],
@@ -188,7 +201,7 @@ def post_user():
                       data['user_group'],
                       data['subgroup'],
                       link,
-                      pfp,
+                      media_url_from_value(cursor, pfp),
                       metadata,
                       pending,
                       status,
@@ -197,12 +210,15 @@ def post_user():
 
         user_id = cursor.lastrowid
         db.commit()
+        mark_user_stats_dirty()
 
         return jsonify({
             "message": "User created successfully",
             "user_id": user_id
         }), 201
 
+    except PasswordHashingBusy:
+        return busy_response("Server is busy, please retry")
     except Exception as e:
         print(e)
         return jsonify({"error": "Something went wrong"}), 500
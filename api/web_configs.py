@@ -2,11 +2,13 @@ from flask import Blueprint, request, jsonify
 from services.utils import login_required
 from datetime import datetime
 from database import get_db
+from services.response_cache import cached_response, bump_generation
 from services.db_utils import handle_db_locks
 
 web_configs_bp = Blueprint('web_configs', __name__)
 
 @web_configs_bp.route('/get/web_config/id/<int:config_id>', methods=['GET'])
+@cached_response('web_configs')
 @handle_db_locks(max_retries=5)
 def get_web_config_by_id(config_id):
     try:
@@ -33,6 +35,7 @@ def get_web_config_by_id(config_id):
         return jsonify({"error": "Something went wrong"}), 500
 
 @web_configs_bp.route('/get/web_config/state/<state>', methods=['GET'])
+@cached_response('web_configs')
 @handle_db_locks(max_retries=5)
 def get_web_configs_by_state(state):
     try:
@@ -102,6 +105,7 @@ def create_web_config():
 
         config_id = cursor.lastrowid
         db.commit()
+        bump_generation('web_configs')
 
         return jsonify({
             "message": "Web config created successfully",
@@ -128,6 +132,7 @@ def delete_web_config(config_id):
 
         cursor.execute("DELETE FROM web_configs WHERE id = %s", (config_id,))
         db.commit()
+        bump_generation('web_configs')
 
         return jsonify({"message": f"Web config {config_id} deleted successfully"}), 200
 
@@ -151,6 +156,7 @@ def update_web_config_state(config_id, state):
 
         cursor.execute("UPDATE web_configs SET state = %s WHERE id = %s", (state, config_id))
         db.commit()
+        bump_generation('web_configs')
 
         return jsonify({
             "message": f"Web config {config_id} state updated to {state}",
@@ -163,6 +169,7 @@ def update_web_config_state(config_id, state):
         return jsonify({"error": "Something went wrong"}), 500
 
 @web_configs_bp.route('/get/page_content/<page_name>', methods=['GET'])
+@cached_response('web_configs')
 @handle_db_locks(max_retries=5)
 def get_page_content(page_name):
     try:
@@ -233,6 +240,7 @@ def update_page_content(page_name):
             cursor.execute(update_query, update_values)
 
         db.commit()
+        bump_generation('web_configs')
         return jsonify({"message": f"Page {page_name} updated successfully"}), 200
 
     except Exception as e:
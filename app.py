@@ -1,6 +1,7 @@
-from flask import Flask, render_template, session, redirect, send_from_directory
+from flask import Flask, render_template, session, redirect, send_from_directory, request, Response
 from flask_cors import CORS
 import os
+import mimetypes
 from dotenv import load_dotenv
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -24,15 +25,27 @@ from admin.admin_bookings import admin_bookings_bp
 from admin.admin_weather import admin_weather_bp
 from admin.admin_users import admin_users_bp
 from api.about_us import about_us_bp
+from api.notifications import notifications_bp
+from api.media import media_bp
+from services.notification_outbox import start_dispatcher
+from services.oauth_refresh import start_token_refresher
+from services.assets import init_assets, negotiate_encoding, render_service_worker, IMMUTABLE_MAX_AGE, STATIC_MAX_AGE
 
 app = Flask(__name__)
 app = init_app(app)
+init_assets(app)
 
 app.teardown_appcontext(close_db)
 
 with app.app_context():
     init_db()
 
+if os.getenv('NOTIFICATION_DISPATCHER', 'true').lower() == 'true':
+    start_dispatcher(app)
+
+if os.getenv('OAUTH_REFRESHER', 'true').lower() == 'true':
+    start_token_refresher(app)
+
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(discord_bp, url_prefix='/auth')
 app.register_blueprint(roblox_bp, url_prefix='/auth')
@@ -46,25 +59,43 @@ app.register_blueprint(boarding_bp, url_prefix='/api')
 app.register_blueprint(transactions_bp, url_prefix='/api')
 app.register_blueprint(flight_configs_bp, url_prefix='/api')
 app.register_blueprint(about_us_bp, url_prefix='/api')
+app.register_blueprint(notifications_bp, url_prefix='/api')
+app.register_blueprint(media_bp, url_prefix='/api')
 app.register_blueprint(admin_bookings_bp, url_prefix='/admin/api')
 app.register_blueprint(admin_weather_bp, url_prefix='/admin/api')
 app.register_blueprint(admin_users_bp, url_prefix='/admin/api')
 
+@app.route('/static/dist/<path:filename>')
+def serve_dist(filename):
+    # Fingerprinted build output (python -m services.assets); pre-compressed copies are picked by Accept-Encoding
+    send_name, encoding = negotiate_encoding(filename, request.headers.get('Accept-Encoding'))
+    response = send_from_directory('static/dist', send_name, mimetype=mimetypes.guess_type(filename)[0],
+                                   download_name=os.path.basename(filename))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
 @app.route('/static/fonts/<path:filename>')
 def serve_fonts(filename):
-    return send_from_directory('static/fonts', filename)
+    return send_from_directory('static/fonts', filename, max_age=STATIC_MAX_AGE)
 
 @app.route('/static/other/<path:filename>')
 def serve_other(filename):
-    return send_from_directory('static/other', filename)
+    return send_from_directory('static/other', filename, max_age=STATIC_MAX_AGE)
 
 @app.route('/static/images/<path:filename>')
 def serve_images(filename):
-    return send_from_directory('static/images', filename)
+    return send_from_directory('static/images', filename, max_age=STATIC_MAX_AGE)
 
 @app.route('/static/styles/<path:filename>')
 def serve_styles(filename):
-    return send_from_directory('static/styles', filename)
+    return send_from_directory('static/styles', filename, max_age=STATIC_MAX_AGE)
+
+@app.route('/static/js/<path:filename>')
+def serve_js(filename):
+    return send_from_directory('static/js', filename, max_age=STATIC_MAX_AGE)
 
 @app.route('/manifest.json')
 def serve_manifest():
@@ -72,7 +103,10 @@ def serve_manifest():
 
 @app.route('/service-worker.js')
 def serve_service_worker():
-    return send_from_directory('', 'service-worker.js')
+    # Must not be cached itself, or browsers keep running an old worker with an old precache list
+    response = Response(render_service_worker(), mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/auth/discord')
 def discord_auth_redirect():
@@ -320,6 +354,24 @@ def admin_webhooks():
 
     return render_template('admin_webhooks.html')
 
+@app.route('/admin/notifications', methods=['GET'])
+def admin_notifications():
+    if 'user_id' not in session:
+        return redirect('/login')
+
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        'SELECT user_group FROM users WHERE id = %s',
+        (session['user_id'],)
+    )
+    user = cursor.fetchone()
+
+    if not user or user['user_group'] not in ['HQ', 'STF']:
+        return redirect('/')
+
+    return render_template('admin_notifications.html')
+
 @app.route('/admin/users', methods=['GET'])
 def admin_users():
     if 'user_id' not in session:
@@ -6,9 +6,29 @@ from datetime import datetime
 from urllib.parse import urlencode
 from services.utils import login_required
 from services.db_utils import handle_db_locks
+from services.http_client import get_session, DEFAULT_TIMEOUT
+from services.ttl_cache import TTLCache
 
 discord_bp = Blueprint('discord', __name__)
 
+DISCORD_API_URL = 'https://discord.com/api/v10'
+DISCORD_TOKEN_URL = 'https://discord.com/api/oauth2/token'
+
+# Guild role definitions rarely change; membership changes more often
+GUILD_ROLES_TTL = 5 * 60
+MEMBER_ROLES_TTL = 60
+
+guild_roles_cache = TTLCache(GUILD_ROLES_TTL, maxsize=64)
+member_roles_cache = TTLCache(MEMBER_ROLES_TTL, maxsize=4096)
+
+
+def discord_session():
+    return get_session('discord', pool_maxsize=20)
+
+
+def invalidate_discord_cache(user_id):
+    member_roles_cache.invalidate_where(lambda key: key[0] == user_id)
+
 @discord_bp.route('/discord')
 @handle_db_locks(max_retries=5)
 def auth_discord():
@@ -53,8 +73,9 @@ def auth_discord_callback():
         }
 
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        DISCORD_TOKEN_URL = 'https://discord.com/api/oauth2/token'
-        token_response = requests.post(DISCORD_TOKEN_URL, data=token_data, headers=headers)
+        token_response = discord_session().post(
+            app.config.get('DISCORD_TOKEN_URL') or DISCORD_TOKEN_URL, data=token_data, headers=headers, timeout=DEFAULT_TIMEOUT
+        )
         token_response.raise_for_status()
         token_json = token_response.json()
 
@@ -63,8 +84,9 @@ def auth_discord_callback():
         expires_in = token_json.get('expires_in', 24 * 60 * 60)
 
         user_headers = {'Authorization': f'Bearer {access_token}'}
-        DISCORD_API_URL = 'https://discord.com/api/v10'
-        user_response = requests.get(f'{DISCORD_API_URL}/users/@me', headers=user_headers)
+        user_response = discord_session().get(
+            f'{DISCORD_API_URL}/users/@me', headers=user_headers, timeout=DEFAULT_TIMEOUT
+        )
         user_response.raise_for_status()
         discord_user = user_response.json()
 
@@ -128,6 +150,7 @@ def auth_discord_callback():
                   ''', (discord_user['id'], user_id))
 
         db.commit()
+        invalidate_discord_cache(user_id)
         return redirect('/profile?success=discord_linked')
 
     except requests.RequestException as e:
@@ -182,6 +205,7 @@ def discord_connection():
 
             deleted_count = cursor.rowcount
             db.commit()
+            invalidate_discord_cache(user_id)
 
             if deleted_count > 0:
                 return jsonify({"message": "Discord connection removed successfully"}), 200
@@ -217,8 +241,9 @@ def discord_userinfo():
             return jsonify({"error": "Discord token expired, please reconnect"}), 401
 
         headers = {'Authorization': f'Bearer {access_token}'}
-        DISCORD_API_URL = 'https://discord.com/api/v10'
-        user_response = requests.get(f'{DISCORD_API_URL}/users/@me', headers=headers)
+        user_response = discord_session().get(
+            f'{DISCORD_API_URL}/users/@me', headers=headers, timeout=DEFAULT_TIMEOUT
+        )
 
         if user_response.status_code != 200:
             return jsonify({"error": "Failed to fetch Discord user info"}), 500
@@ -262,6 +287,7 @@ def discord_disconnect():
 
         deleted_count = cursor.rowcount
         db.commit()
+        invalidate_discord_cache(user_id)
 
         if deleted_count > 0:
             return jsonify({"message": "Discord account disconnected successfully"}), 200
@@ -272,6 +298,41 @@ def discord_disconnect():
         print(f"Discord disconnect error: {e}")
         return jsonify({"error": "Failed to disconnect Discord account"}), 500
 
+def fetch_guild_roles(guild_id, headers):
+    """{role_id: role} for the guild, cached for GUILD_ROLES_TTL"""
+    roles_by_id = guild_roles_cache.get(guild_id)
+    if roles_by_id is not None:
+        return roles_by_id
+
+    response = discord_session().get(
+        f'{DISCORD_API_URL}/guilds/{guild_id}/roles', headers=headers, timeout=DEFAULT_TIMEOUT
+    )
+    if response.status_code != 200:
+        print(f"Failed to fetch guild roles: {response.status_code}")
+        return None
+
+    roles_by_id = {role['id']: role for role in response.json()}
+    guild_roles_cache.set(guild_id, roles_by_id)
+    return roles_by_id
+
+
+def fetch_member_role_ids(user_id, guild_id, headers):
+    role_ids = member_roles_cache.get((user_id, guild_id))
+    if role_ids is not None:
+        return role_ids
+
+    response = discord_session().get(
+        f'{DISCORD_API_URL}/users/@me/guilds/{guild_id}/member', headers=headers, timeout=DEFAULT_TIMEOUT
+    )
+    if response.status_code != 200:
+        print(f"User {user_id} not in guild {guild_id} or no access")
+        return None
+
+    role_ids = response.json().get('roles', [])
+    member_roles_cache.set((user_id, guild_id), role_ids)
+    return role_ids
+
+
 def get_discord_user_roles(user_id, guild_id):
     try:
         db = get_db()
@@ -296,54 +357,37 @@ def get_discord_user_roles(user_id, guild_id):
             return None
 
         headers = {'Authorization': f'Bearer {access_token}'}
-        DISCORD_API_URL = 'https://discord.com/api/v10'
 
-        member_response = requests.get(
-            f'{DISCORD_API_URL}/users/@me/guilds/{guild_id}/member',
-            headers=headers
-        )
+        user_role_ids = fetch_member_role_ids(user_id, guild_id, headers)
+        if user_role_ids is None:
+            return None
 
-        if member_response.status_code == 200:
-            member_data = member_response.json()
-            user_role_ids = member_data.get('roles', [])
-
-            guild_roles_response = requests.get(
-                f'{DISCORD_API_URL}/guilds/{guild_id}/roles',
-                headers=headers
-            )
-
-            if guild_roles_response.status_code == 200:
-                all_roles = guild_roles_response.json()
-                user_roles = []
-                for role_id in user_role_ids:
-                    role_detail = next((role for role in all_roles if role['id'] == role_id), None)
-                    if role_detail:
-                        user_roles.append({
-                            'id': role_detail['id'],
-                            'name': role_detail['name'],
-                            'color': role_detail.get('color', 0),
-                            'position': role_detail.get('position', 0),
-                            'permissions': role_detail.get('permissions', '0')
-                        })
-
-                user_roles.sort(key=lambda x: x['position'], reverse=True)
-
-                result = {
-                    'guild_id': guild_id,
-                    'user_id': user_id,
-                    'roles': user_roles,
-                    'highest_role': user_roles[0] if user_roles else None,
-                    'role_ids': user_role_ids
-                }
-
-                return result
-            else:
-                print(f"Failed to fetch guild roles: {guild_roles_response.status_code}")
-                return None
-        else:
-            print(f"User {user_id} not in guild {guild_id} or no access")
+        roles_by_id = fetch_guild_roles(guild_id, headers)
+        if roles_by_id is None:
             return None
 
+        user_roles = []
+        for role_id in user_role_ids:
+            role_detail = roles_by_id.get(role_id)
+            if role_detail:
+                user_roles.append({
+                    'id': role_detail['id'],
+                    'name': role_detail['name'],
+                    'color': role_detail.get('color', 0),
+                    'position': role_detail.get('position', 0),
+                    'permissions': role_detail.get('permissions', '0')
+                })
+
+        user_roles.sort(key=lambda x: x['position'], reverse=True)
+
+        return {
+            'guild_id': guild_id,
+            'user_id': user_id,
+            'roles': user_roles,
+            'highest_role': user_roles[0] if user_roles else None,
+            'role_ids': user_role_ids
+        }
+
     except Exception as e:
         print(f"Error getting Discord roles: {e}")
         return None
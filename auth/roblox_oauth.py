@@ -6,6 +6,15 @@ from datetime import datetime
 from urllib.parse import urlencode
 from services.utils import login_required
 from services.db_utils import handle_db_locks
+from services.http_client import DEFAULT_TIMEOUT
+from services.oauth_refresh import DEFAULT_TOKEN_URLS
+from services.roblox_profiles import (
+    ROBLOX_USERINFO_URL, roblox_session, normalize_userinfo, save_profiles,
+    invalidate_profile, get_profile, get_profiles_bulk
+)
+
+# Upper bound for one bulk lookup; the users API is called in batches of 100 underneath
+ROBLOX_BULK_LIMIT = 500
 
 roblox_bp = Blueprint('roblox', __name__)
 
@@ -53,8 +62,8 @@ def auth_roblox_callback():
         }
 
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        ROBLOX_TOKEN_URL = 'https://apis.roblox.com/oauth/v1/token'
-        token_response = requests.post(ROBLOX_TOKEN_URL, data=token_data, headers=headers)
+        token_url = app.config.get('ROBLOX_TOKEN_URL') or DEFAULT_TOKEN_URLS['roblox']
+        token_response = roblox_session().post(token_url, data=token_data, headers=headers, timeout=DEFAULT_TIMEOUT)
         token_response.raise_for_status()
         token_json = token_response.json()
 
@@ -63,8 +72,7 @@ def auth_roblox_callback():
         expires_in = token_json.get('expires_in', 24 * 60 * 60)
 
         user_headers = {'Authorization': f'Bearer {access_token}'}
-        ROBLOX_API_URL = 'https://apis.roblox.com/oauth/v1/userinfo'
-        user_response = requests.get(ROBLOX_API_URL, headers=user_headers)
+        user_response = roblox_session().get(ROBLOX_USERINFO_URL, headers=user_headers, timeout=DEFAULT_TIMEOUT)
         user_response.raise_for_status()
         roblox_user = user_response.json()
 
@@ -131,6 +139,8 @@ def auth_roblox_callback():
                   ''', (roblox_user['sub'], user_id))
 
         db.commit()
+        # Seed the profile cache with the userinfo we already have
+        save_profiles({user_id: normalize_userinfo(roblox_user)})
         return redirect('/profile?success=roblox_linked')
 
     except requests.RequestException as e:
@@ -179,6 +189,7 @@ def roblox_connection():
 
             deleted_count = cursor.rowcount
             db.commit()
+            invalidate_profile(user_id)
 
             if deleted_count > 0:
                 return jsonify({"message": "Roblox connection removed successfully"}), 200
@@ -213,24 +224,11 @@ def roblox_userinfo():
         if expires_at and expires_at < datetime.now().timestamp():
             return jsonify({"error": "Roblox token expired, please reconnect"}), 401
 
-        headers = {'Authorization': f'Bearer {access_token}'}
-        ROBLOX_API_URL = 'https://apis.roblox.com/oauth/v1/userinfo'
-        user_response = requests.get(ROBLOX_API_URL, headers=headers)
-
-        if user_response.status_code != 200:
+        roblox_user = get_profile(user_id, access_token)
+        if not roblox_user:
             return jsonify({"error": "Failed to fetch Roblox user info"}), 500
 
-        roblox_user = user_response.json()
-
-        return jsonify({
-            "roblox_user": {
-                "id": roblox_user.get('sub'),
-                "name": roblox_user.get('name'),
-                "nickname": roblox_user.get('nickname'),
-                "preferred_username": roblox_user.get('preferred_username'),
-                "profile": roblox_user.get('profile')
-            }
-        }), 200
+        return jsonify({"roblox_user": roblox_user}), 200
 
     except Exception as e:
         print(f"Roblox userinfo error: {e}")
@@ -254,6 +252,7 @@ def roblox_disconnect():
 
         deleted_count = cursor.rowcount
         db.commit()
+        invalidate_profile(user_id)
 
         if deleted_count > 0:
             return jsonify({"message": "Roblox account disconnected successfully"}), 200
@@ -285,14 +284,8 @@ def get_roblox_user_info(user_id):
         if expires_at and expires_at < datetime.now().timestamp():
             return None
 
-        headers = {'Authorization': f'Bearer {access_token}'}
-        ROBLOX_API_URL = 'https://apis.roblox.com/oauth/v1/userinfo'
-        user_response = requests.get(ROBLOX_API_URL, headers=headers)
-
-        if user_response.status_code == 200:
-            return user_response.json()
-        else:
-            return None
+        # Full OIDC userinfo, as the internal endpoint has always returned
+        return get_profile(user_id, access_token, claims=True)
 
     except Exception as e:
         print(f"Error getting Roblox user info: {e}")
@@ -315,4 +308,38 @@ def internal_roblox_info():
             "success": False,
             "error": "Could not fetch Roblox user info"
         }), 400
-        
\ No newline at end of file
+        
+
+@roblox_bp.route('/api/internal/roblox_info/bulk', methods=['POST'])
+@login_required
+@handle_db_locks(max_retries=5)
+def internal_roblox_info_bulk():
+    try:
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute('SELECT user_group FROM users WHERE id = %s', (session['user_id'],))
+        user = cursor.fetchone()
+        if not user or user['user_group'] not in ['HQ', 'STF']:
+            return jsonify({"success": False, "error": "Access denied"}), 403
+
+        data = request.get_json(silent=True) or {}
+        user_ids = data.get('user_ids')
+        if not isinstance(user_ids, list) or not user_ids:
+            return jsonify({"success": False, "error": "user_ids must be a non-empty list"}), 400
+        if len(user_ids) > ROBLOX_BULK_LIMIT:
+            return jsonify({"success": False, "error": f"At most {ROBLOX_BULK_LIMIT} user_ids per request"}), 400
+
+        try:
+            user_ids = [int(user_id) for user_id in user_ids]
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "user_ids must be integers"}), 400
+
+        profiles = get_profiles_bulk(user_ids)
+        return jsonify({
+            "success": True,
+            "data": {str(user_id): profile for user_id, profile in profiles.items()}
+        }), 200
+
+    except Exception as e:
+        print(f"Roblox bulk info error: {e}")
+        return jsonify({"success": False, "error": "Something went wrong"}), 500
@@ -1,12 +1,25 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response, current_app
 from database import get_db, execute_with_retry
-import hashlib
 import secrets
 from services.utils import login_required, get_current_user
+from services.user_stats import mark_user_stats_dirty
+from services.passwords import (
+    verify_password, make_password_hash, needs_rehash, schedule_rehash, PasswordHashingBusy, busy_response
+)
+from services.rate_limit import login_limiter
+from services.metrics import registry
 import time
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def get_client_ip():
+    """X-Real-IP is client-controlled unless a trusted proxy sets it, so it is read only when configured"""
+    if current_app.config.get('TRUST_PROXY_HEADERS'):
+        return request.headers.get('X-Real-IP', request.remote_addr)
+    return request.remote_addr
+
+
 @auth_bp.route('/login', methods=['POST'])
 def auth_login():
     data = request.get_json()
@@ -19,20 +32,31 @@ def auth_login():
 
         if not username or not password:
             return jsonify({"error": "Username and password are required"}), 400
+        if not isinstance(username, str) or not isinstance(password, str):
+            return jsonify({"error": "Username and password must be strings"}), 400
+
+        limited = login_limiter.check(get_client_ip(), username)
+        if limited:
+            scope, retry_after = limited
+            response = jsonify({"error": "Too many login attempts, please try again later"})
+            response.headers['Retry-After'] = str(int(retry_after) + 1)
+            return response, 429
 
         db = get_db()
         cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE nickname = %s", (username,))
-        result = cursor.fetchone()
+        cursor.execute(
+            "SELECT id, nickname, user_group, subgroup, password_hash FROM users WHERE nickname = %s",
+            (username,)
+        )
+        user = cursor.fetchone()
 
-        if not result:
+        if not verify_password(password, user['password_hash'] if user else None):
             return jsonify({"error": "Invalid credentials"}), 401
 
-        user = result
+        login_limiter.reset_nickname(username)
 
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        if user['password_hash'] != password_hash:
-            return jsonify({"error": "Invalid credentials"}), 401
+        if needs_rehash(user['password_hash']):
+            schedule_rehash(user['id'], password, user['password_hash'])
 
         session_token = secrets.token_hex(32)
 
@@ -57,6 +81,8 @@ def auth_login():
 
         return jsonify(response_data), 200
 
+    except PasswordHashingBusy:
+        return busy_response("Too many login attempts right now, please retry")
     except Exception as e:
         print(f"Login error: {e}")
         return jsonify({"error": "Something went wrong"}), 500
@@ -87,7 +113,7 @@ def create_user():
         if existing_user:
             return jsonify({"error": "User with this nickname already exists"}), 409
 
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        password_hash = make_password_hash(password)
         created_at = int(time.time())
 
         cursor.execute('''
@@ -97,6 +123,7 @@ def create_user():
 
         user_id = cursor.lastrowid
         db.commit()
+        mark_user_stats_dirty()
 
         return jsonify({
             "message": "Registration successful",
@@ -107,6 +134,8 @@ def create_user():
             }
         }), 201
 
+    except PasswordHashingBusy:
+        return busy_response("Too many registrations right now, please retry")
     except Exception as e:
         print(f"Registration error: {e}")
         return jsonify({"error": "Something went wrong"}), 500
@@ -144,4 +173,12 @@ def get_user_session():
         "nickname": session.get('nickname'),
         "subgroup": session.get('subgroup')
     }), 200
-    
\ No newline at end of file
+    
+@auth_bp.route('/rate_limit/metrics', methods=['GET'])
+@login_required
+def get_rate_limit_metrics():
+    user = get_current_user()
+    if not user or user.get('user_group') not in ['HQ', 'STF']:
+        return jsonify({"error": "Access denied"}), 403
+
+    return Response(registry.render_text(prefix='login_'), mimetype='text/plain; version=0.0.4')
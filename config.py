@@ -7,6 +7,7 @@ def init_app(app):
     app.config['DISCORD_CLIENT_SECRET'] = os.getenv('DISCORD_CLIENT_SECRET')
     app.config['DISCORD_REDIRECT_URI'] = os.getenv('DISCORD_REDIRECT_URI')
     app.config['DISCORD_AUTH_URL'] = os.getenv('DISCORD_AUTH_URL')
+    app.config['DISCORD_TOKEN_URL'] = os.getenv('DISCORD_TOKEN_URL')
 
     app.config['ROBLOX_CLIENT_ID'] = os.getenv('ROBLOX_CLIENT_ID')
     app.config['ROBLOX_CLIENT_SECRET'] = os.getenv('ROBLOX_CLIENT_SECRET')
@@ -18,6 +19,8 @@ def init_app(app):
     app.config['DEBUG'] = os.getenv('DEBUG', 'False').lower() == 'true'
     app.config['PORT'] = int(os.getenv('PORT', 2121))
     app.config['DATABASE_URL'] = os.getenv('DATABASE_URL')
+    # Only enable behind a proxy that overwrites X-Real-IP (PythonAnywhere does); otherwise clients can spoof it
+    app.config['TRUST_PROXY_HEADERS'] = os.getenv('TRUST_PROXY_HEADERS', 'False').lower() == 'true'
 
     from flask_cors import CORS
     CORS(app, resources={
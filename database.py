@@ -274,6 +274,232 @@ def init_db():
             if "Duplicate key name" not in str(e):
                 print(f"⚠️ Could not create index (might already exist): {e}")
 
+        # Push subscriptions table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS push_subscriptions
+            (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT,
+                fcm_token VARCHAR(512) NOT NULL,
+                created_at BIGINT NOT NULL,
+                updated_at BIGINT,
+                UNIQUE KEY uq_push_subscriptions_token (fcm_token),
+                INDEX idx_push_subscriptions_user (user_id)
+            )
+        ''')
+        print("✅ Push subscriptions table created")
+
+        # Notification logs table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_logs
+            (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                admin_user_id INT NOT NULL,
+                title VARCHAR(255) NOT NULL,
+                body TEXT NOT NULL,
+                target VARCHAR(32) NOT NULL,
+                target_id VARCHAR(255),
+                outbox_id INT,
+                sent_at BIGINT NOT NULL,
+                INDEX idx_notification_logs_sent (sent_at)
+            )
+        ''')
+        print("✅ Notification logs table created")
+
+        # Notification outbox table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox
+            (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                target VARCHAR(32) NOT NULL,
+                target_id VARCHAR(255),
+                title VARCHAR(255) NOT NULL,
+                body TEXT NOT NULL,
+                data TEXT,
+                status VARCHAR(32) NOT NULL DEFAULT 'pending',
+                attempts INT NOT NULL DEFAULT 0,
+                next_attempt_at BIGINT NOT NULL,
+                locked_by VARCHAR(64),
+                locked_at BIGINT,
+                admin_user_id INT,
+                result TEXT,
+                last_error TEXT,
+                created_at BIGINT NOT NULL,
+                sent_at BIGINT,
+                INDEX idx_outbox_due (status, next_attempt_at)
+            )
+        ''')
+        print("✅ Notification outbox table created")
+
+        try:
+            cursor.execute('''
+                ALTER TABLE notification_outbox
+                ADD COLUMN dedup_key VARCHAR(255) NULL,
+                ADD UNIQUE KEY uq_outbox_dedup (dedup_key)
+            ''')
+            print("✅ Notification outbox dedup column created")
+        except Error as e:
+            if "Duplicate column name" not in str(e):
+                print(f"⚠️ Could not add outbox dedup column (might already exist): {e}")
+
+        for index_name, index_sql in [
+            ('idx_bookings_created', 'CREATE INDEX idx_bookings_created ON bookings(created_at, id)'),
+            ('idx_bookings_flight', 'CREATE INDEX idx_bookings_flight ON bookings(flight_number, valid)'),
+            ('idx_users_nickname', 'CREATE INDEX idx_users_nickname ON users(nickname(64))'),
+            ('idx_oauth_expires', 'CREATE INDEX idx_oauth_expires ON oauth_connections(expires_at)'),
+            ('idx_transactions_user', 'CREATE INDEX idx_transactions_user ON transactions(user_id, created_at, id)'),
+            ('idx_transactions_booking', 'CREATE INDEX idx_transactions_booking ON transactions(booking_id, created_at, id)'),
+        ]:
+            try:
+                cursor.execute(index_sql)
+                print(f"✅ {index_name} index created")
+            except Error as e:
+                if "Duplicate key name" not in str(e):
+                    print(f"⚠️ Could not create index {index_name} (might already exist): {e}")
+
+        # Admin user statistics snapshot
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_stats
+            (
+                id INT PRIMARY KEY,
+                data TEXT,
+                computed_at BIGINT NOT NULL DEFAULT 0,
+                changed_at BIGINT NOT NULL DEFAULT 0
+            )
+        ''')
+        print("✅ User stats table created")
+
+        # Response cache generation counters
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_generations
+            (
+                name VARCHAR(64) PRIMARY KEY,
+                generation BIGINT NOT NULL DEFAULT 0
+            )
+        ''')
+        print("✅ Cache generations table created")
+
+        # Weather API usage table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS weather_api_usage
+            (
+                day DATE PRIMARY KEY,
+                calls INT NOT NULL DEFAULT 0
+            )
+        ''')
+        print("✅ Weather API usage table created")
+
+        # Cached Roblox profiles, keyed by our user id
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS roblox_profiles
+            (
+                user_id INT PRIMARY KEY,
+                roblox_id VARCHAR(64) NOT NULL,
+                data TEXT NOT NULL,
+                fetched_at BIGINT NOT NULL
+            )
+        ''')
+        print("✅ Roblox profiles table created")
+
+        # Shared token buckets for LOGIN_RATE_BACKEND=mysql
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets
+            (
+                bucket_key VARCHAR(191) PRIMARY KEY,
+                tokens DOUBLE NOT NULL,
+                updated_at DOUBLE NOT NULL,
+                INDEX idx_rate_limit_updated (updated_at)
+            )
+        ''')
+        print("✅ Rate limit buckets table created")
+
+        # Content-addressed media store
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media
+            (
+                hash CHAR(64) PRIMARY KEY,
+                content_type VARCHAR(100) NOT NULL,
+                size INT NOT NULL,
+                data LONGBLOB NOT NULL,
+                created_at BIGINT NOT NULL
+            )
+        ''')
+        print("✅ Media table created")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_variants
+            (
+                source_hash CHAR(64) NOT NULL,
+                variant VARCHAR(32) NOT NULL,
+                media_hash CHAR(64) NOT NULL,
+                PRIMARY KEY (source_hash, variant)
+            )
+        ''')
+        print("✅ Media variants table created")
+
+        for table, column in [
+            ('users', 'pfp_url'),
+            ('about_us', 'image_url'),
+            ('pax_service', 'image_url'),
+            ('configs', 'image_url'),
+        ]:
+            try:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} VARCHAR(1024) NULL')
+                print(f"✅ {table}.{column} column created")
+            except Error as e:
+                if "Duplicate column name" not in str(e):
+                    print(f"⚠️ Could not add {table}.{column} column (might already exist): {e}")
+
+        try:
+            cursor.execute('ALTER TABLE oauth_connections ADD COLUMN refresh_after BIGINT NULL')
+            print("✅ oauth_connections.refresh_after column created")
+        except Error as e:
+            if "Duplicate column name" not in str(e):
+                print(f"⚠️ Could not add oauth_connections.refresh_after column (might already exist): {e}")
+
+        try:
+            cursor.execute('ALTER TABLE transactions ADD COLUMN idempotency_key VARCHAR(64) NULL')
+            print("✅ transactions.idempotency_key column created")
+        except Error as e:
+            if "Duplicate column name" not in str(e):
+                print(f"⚠️ Could not add transactions.idempotency_key column (might already exist): {e}")
+
+        try:
+            cursor.execute('CREATE UNIQUE INDEX uq_transactions_idempotency ON transactions (idempotency_key)')
+            print("✅ uq_transactions_idempotency index created")
+        except Error as e:
+            if "Duplicate key name" not in str(e):
+                print(f"⚠️ Could not create index uq_transactions_idempotency: {e}")
+
+        try:
+            cursor.execute('ALTER TABLE transactions ADD COLUMN balance_after DECIMAL(12,2) NULL')
+            print("✅ transactions.balance_after column created")
+        except Error as e:
+            if "Duplicate column name" not in str(e):
+                print(f"⚠️ Could not add transactions.balance_after column (might already exist): {e}")
+
+        try:
+            cursor.execute('ALTER TABLE transactions ADD COLUMN balance_estimated TINYINT(1) NOT NULL DEFAULT 0')
+            print("✅ transactions.balance_estimated column created")
+        except Error as e:
+            if "Duplicate column name" not in str(e):
+                print(f"⚠️ Could not add transactions.balance_estimated column (might already exist): {e}")
+
+        from services.ledger import migrate_transaction_balances
+        migrated = migrate_transaction_balances(conn)
+        if migrated:
+            print(f"✅ Backfilled running balance for {migrated} transactions")
+
+        from services.media import migrate_user_pfps, migrate_blob_column
+        for label, migrated in [
+            ('profile pictures', migrate_user_pfps(conn)),
+            ('about us images', migrate_blob_column(conn, 'about_us', 'image', 'image_url')),
+            ('pax service images', migrate_blob_column(conn, 'pax_service', 'image', 'image_url')),
+            ('config images', migrate_blob_column(conn, 'configs', 'image', 'image_url', images_only=True)),
+        ]:
+            if migrated:
+                print(f"✅ Moved {migrated} {label} to the media store")
+
         print("🎉 All MySQL tables created successfully")
         conn.commit()
         conn.close()
@@ -39,22 +39,45 @@ messaging.onBackgroundMessage((payload) => {
   return self.registration.showNotification(notificationTitle, notificationOptions);
 });
 
-const CACHE_NAME = 'aurus-pwa-v1';
-const urlsToCache = [
-  '/',
-  '/static/styles/base.css',
-  '/static/js/base.js',
-  '/static/images/icon-192x192.png',
-  '/static/images/icon-512x512.png'
+const PRECACHE = self.__PRECACHE_MANIFEST || { version: 'dev', urls: ['/'], assets: [] };
+const PRECACHE_CACHE = `aurus-precache-${PRECACHE.version}`;
+const RUNTIME_CACHE = 'aurus-runtime-v1';
+const PASSES_CACHE = 'aurus-passes-v1';
+const PAGES_CACHE = 'aurus-pages-v1';
+const KEEP_CACHES = [PRECACHE_CACHE, RUNTIME_CACHE, PASSES_CACHE, PAGES_CACHE];
+
+// Public read endpoints that are fine to show slightly stale while a fresh copy loads.
+// List endpoints match exactly so single-record URLs (e.g. /api/get/schedule/<id>) always hit the network
+const STALE_WHILE_REVALIDATE_PATHS = [
+  '/api/get/schedule',
+  '/api/get/all_meals',
+  '/api/get/about_us',
+  '/api/get/configs/seatmaps',
+  '/api/get/pax_services'
+];
+const STALE_WHILE_REVALIDATE_PREFIXES = [
+  '/api/get/meals/',
+  '/api/get/flight_configs/',
+  '/api/get/boarding_styles',
+  '/api/get/web_config/',
+  '/api/get/page_content/',
+  '/api/get/config/'
 ];
+// Admin pages edit what they load, so they never get a stale copy
+const ADMIN_PAGE_PREFIX = '/admin';
+const MAX_PAGES = 30;
+const BOARDING_PASS_PREFIX = '/api/get/boarding_pass/';
+// Seat or gate changes re-render the pass, so a cached pass is refetched once it is this old (when online)
+const BOARDING_PASS_MAX_AGE = 6 * 60 * 60 * 1000;
+const CACHED_AT_HEADER = 'sw-cached-at';
 
 self.addEventListener('install', (event) => {
   console.log('Service Worker: Installing...');
   event.waitUntil(
-    caches.open(CACHE_NAME)
+    caches.open(PRECACHE_CACHE)
       .then((cache) => {
-        console.log('Service Worker: Caching files');
-        return cache.addAll(urlsToCache);
+        console.log(`Service Worker: Precaching ${PRECACHE.urls.length} files`);
+        return cache.addAll(PRECACHE.urls);
       })
       .catch((error) => {
         console.error('Service Worker: Cache error:', error);
@@ -69,17 +92,183 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames.map((cache) => {
-          if (cache !== CACHE_NAME) {
-            console.log('Service Worker: Clearing old cache');
+          if (!KEEP_CACHES.includes(cache)) {
+            console.log('Service Worker: Clearing old cache', cache);
             return caches.delete(cache);
           }
         })
       );
-    })
+    }).then(() => pruneRuntimeAssets())
   );
   return self.clients.claim();
 });
 
+self.addEventListener('message', (event) => {
+  // Sent by the page on logout: passes and pages belong to the signed-in user
+  if (event.data?.type === 'clear-user-caches') {
+    event.waitUntil(Promise.all([caches.delete(PASSES_CACHE), caches.delete(PAGES_CACHE)]));
+  }
+});
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (request.method !== 'GET') {
+    // A write may change any cached read, so drop them once it has gone through
+    if (url.pathname.includes('/api/')) {
+      event.respondWith(fetchThenClearApiCache(event, request));
+    }
+    return;
+  }
+
+  if (url.pathname.startsWith('/static/dist/')) {
+    event.respondWith(cacheFirst(request, RUNTIME_CACHE));
+  } else if (url.pathname.startsWith(BOARDING_PASS_PREFIX)) {
+    event.respondWith(boardingPass(request));
+  } else if (isStaleWhileRevalidate(url) && !fromAdminPage(request)) {
+    event.respondWith(staleWhileRevalidate(event, request));
+  } else if (request.mode === 'navigate') {
+    event.respondWith(networkFirstPage(request));
+  }
+});
+
+function isStaleWhileRevalidate(url) {
+  return STALE_WHILE_REVALIDATE_PATHS.includes(url.pathname) ||
+    STALE_WHILE_REVALIDATE_PREFIXES.some((prefix) => url.pathname.startsWith(prefix));
+}
+
+function fromAdminPage(request) {
+  try {
+    return new URL(request.referrer).pathname.startsWith(ADMIN_PAGE_PREFIX);
+  } catch (error) {
+    return false;
+  }
+}
+
+async function pruneRuntimeAssets() {
+  // Without a build manifest there is nothing to compare against
+  if (!PRECACHE.assets?.length) {
+    return;
+  }
+  const current = new Set(PRECACHE.assets);
+  const cache = await caches.open(RUNTIME_CACHE);
+  const requests = await cache.keys();
+  await Promise.all(requests.map((request) => {
+    const path = new URL(request.url).pathname;
+    if (path.startsWith('/static/dist/') && !current.has(path)) {
+      return cache.delete(request);
+    }
+  }));
+}
+
+async function clearApiCache() {
+  const cache = await caches.open(RUNTIME_CACHE);
+  const requests = await cache.keys();
+  await Promise.all(requests
+    .filter((request) => new URL(request.url).pathname.startsWith('/api/'))
+    .map((request) => cache.delete(request)));
+}
+
+async function fetchThenClearApiCache(event, request) {
+  const response = await fetch(request);
+  if (response.ok) {
+    event.waitUntil(clearApiCache());
+  }
+  return response;
+}
+
+async function trimCache(cacheName, maxEntries) {
+  const cache = await caches.open(cacheName);
+  const requests = await cache.keys();
+  // keys() lists entries in insertion order, so the oldest go first
+  await Promise.all(requests.slice(0, Math.max(0, requests.length - maxEntries)).map((request) => cache.delete(request)));
+}
+
+async function cacheFirst(request, cacheName) {
+  const cached = await caches.match(request);
+  if (cached) {
+    return cached;
+  }
+
+  const response = await fetch(request);
+  if (response.ok) {
+    const cache = await caches.open(cacheName);
+    await cache.put(request, response.clone());
+  }
+  return response;
+}
+
+async function staleWhileRevalidate(event, request) {
+  const cache = await caches.open(RUNTIME_CACHE);
+  const cached = await cache.match(request);
+
+  const network = fetch(request)
+    .then(async (response) => {
+      if (response.ok) {
+        await cache.put(request, response.clone());
+      }
+      return response;
+    });
+
+  if (cached) {
+    event.waitUntil(network.catch(() => undefined));
+    return cached;
+  }
+  return network;
+}
+
+async function stampResponse(response) {
+  const headers = new Headers(response.headers);
+  headers.set(CACHED_AT_HEADER, String(Date.now()));
+  return new Response(await response.blob(), {
+    status: response.status,
+    statusText: response.statusText,
+    headers: headers
+  });
+}
+
+async function boardingPass(request) {
+  const cache = await caches.open(PASSES_CACHE);
+  const cached = await cache.match(request);
+  const cachedAt = Number(cached?.headers.get(CACHED_AT_HEADER) || 0);
+
+  if (cached && (Date.now() - cachedAt < BOARDING_PASS_MAX_AGE || !navigator.onLine)) {
+    return cached;
+  }
+
+  try {
+    const response = await fetch(request);
+    if (response.ok) {
+      await cache.put(request, await stampResponse(response.clone()));
+    }
+    return response;
+  } catch (error) {
+    if (cached) {
+      return cached;
+    }
+    throw error;
+  }
+}
+
+async function networkFirstPage(request) {
+  const cache = await caches.open(PAGES_CACHE);
+  try {
+    const response = await fetch(request);
+    if (response.ok && !response.redirected) {
+      await cache.delete(request);
+      await cache.put(request, response.clone());
+      await trimCache(PAGES_CACHE, MAX_PAGES);
+    }
+    return response;
+  } catch (error) {
+    return (await cache.match(request)) || (await caches.match('/')) || Response.error();
+  }
+}
+
 self.addEventListener('notificationclick', function (event) {
   console.log('Service Worker: Notification clicked', event.action);
   event.notification.close();
@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:
+    # gzip only; browsers that accept br fall back to it
+    brotli = None
+
+STATIC_DIR = 'static'
+ASSET_DIRS = ['fonts', 'images', 'other', 'styles', 'js']
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+PRECACHE_PATH = os.path.join(DIST_DIR, 'precache-manifest.json')
+SERVICE_WORKER_PATH = 'service-worker.js'
+DIST_URL = '/static/dist/'
+
+# Shell pages and assets the service worker installs up front; admin bundles are fetched on demand
+PRECACHE_PAGES = ['/']
+PRECACHE_DIRS = ('js/', 'styles/', 'fonts/', 'images/icon-', 'images/logo_')
+PRECACHE_EXCLUDE = ('js/admin_', 'styles/admin_')
+
+COMPRESSIBLE = {'.js', '.css', '.svg', '.ttf', '.ico', '.json', '.txt'}
+# Fingerprinted files never change under the same name
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Un-hashed /static paths still exist for templates rendered without a manifest
+STATIC_MAX_AGE = 60 * 60
+
+_manifest = None
+_manifest_mtime = None
+_manifest_lock = threading.Lock()
+
+_css_strings = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+_css_url = re.compile(r'''url\((['"]?)/static/([^'")]+)\1\)''')
+
+
+def minify_css(source):
+    """Drops comments and whitespace outside of quoted strings"""
+    parts = _css_strings.split(source)
+    for i in range(0, len(parts), 2):
+        chunk = re.sub(r'/\*.*?\*/', '', parts[i], flags=re.S)
+        chunk = re.sub(r'\s+', ' ', chunk)
+        chunk = re.sub(r'\s*([{};,>])\s*', r'\1', chunk)
+        chunk = re.sub(r':\s+', ':', chunk)
+        parts[i] = chunk.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def _template_state(line, in_template):
+    """Whether a line ends inside a `template literal`, skipping quotes and escapes"""
+    quote = '`' if in_template else None
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif line.startswith('//', i):
+            break
+        i += 1
+    return quote == '`'
+
+
+def minify_js(source):
+    """Conservative line-level minification: indentation, blank lines and whole-line // comments.
+
+    Lines inside multi-line template literals are kept verbatim since their whitespace is content."""
+    out = []
+    in_template = False
+    for line in source.splitlines():
+        if in_template:
+            out.append(line)
+        else:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('//'):
+                continue
+            out.append(stripped)
+        in_template = _template_state(line, in_template)
+    return '\n'.join(out) + '\n'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compress(path, data):
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        _write(path + '.gz', gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            _write(path + '.br', br)
+
+
+def source_files():
+    for directory in ASSET_DIRS:
+        root = os.path.join(STATIC_DIR, directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, STATIC_DIR).replace(os.sep, '/'), path
+
+
+def build_assets():
+    """Writes minified, fingerprinted and pre-compressed copies to static/dist plus manifest.json.
+
+    Fonts and images are processed before styles so url() references in CSS point at hashed files."""
+    manifest = {}
+    for name, path in source_files():
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        stem, ext = os.path.splitext(name)
+        if ext == '.css':
+            source = _css_url.sub(
+                lambda m: f"url({m.group(1)}{DIST_URL}{manifest.get(m.group(2), m.group(2))}{m.group(1)})"
+                if m.group(2) in manifest else m.group(0),
+                data.decode('utf-8')
+            )
+            data = minify_css(source).encode('utf-8')
+        elif ext == '.js':
+            data = minify_js(data.decode('utf-8')).encode('utf-8')
+
+        hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        target = os.path.join(DIST_DIR, hashed)
+        if not os.path.exists(target):
+            _write(target, data)
+            if ext in COMPRESSIBLE:
+                _compress(target, data)
+        manifest[name] = hashed
+
+    _write(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _write(PRECACHE_PATH, json.dumps(precache_manifest(manifest), indent=2).encode('utf-8'))
+    return manifest
+
+
+def precache_manifest(manifest):
+    """urls are installed up front; assets lists every current file so the worker can prune older runtime copies"""
+    assets = [DIST_URL + hashed for name, hashed in sorted(manifest.items())]
+    urls = [
+        DIST_URL + hashed for name, hashed in sorted(manifest.items())
+        if name.startswith(PRECACHE_DIRS) and not name.startswith(PRECACHE_EXCLUDE)
+    ]
+    # The version changes whenever any built file does, which makes browsers install the new worker
+    version = hashlib.sha256('\n'.join(assets).encode()).hexdigest()[:12]
+    return {'version': version, 'urls': PRECACHE_PAGES + urls, 'assets': assets}
+
+
+def render_service_worker():
+    """service-worker.js with the build's precache manifest prepended"""
+    try:
+        with open(PRECACHE_PATH, encoding='utf-8') as f:
+            precache = json.load(f)
+    except (OSError, ValueError):
+        precache = {'version': 'dev', 'urls': PRECACHE_PAGES, 'assets': []}
+
+    with open(SERVICE_WORKER_PATH, encoding='utf-8') as f:
+        worker = f.read()
+    return f'self.__PRECACHE_MANIFEST = {json.dumps(precache)};\n' + worker
+
+
+def manifest_is_stale():
+    if not os.path.exists(MANIFEST_PATH):
+        return True
+    built_at = os.path.getmtime(MANIFEST_PATH)
+    return any(os.path.getmtime(path) > built_at for _, path in source_files())
+
+
+def load_manifest():
+    """Manifest contents, re-read when a build replaces the file"""
+    global _manifest, _manifest_mtime
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return {}
+
+    if mtime != _manifest_mtime:
+        with _manifest_lock:
+            if mtime != _manifest_mtime:
+                with open(MANIFEST_PATH, encoding='utf-8') as f:
+                    _manifest = json.load(f)
+                _manifest_mtime = mtime
+    return _manifest
+
+
+def asset_url(name):
+    """Template helper: {{ asset_url('js/base.js') }} -> /static/dist/js/base.<hash>.js"""
+    hashed = load_manifest().get(name)
+    if hashed:
+        return DIST_URL + hashed
+    return f'/static/{name}'
+
+
+def negotiate_encoding(filename, accept_encoding):
+    """(filename to send, Content-Encoding or None) for a file under static/dist"""
+    accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').split(',')}
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.exists(os.path.join(DIST_DIR, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
+
+
+def init_assets(app):
+    if os.getenv('ASSETS_AUTO_BUILD', 'true').lower() == 'true' and manifest_is_stale():
+        try:
+            manifest = build_assets()
+            print(f"✅ Built {len(manifest)} static assets")
+        except Exception as e:
+            print(f"⚠️ Static asset build failed, serving un-hashed files: {e}")
+    app.jinja_env.globals['asset_url'] = asset_url
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    manifest = build_assets()
+    print(f"Built {len(manifest)} assets into {DIST_DIR} (brotli: {'yes' if brotli else 'no'})")
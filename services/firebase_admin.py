@@ -1,12 +1,93 @@
-import firebase_admin
-from firebase_admin import credentials, messaging
 import os
-import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from database import get_db
 
+# FCM accepts at most 500 tokens per multicast call
+MULTICAST_BATCH_SIZE = 500
+MULTICAST_WORKERS = 4
+
+# After a failed initialization, further attempts are skipped for this long (doubling up to the max)
+INIT_RETRY_BACKOFF = 30
+INIT_RETRY_BACKOFF_MAX = 15 * 60
+
+# The SDK is imported on first use so workers that never send pushes don't load it
+firebase_admin = None
+credentials = None
+messaging = None
+INVALID_TOKEN_ERRORS = ()
+TRANSIENT_ERRORS = ()
+
+
+def _load_sdk():
+    global firebase_admin, credentials, messaging, INVALID_TOKEN_ERRORS, TRANSIENT_ERRORS
+    if messaging is not None:
+        return
+
+    import firebase_admin as sdk
+    from firebase_admin import credentials as sdk_credentials, messaging as sdk_messaging
+    from firebase_admin import exceptions as firebase_exceptions
+
+    firebase_admin = sdk
+    credentials = sdk_credentials
+    # Only errors that condemn the token itself; InvalidArgumentError also covers bad payloads
+    INVALID_TOKEN_ERRORS = (
+        sdk_messaging.UnregisteredError,
+        sdk_messaging.SenderIdMismatchError
+    )
+    # Per-token failures that say nothing about the token itself
+    TRANSIENT_ERRORS = (
+        firebase_exceptions.UnavailableError,
+        firebase_exceptions.InternalError,
+        firebase_exceptions.DeadlineExceededError,
+        firebase_exceptions.ResourceExhaustedError
+    )
+    messaging = sdk_messaging
+
 
 class FirebaseAdmin:
     _initialized = False
+    _failures = 0
+    _retry_at = 0
+    _last_error = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def ensure_initialized(cls):
+        """Initializes the SDK on first use; returns False while in the failure backoff window"""
+        if cls._initialized:
+            return True
+        if time.time() < cls._retry_at:
+            return False
+
+        with cls._lock:
+            if not cls._initialized and time.time() >= cls._retry_at:
+                cls.initialize()
+                if cls._initialized:
+                    cls._failures = 0
+                    cls._retry_at = 0
+                else:
+                    cls._failures += 1
+                    cls._retry_at = time.time() + min(
+                        INIT_RETRY_BACKOFF_MAX,
+                        INIT_RETRY_BACKOFF * (2 ** (cls._failures - 1))
+                    )
+        return cls._initialized
+
+    @classmethod
+    def _require(cls):
+        if not cls.ensure_initialized():
+            raise Exception(f"Firebase Admin not initialized: {cls._last_error}")
+
+    @classmethod
+    def status(cls):
+        return {
+            'initialized': cls._initialized,
+            'failures': cls._failures,
+            'retry_in': max(0, int(cls._retry_at - time.time())) if cls._retry_at else 0,
+            'last_error': cls._last_error
+        }
 
     @classmethod
     def initialize(cls):
@@ -14,6 +95,8 @@ class FirebaseAdmin:
             return
 
         try:
+            _load_sdk()
+
             # Для PythonAnywhere используем переменные окружения
             service_account_info = {
                 "type": "service_account",
@@ -34,25 +117,28 @@ class FirebaseAdmin:
                     cred = credentials.Certificate('firebase-service-account.json')
                 except:
                     print("❌ No Firebase service account configuration found")
+                    cls._last_error = 'No service account configuration'
                     cls._initialized = False
                     return
             else:
                 cred = credentials.Certificate(service_account_info)
 
-            firebase_admin.initialize_app(cred)
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                firebase_admin.initialize_app(cred)
             cls._initialized = True
+            cls._last_error = None
             print("✅ Firebase Admin SDK initialized successfully")
 
         except Exception as e:
             print(f"❌ Firebase Admin SDK initialization failed: {e}")
+            cls._last_error = str(e)
             cls._initialized = False
 
     @classmethod
     def send_to_token(cls, token, title, body, data=None):
-        if not cls._initialized:
-            cls.initialize()
-            if not cls._initialized:
-                raise Exception("Firebase Admin not initialized")
+        cls._require()
 
         try:
             message = messaging.Message(
@@ -62,14 +148,7 @@ class FirebaseAdmin:
                 ),
                 data=data or {},
                 token=token,
-                apns=messaging.APNSConfig(
-                    payload=messaging.APNSPayload(
-                        aps=messaging.Aps(
-                            badge=1,
-                            sound='default'
-                        )
-                    )
-                )
+                apns=cls._apns_config()
             )
 
             response = messaging.send(message)
@@ -82,10 +161,7 @@ class FirebaseAdmin:
 
     @classmethod
     def send_to_topic(cls, topic, title, body, data=None):
-        if not cls._initialized:
-            cls.initialize()
-            if not cls._initialized:
-                raise Exception("Firebase Admin not initialized")
+        cls._require()
 
         try:
             message = messaging.Message(
@@ -106,40 +182,131 @@ class FirebaseAdmin:
             raise e
 
     @classmethod
-    def send_to_user(cls, user_id, title, body, data=None):
-        """Отправляет уведомление всем устройствам пользователя"""
-        if not cls._initialized:
-            cls.initialize()
+    def _apns_config(cls):
+        return messaging.APNSConfig(
+            payload=messaging.APNSPayload(
+                aps=messaging.Aps(
+                    badge=1,
+                    sound='default'
+                )
+            )
+        )
+
+    @classmethod
+    def _send_batch(cls, tokens, title, body, data=None):
+        message = messaging.MulticastMessage(
+            notification=messaging.Notification(
+                title=title,
+                body=body,
+            ),
+            data=data or {},
+            tokens=tokens,
+            apns=cls._apns_config()
+        )
+        return messaging.send_each_for_multicast(message)
+
+    @classmethod
+    def send_multicast(cls, tokens, title, body, data=None):
+        """Отправляет уведомление списку токенов пачками по MULTICAST_BATCH_SIZE.
+
+        Возвращает {'success_count', 'failure_count', 'transport_failures', 'results': {token: {...}}, 'invalid_tokens': [...]}
+        transport_failures считает токены, не доставленные из-за сбоя FCM или сети, а не из-за самого токена
+        """
+        cls._require()
+
+        tokens = list(dict.fromkeys(token for token in tokens if token))
+        batches = [tokens[i:i + MULTICAST_BATCH_SIZE] for i in range(0, len(tokens), MULTICAST_BATCH_SIZE)]
+
+        results = {}
+        invalid_tokens = []
+
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(MULTICAST_WORKERS, len(batches))) as executor:
+                futures = {
+                    executor.submit(cls._send_batch, batch, title, body, data): batch
+                    for batch in batches
+                }
+
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        batch_response = future.result()
+                    except Exception as e:
+                        print(f"❌ Multicast batch of {len(batch)} tokens failed: {e}")
+                        for token in batch:
+                            results[token] = {'success': False, 'error': str(e), 'transport': True}
+                        continue
+
+                    for token, response in zip(batch, batch_response.responses):
+                        if response.success:
+                            results[token] = {'success': True, 'message_id': response.message_id}
+                        else:
+                            results[token] = {
+                                'success': False,
+                                'error': str(response.exception),
+                                'transport': isinstance(response.exception, TRANSIENT_ERRORS)
+                            }
+                            if isinstance(response.exception, INVALID_TOKEN_ERRORS):
+                                invalid_tokens.append(token)
+
+        success_count = sum(1 for result in results.values() if result['success'])
+        transport_failures = sum(1 for result in results.values() if result.get('transport'))
+        print(f"✅ Multicast sent: {success_count}/{len(tokens)} delivered in {len(batches)} batch(es)")
+
+        return {
+            'success_count': success_count,
+            'failure_count': len(tokens) - success_count,
+            'transport_failures': transport_failures,
+            'results': results,
+            'invalid_tokens': invalid_tokens
+        }
+
+    @classmethod
+    def remove_invalid_tokens(cls, tokens):
+        if not tokens:
+            return 0
 
         try:
             db = get_db()
-            tokens = db.execute(
-                'SELECT fcm_token FROM push_subscriptions WHERE user_id = ? AND fcm_token IS NOT NULL',
-                (user_id,)
-            ).fetchall()
+            cursor = db.cursor()
+            placeholders = ','.join(['%s'] * len(tokens))
+            cursor.execute(
+                f'DELETE FROM push_subscriptions WHERE fcm_token IN ({placeholders})',
+                list(tokens)
+            )
+            db.commit()
+            print(f"🗑️ Removed {cursor.rowcount} invalid tokens")
+            return cursor.rowcount
+        except Exception as e:
+            print(f"Error removing invalid tokens: {e}")
+            return 0
 
-            if not tokens:
-                print(f"⚠️ No tokens found for user {user_id}")
-                return None
+    @classmethod
+    def _send_to_subscriptions(cls, query, params, title, body, data=None):
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(query, params)
+        tokens = [row['fcm_token'] for row in cursor.fetchall()]
 
-            results = []
-            for token_row in tokens:
-                try:
-                    result = cls.send_to_token(token_row['fcm_token'], title, body, data)
-                    results.append(result)
-                except Exception as e:
-                    print(f"❌ Failed to send to token {token_row['fcm_token']}: {e}")
-                    # Удаляем невалидный токен
-                    try:
-                        db.execute(
-                            'DELETE FROM push_subscriptions WHERE fcm_token = ?',
-                            (token_row['fcm_token'],)
-                        )
-                        db.commit()
-                    except:
-                        pass
+        if not tokens:
+            return None
 
-            return results
+        result = cls.send_multicast(tokens, title, body, data)
+        result['removed_tokens'] = cls.remove_invalid_tokens(result['invalid_tokens'])
+        return result
+
+    @classmethod
+    def send_to_user(cls, user_id, title, body, data=None):
+        """Отправляет уведомление всем устройствам пользователя"""
+        try:
+            result = cls._send_to_subscriptions(
+                'SELECT fcm_token FROM push_subscriptions WHERE user_id = %s AND fcm_token IS NOT NULL',
+                (user_id,),
+                title, body, data
+            )
+            if result is None:
+                print(f"⚠️ No tokens found for user {user_id}")
+            return result
 
         except Exception as e:
             print(f"❌ Error sending to user {user_id}: {e}")
@@ -148,44 +315,15 @@ class FirebaseAdmin:
     @classmethod
     def send_broadcast(cls, title, body, data=None):
         """Отправляет уведомление всем подписанным пользователям"""
-        if not cls._initialized:
-            cls.initialize()
-
         try:
-            db = get_db()
-            tokens = db.execute(
-                'SELECT fcm_token FROM push_subscriptions WHERE fcm_token IS NOT NULL'
-            ).fetchall()
-
-            if not tokens:
+            result = cls._send_to_subscriptions(
+                'SELECT fcm_token FROM push_subscriptions WHERE fcm_token IS NOT NULL',
+                (),
+                title, body, data
+            )
+            if result is None:
                 print("⚠️ No tokens found for broadcast")
-                return None
-
-            results = []
-            invalid_tokens = []
-
-            for token_row in tokens:
-                try:
-                    result = cls.send_to_token(token_row['fcm_token'], title, body, data)
-                    results.append(result)
-                except Exception as e:
-                    print(f"❌ Failed to send to token {token_row['fcm_token']}: {e}")
-                    invalid_tokens.append(token_row['fcm_token'])
-
-            # Удаляем невалидные токены
-            if invalid_tokens:
-                try:
-                    placeholders = ','.join(['?' for _ in invalid_tokens])
-                    db.execute(
-                        f'DELETE FROM push_subscriptions WHERE fcm_token IN ({placeholders})',
-                        invalid_tokens
-                    )
-                    db.commit()
-                    print(f"🗑️ Removed {len(invalid_tokens)} invalid tokens")
-                except Exception as e:
-                    print(f"Error removing invalid tokens: {e}")
-
-            return results
+            return result
 
         except Exception as e:
             print(f"❌ Error sending broadcast: {e}")
@@ -193,10 +331,8 @@ class FirebaseAdmin:
 
     @classmethod
     def subscribe_to_topic(cls, tokens, topic):
-        if not cls._initialized:
-            cls.initialize()
-            if not cls._initialized:
-                return None
+        if not cls.ensure_initialized():
+            return None
 
         try:
             response = messaging.subscribe_to_topic(tokens, topic)
@@ -208,10 +344,8 @@ class FirebaseAdmin:
 
     @classmethod
     def unsubscribe_from_topic(cls, tokens, topic):
-        if not cls._initialized:
-            cls.initialize()
-            if not cls._initialized:
-                return None
+        if not cls.ensure_initialized():
+            return None
 
         try:
             response = messaging.unsubscribe_from_topic(tokens, topic)
@@ -220,7 +354,3 @@ class FirebaseAdmin:
         except Exception as e:
             print(f"❌ Error unsubscribing from topic: {e}")
             return None
-
-
-# Автоматическая инициализация при импорте
-FirebaseAdmin.initialize()
\ No newline at end of file
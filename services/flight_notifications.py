@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+from database import get_db
+from services.notification_outbox import enqueue_notification, get_pending_data
+
+# Rapid successive edits of the same flight collapse into one notification
+FLIGHT_UPDATE_DEBOUNCE = 60
+
+WATCHED_FIELDS = ('status', 'datetime')
+
+
+def count_affected_users(flight_number):
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        'SELECT COUNT(DISTINCT user_id) as users FROM bookings WHERE flight_number = %s AND valid = 1',
+        (flight_number,)
+    )
+    return cursor.fetchone()['users']
+
+
+def flight_subscriber_tokens(flight_number):
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute('''
+        SELECT DISTINCT ps.fcm_token
+        FROM bookings b
+                 JOIN push_subscriptions ps ON ps.user_id = b.user_id
+        WHERE b.flight_number = %s
+          AND b.valid = 1
+    ''', (flight_number,))
+    return [row['fcm_token'] for row in cursor.fetchall()]
+
+
+def describe_change(flight, updates):
+    changes = []
+    if 'status' in updates:
+        changes.append(f"статус: {updates['status']}")
+    if 'datetime' in updates:
+        new_time = datetime.fromtimestamp(int(updates['datetime']), tz=timezone.utc).strftime('%d.%m %H:%M')
+        changes.append(f"вылет: {new_time} UTC")
+    return f"Рейс {flight['flight_number']} ({flight['departure']} → {flight['arrival']}): " + ', '.join(changes)
+
+
+def notify_flight_change(flight, data):
+    """Queues a notification to the flight's passengers if status or departure time changed.
+
+    An edit within the debounce window is merged into the pending notification, so fields
+    changed by earlier edits are still reported.
+    """
+    updates = {
+        field: data[field] for field in WATCHED_FIELDS
+        if field in data and str(data[field]) != str(flight[field])
+    }
+    if not updates:
+        return None
+
+    flight_number = flight['flight_number']
+    if count_affected_users(flight_number) == 0:
+        return None
+
+    dedup_key = f'flight_update:{flight_number}'
+    pending = get_pending_data(dedup_key) or {}
+    for field in pending.get('changes', '').split(','):
+        # flight already holds the value saved by that earlier edit
+        if field in WATCHED_FIELDS and field not in updates:
+            updates[field] = flight[field]
+
+    status = updates.get('status', flight['status'])
+    departure_time = updates.get('datetime', flight['datetime'])
+
+    return enqueue_notification(
+        'flight',
+        f"✈️ Изменения по рейсу {flight_number}",
+        describe_change(flight, updates),
+        data={
+            'url': '/profile',
+            'type': 'flight_update',
+            'flight_number': str(flight_number),
+            'status': str(status),
+            'datetime': str(departure_time),
+            'changes': ','.join(field for field in WATCHED_FIELDS if field in updates)
+        },
+        target_id=flight_number,
+        dedup_key=dedup_key,
+        delay=FLIGHT_UPDATE_DEBOUNCE
+    )
+
+
+def deliver_flight_update(message):
+    """Multicasts to the devices of passengers holding a valid booking at send time.
+
+    Tokens are looked up on every delivery, so cancelled bookings stop receiving updates.
+    Returns None when nobody is subscribed, like FirebaseAdmin.send_to_user.
+    """
+    from services.firebase_admin import FirebaseAdmin
+
+    tokens = flight_subscriber_tokens(message['target_id'])
+    if not tokens:
+        return None
+
+    result = FirebaseAdmin.send_multicast(tokens, message['title'], message['body'], message['data'])
+    result['removed_tokens'] = FirebaseAdmin.remove_invalid_tokens(result['invalid_tokens'])
+    return result
@@ -0,0 +1,104 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (3.05, 10)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name='default', pool_maxsize=10):
+    """Shared keep-alive requests.Session, one per upstream name"""
+    session = _sessions.get(name)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[name] = session
+    return session
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures.
+
+    closed -> open after `failure_threshold` consecutive failures,
+    open -> half_open after `reset_timeout` seconds (one trial call),
+    half_open -> closed on success, back to open on failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN:
+                if time.time() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"⚠️ Circuit breaker '{self.name}' opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.time()
+
+    def retry_after(self):
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            return max(0, int(self.reset_timeout - (time.time() - self._opened_at)))
+
+    def snapshot(self):
+        return {
+            'name': self.name,
+            'state': self.state,
+            'consecutive_failures': self._failures,
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout': self.reset_timeout,
+            'retry_after': self.retry_after()
+        }
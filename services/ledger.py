@@ -0,0 +1,476 @@
+import csv
+import io
+import math
+import time
+import uuid
+from datetime import datetime
+from mysql.connector import Error, errorcode
+from database import get_db
+
+MAX_AMOUNT = 1000000
+MAX_BULK_TRANSACTIONS = 500
+# Deadlocks and lock wait timeouts roll the whole DB transaction back, so it is safe to rerun
+RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+MAX_ATTEMPTS = 3
+
+
+class LedgerError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def new_idempotency_key():
+    return f'auto:{uuid.uuid4().hex}'
+
+
+def validate_entry(data):
+    """Normalized ledger entry, or raises LedgerError"""
+    for field in ['user_id', 'amount', 'description', 'type']:
+        if field not in data:
+            raise LedgerError(f"Missing required field: {field}")
+
+    try:
+        user_id = int(data['user_id'])
+    except (TypeError, ValueError):
+        raise LedgerError("Invalid user_id")
+
+    amount = data['amount']
+    # NaN and infinity compare False against MAX_AMOUNT, so they are rejected explicitly
+    if (isinstance(amount, bool) or not isinstance(amount, (int, float))
+            or not math.isfinite(amount) or abs(amount) > MAX_AMOUNT):
+        raise LedgerError("Invalid amount")
+    # users.miles is an INT, so round once here (half away from zero, as MySQL does) and let the
+    # stored amount, balance_after and the miles update all use the same whole number
+    amount = int(math.copysign(math.floor(abs(amount) + 0.5), amount))
+
+    key = data.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= 64):
+        raise LedgerError("idempotency_key must be a string of at most 64 characters")
+
+    # bookings.id is a string; JSON clients may send it as a number
+    booking_id = data.get('booking_id')
+    if booking_id is not None:
+        booking_id = str(booking_id).strip() or None
+
+    return {
+        'user_id': user_id,
+        'booking_id': booking_id,
+        'amount': amount,
+        'description': data['description'],
+        'type': data['type'],
+        'idempotency_key': key or new_idempotency_key()
+    }
+
+
+STORED_COLUMNS = 'id, user_id, booking_id, amount, description, type, idempotency_key, balance_after'
+# A key reused with any of these changed is a different transaction, not a retry
+REPLAY_FIELDS = ('user_id', 'booking_id', 'amount', 'type')
+
+
+def _number(value):
+    if value is None:
+        return None
+    return int(value) if value == int(value) else float(value)
+
+
+def replay_conflict(entry, stored):
+    """Error message if entry reuses the idempotency_key of a different stored transaction, else None"""
+    for field in REPLAY_FIELDS:
+        if stored[field] != entry[field]:
+            return f"idempotency_key {entry['idempotency_key']} was already used with a different {field}"
+    return None
+
+
+def stored_result(stored):
+    """Result for a replayed entry, describing the row posted the first time"""
+    return {
+        'id': stored['id'],
+        'replayed': True,
+        'user_id': stored['user_id'],
+        'booking_id': stored['booking_id'],
+        'amount': _number(stored['amount']),
+        'description': stored['description'],
+        'type': stored['type'],
+        'idempotency_key': stored['idempotency_key'],
+        'new_balance': _number(stored['balance_after'])
+    }
+
+
+def _insert_entry(cursor, entry, admin_user_id, created_at, balance_after):
+    """Inserts one row; returns (transaction_id, stored row or None).
+
+    The stored row is returned when the idempotency_key was already posted; a key reused
+    for a different transaction raises LedgerError."""
+    try:
+        cursor.execute('''
+            INSERT INTO transactions (user_id, booking_id, amount, description, type, admin_user_id,
+                                      created_at, idempotency_key, balance_after)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ''', (
+            entry['user_id'],
+            entry['booking_id'],
+            entry['amount'],
+            entry['description'],
+            entry['type'],
+            admin_user_id,
+            created_at,
+            entry['idempotency_key'],
+            balance_after
+        ))
+        return cursor.lastrowid, None
+    except Error as e:
+        if e.errno != errorcode.ER_DUP_ENTRY:
+            raise
+        # Only the failed statement is rolled back; the surrounding transaction stays open
+        cursor.execute(f'SELECT {STORED_COLUMNS} FROM transactions WHERE idempotency_key = %s',
+                       (entry['idempotency_key'],))
+        stored = cursor.fetchone()
+        conflict = replay_conflict(entry, stored)
+        if conflict:
+            raise LedgerError(conflict, 409)
+        return stored['id'], stored
+
+
+def _apply(entries, admin_user_id):
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    created_at = int(datetime.now().timestamp())
+
+    db.start_transaction()
+    try:
+        user_ids = sorted({entry['user_id'] for entry in entries})
+        placeholders = ','.join(['%s'] * len(user_ids))
+        # Lock balances in id order so concurrent bulk posts cannot deadlock on each other
+        cursor.execute(f'SELECT id, miles FROM users WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE', user_ids)
+        balances = {row['id']: row['miles'] for row in cursor.fetchall()}
+        missing = [user_id for user_id in user_ids if user_id not in balances]
+        if missing:
+            raise LedgerError(f"User not found: {missing[0]}", 404)
+
+        booking_ids = sorted({entry['booking_id'] for entry in entries if entry['booking_id']})
+        if booking_ids:
+            placeholders = ','.join(['%s'] * len(booking_ids))
+            cursor.execute(f'SELECT id FROM bookings WHERE id IN ({placeholders})', booking_ids)
+            found = {row['id'] for row in cursor.fetchall()}
+            missing = [booking_id for booking_id in booking_ids if booking_id not in found]
+            if missing:
+                raise LedgerError(f"Booking not found: {missing[0]}", 404)
+
+        results = []
+        deltas = {}
+        for entry in entries:
+            # The balance rows are locked, so the running balance computed here is the one the UPDATE produces
+            balance_after = balances[entry['user_id']] + entry['amount']
+            transaction_id, stored = _insert_entry(cursor, entry, admin_user_id, created_at, balance_after)
+            if stored:
+                results.append(stored_result(stored))
+            else:
+                results.append({'id': transaction_id, 'replayed': False, **entry})
+                balances[entry['user_id']] = balance_after
+                deltas[entry['user_id']] = deltas.get(entry['user_id'], 0) + entry['amount']
+
+        for user_id, delta in deltas.items():
+            cursor.execute('UPDATE users SET miles = miles + %s WHERE id = %s', (delta, user_id))
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    for result in results:
+        if not result['replayed']:
+            result['new_balance'] = balances[result['user_id']]
+    return results, bool(deltas)
+
+
+def post_transactions(entries, admin_user_id):
+    """Inserts the entries and moves the balances in one DB transaction.
+
+    Entries whose idempotency_key was already posted are not applied again; they are reported
+    with replayed=True and the stored row's values. Returns (results, changed)."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return _apply(entries, admin_user_id)
+        except Error as e:
+            if e.errno in RETRYABLE_ERRORS and attempt < MAX_ATTEMPTS - 1:
+                time.sleep(0.2 * (attempt + 1))
+                continue
+            raise
+
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ROWS = 10000
+IMPORT_COLUMNS = ['user_id', 'amount', 'description', 'type', 'booking_id', 'idempotency_key']
+ACCRUAL_STATUSES = ('Arrived',)
+
+
+def parse_csv_rows(text):
+    """CSV with an IMPORT_COLUMNS header -> list of dicts; unparseable numbers are left for validate_entry to reject"""
+    rows = []
+    for row in csv.DictReader(io.StringIO(text)):
+        item = {key: value.strip() for key, value in row.items() if key in IMPORT_COLUMNS and value and value.strip()}
+        for field, cast in [('user_id', int), ('amount', float)]:
+            if field in item:
+                try:
+                    item[field] = cast(item[field])
+                    if field == 'amount' and item[field].is_integer():
+                        item[field] = int(item[field])
+                except ValueError:
+                    pass
+        rows.append(item)
+    return rows
+
+
+def _existing_keys(cursor, keys):
+    if not keys:
+        return {}
+    placeholders = ','.join(['%s'] * len(keys))
+    cursor.execute(f'SELECT {STORED_COLUMNS} FROM transactions WHERE idempotency_key IN ({placeholders})', keys)
+    return {row['idempotency_key']: row for row in cursor.fetchall()}
+
+
+def _import_batch(batch, admin_user_id):
+    """batch: [(row_index, entry)]; one DB transaction, multi-row INSERT via executemany"""
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    created_at = int(datetime.now().timestamp())
+    results = {}
+
+    db.start_transaction()
+    try:
+        user_ids = sorted({entry['user_id'] for _, entry in batch})
+        placeholders = ','.join(['%s'] * len(user_ids))
+        cursor.execute(f'SELECT id, miles FROM users WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE', user_ids)
+        balances = {row['id']: row['miles'] for row in cursor.fetchall()}
+
+        booking_ids = sorted({entry['booking_id'] for _, entry in batch if entry['booking_id']})
+        bookings = set()
+        if booking_ids:
+            placeholders = ','.join(['%s'] * len(booking_ids))
+            cursor.execute(f'SELECT id FROM bookings WHERE id IN ({placeholders})', booking_ids)
+            bookings = {row['id'] for row in cursor.fetchall()}
+
+        existing = _existing_keys(cursor, [entry['idempotency_key'] for _, entry in batch])
+
+        to_insert = []
+        for index, entry in batch:
+            if entry['user_id'] not in balances:
+                results[index] = {'status': 'error', 'error': f"User not found: {entry['user_id']}"}
+            elif entry['booking_id'] and entry['booking_id'] not in bookings:
+                results[index] = {'status': 'error', 'error': f"Booking not found: {entry['booking_id']}"}
+            elif entry['idempotency_key'] in existing:
+                stored = existing[entry['idempotency_key']]
+                conflict = replay_conflict(entry, stored)
+                if conflict:
+                    results[index] = {'status': 'error', 'error': conflict}
+                else:
+                    results[index] = {'status': 'replayed', 'id': stored['id'],
+                                      'new_balance': _number(stored['balance_after'])}
+            else:
+                to_insert.append((index, entry))
+
+        deltas = {}
+        if to_insert:
+            values = []
+            balance_after_by_index = {}
+            for index, entry in to_insert:
+                balances[entry['user_id']] += entry['amount']
+                balance_after_by_index[index] = balances[entry['user_id']]
+                deltas[entry['user_id']] = deltas.get(entry['user_id'], 0) + entry['amount']
+                values.append((
+                    entry['user_id'], entry['booking_id'], entry['amount'], entry['description'],
+                    entry['type'], admin_user_id, created_at, entry['idempotency_key'], balances[entry['user_id']]
+                ))
+
+            cursor.executemany('''
+                INSERT INTO transactions (user_id, booking_id, amount, description, type, admin_user_id,
+                                          created_at, idempotency_key, balance_after)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ''', values)
+
+            cursor.executemany(
+                'UPDATE users SET miles = miles + %s WHERE id = %s',
+                [(delta, user_id) for user_id, delta in deltas.items()]
+            )
+
+            inserted = _existing_keys(cursor, [entry['idempotency_key'] for _, entry in to_insert])
+            for index, entry in to_insert:
+                results[index] = {'status': 'applied', 'id': inserted[entry['idempotency_key']]['id'],
+                                  'new_balance': balance_after_by_index[index]}
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return results, bool(deltas)
+
+
+def import_transactions(rows, admin_user_id, batch_size=IMPORT_BATCH_SIZE):
+    """Validates every row, then applies the valid ones batch by batch.
+
+    Unlike post_transactions a bad row does not fail the import; it is reported in
+    its result. Returns (results in row order, changed)."""
+    results = [None] * len(rows)
+    valid = []
+    seen_keys = set()
+    for index, row in enumerate(rows):
+        try:
+            entry = validate_entry(row if isinstance(row, dict) else {})
+        except LedgerError as e:
+            results[index] = {'status': 'error', 'error': e.message}
+            continue
+        if entry['idempotency_key'] in seen_keys:
+            results[index] = {'status': 'error', 'error': 'Duplicate idempotency_key in import'}
+            continue
+        seen_keys.add(entry['idempotency_key'])
+        valid.append((index, entry))
+
+    changed = False
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                batch_results, batch_changed = _import_batch(batch, admin_user_id)
+                break
+            except Error as e:
+                # A concurrent import of the same key shows up as a duplicate; the rerun reports it as replayed
+                retryable = e.errno in RETRYABLE_ERRORS or e.errno == errorcode.ER_DUP_ENTRY
+                if retryable and attempt < MAX_ATTEMPTS - 1:
+                    time.sleep(0.2 * (attempt + 1))
+                    continue
+                raise
+        changed = changed or batch_changed
+        for index, entry in batch:
+            results[index] = dict(batch_results[index], user_id=entry['user_id'],
+                                  amount=entry['amount'], idempotency_key=entry['idempotency_key'])
+
+    for index, result in enumerate(results):
+        result['row'] = index + 1
+    return results, changed
+
+
+def flight_accrual_rows(flight_number, amount, class_amounts=None, description=None, force=False):
+    """One import row per valid booking of a completed flight.
+
+    Keys are derived from the booking, so accruing the same flight twice credits nobody twice."""
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute('SELECT status FROM schedule WHERE flight_number = %s', (flight_number,))
+    flight = cursor.fetchone()
+    if not flight:
+        raise LedgerError("Flight not found", 404)
+    if not force and flight['status'] not in ACCRUAL_STATUSES:
+        raise LedgerError(f"Flight has not arrived yet (status: {flight['status']})", 409)
+
+    cursor.execute('''
+        SELECT id, user_id, serve_class
+        FROM bookings
+        WHERE flight_number = %s
+          AND valid = 1
+    ''', (flight_number,))
+
+    class_amounts = class_amounts or {}
+    rows = []
+    for booking in cursor.fetchall():
+        rows.append({
+            'user_id': booking['user_id'],
+            'booking_id': booking['id'],
+            'amount': class_amounts.get(booking['serve_class'], amount),
+            'description': description or f'Miles accrual - Flight {flight_number}',
+            'type': 'accrual',
+            'idempotency_key': f"accrual:{booking['id']}"[:64]
+        })
+    return rows
+
+
+def migrate_transaction_balances(conn):
+    """Backfills balance_after for rows written before it existed.
+
+    When a user's miles equal the sum of their transactions the running total is exact. Otherwise
+    miles were edited outside the ledger, so balances are walked back from the current miles and
+    the rows are flagged balance_estimated.
+    """
+    cursor = conn.cursor(dictionary=True)
+    # The join skips transactions of deleted users, which would otherwise be looked up on every start
+    cursor.execute('''
+        SELECT u.id AS user_id, u.miles
+        FROM users u
+        WHERE EXISTS (SELECT 1 FROM transactions t WHERE t.user_id = u.id AND t.balance_after IS NULL)
+    ''')
+    users = cursor.fetchall()
+
+    migrated = 0
+    for user in users:
+        cursor.execute('''
+            SELECT id, amount, balance_after
+            FROM transactions
+            WHERE user_id = %s
+            ORDER BY created_at DESC, id DESC
+        ''', (user['user_id'],))
+        rows = cursor.fetchall()
+
+        estimated = user['miles'] != sum(row['amount'] for row in rows)
+        balance = user['miles']
+        updates = []
+        for row in rows:
+            if row['balance_after'] is None:
+                updates.append((balance, estimated, row['id']))
+            balance -= row['amount']
+
+        cursor.executemany(
+            'UPDATE transactions SET balance_after = %s, balance_estimated = %s WHERE id = %s',
+            updates
+        )
+        conn.commit()
+        migrated += len(updates)
+
+    return migrated
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import os
+
+    parser = argparse.ArgumentParser(description='Bulk miles transactions')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Import a CSV or JSON file of transactions')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--admin-id', type=int, required=True)
+
+    accrue_parser = subparsers.add_parser('accrue', help='Credit miles for every valid booking of an arrived flight')
+    accrue_parser.add_argument('flight_number')
+    accrue_parser.add_argument('--amount', type=int, required=True)
+    accrue_parser.add_argument('--class-amount', action='append', default=[], metavar='CLASS=AMOUNT')
+    accrue_parser.add_argument('--admin-id', type=int, required=True)
+    accrue_parser.add_argument('--force', action='store_true', help='Accrue even if the flight has not arrived')
+
+    args = parser.parse_args()
+
+    os.environ['OAUTH_REFRESHER'] = 'false'
+    os.environ['NOTIFICATION_DISPATCHER'] = 'false'
+    from app import app
+
+    with app.app_context():
+        if args.command == 'import':
+            with open(args.path, encoding='utf-8') as f:
+                content = f.read()
+            rows = json.loads(content) if args.path.endswith('.json') else parse_csv_rows(content)
+        else:
+            class_amounts = {name: int(value) for name, value in (item.split('=', 1) for item in args.class_amount)}
+            rows = flight_accrual_rows(args.flight_number, args.amount, class_amounts, force=args.force)
+
+        results, changed = import_transactions(rows, args.admin_id)
+        if changed:
+            from services.user_stats import mark_user_stats_dirty
+            mark_user_stats_dirty()
+
+        for result in results:
+            if result['status'] == 'error':
+                print(f"Row {result['row']}: {result['error']}")
+        counts = {status: sum(1 for result in results if result['status'] == status) for status in ('applied', 'replayed', 'error')}
+        print(f"Applied {counts['applied']}, replayed {counts['replayed']}, failed {counts['error']} of {len(results)} row(s)")
@@ -0,0 +1,200 @@
+import base64
+import binascii
+import hashlib
+import io
+import time
+from PIL import Image
+
+MEDIA_URL_PREFIX = '/api/media/'
+MAX_URL_LENGTH = 1024
+
+# Pre-generated at upload time: name -> (max side or None for full size, format, content type).
+# Changing the parameters requires a new name, since variant URLs are cached as immutable.
+IMAGE_VARIANTS = {
+    'thumb-256.webp': (256, 'WEBP', 'image/webp'),
+    'full.webp': (None, 'WEBP', 'image/webp'),
+}
+WEBP_QUALITY = 80
+
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_content_type(data):
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+def media_url(media_hash):
+    return MEDIA_URL_PREFIX + media_hash if media_hash else None
+
+
+def store_media(cursor, data, content_type=None):
+    """Stores bytes under their sha256 and returns the hash; identical content is stored once"""
+    media_hash = hashlib.sha256(data).hexdigest()
+    cursor.execute('''
+        INSERT IGNORE INTO media (hash, content_type, size, data, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    ''', (media_hash, content_type or sniff_content_type(data), len(data), data, int(time.time())))
+    return media_hash
+
+
+def get_media(cursor, media_hash, variant=None):
+    """Returns the original, or the named variant falling back to the original if none was generated"""
+    if variant:
+        cursor.execute('''
+            SELECT m.content_type, m.data
+            FROM media_variants v
+                     JOIN media m ON m.hash = v.media_hash
+            WHERE v.source_hash = %s
+              AND v.variant = %s
+        ''', (media_hash, variant))
+        media = cursor.fetchone()
+        if media:
+            return media
+
+    cursor.execute('SELECT content_type, data FROM media WHERE hash = %s', (media_hash,))
+    return cursor.fetchone()
+
+
+def render_variant(image, max_side, image_format):
+    variant = image.copy()
+    if max_side:
+        variant.thumbnail((max_side, max_side))
+    if variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA' if 'transparency' in variant.info else 'RGB')
+
+    output = io.BytesIO()
+    variant.save(output, format=image_format, quality=WEBP_QUALITY)
+    return output.getvalue()
+
+
+def store_image(cursor, data, content_type=None):
+    """Stores an image together with its IMAGE_VARIANTS; returns the original's hash"""
+    content_type = content_type or sniff_content_type(data)
+    media_hash = store_media(cursor, data, content_type)
+    if not content_type.startswith('image/'):
+        return media_hash
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        print(f"Could not decode image {media_hash}: {e}")
+        return media_hash
+
+    for name, (max_side, image_format, variant_type) in IMAGE_VARIANTS.items():
+        try:
+            variant_hash = store_media(cursor, render_variant(image, max_side, image_format), variant_type)
+        except Exception as e:
+            print(f"Could not render {name} for {media_hash}: {e}")
+            continue
+        cursor.execute('''
+            INSERT IGNORE INTO media_variants (source_hash, variant, media_hash)
+            VALUES (%s, %s, %s)
+        ''', (media_hash, name, variant_hash))
+
+    return media_hash
+
+
+def image_urls(url):
+    """{'image', 'image_thumb', 'image_webp'} for a stored URL; external URLs have no variants"""
+    if not url:
+        return {'image': None, 'image_thumb': None, 'image_webp': None}
+    if not url.startswith(MEDIA_URL_PREFIX):
+        return {'image': url, 'image_thumb': url, 'image_webp': None}
+    return {
+        'image': url,
+        'image_thumb': f'{url}/thumb-256.webp',
+        'image_webp': f'{url}/full.webp'
+    }
+
+
+def parse_data_uri(value):
+    """'data:image/png;base64,...' -> (bytes, content_type), or None if it is not a base64 data URI"""
+    header, sep, payload = value.partition(',')
+    if not sep or not header.startswith('data:') or not header.endswith(';base64'):
+        return None
+    try:
+        return base64.b64decode(payload), header[5:-7] or None
+    except (binascii.Error, ValueError):
+        return None
+
+
+def media_url_from_value(cursor, value):
+    """Turns an incoming image value (data URI, raw bytes or URL) into a URL to store on the row"""
+    if not value:
+        return None
+
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            value = bytes(value).decode('utf-8')
+        except UnicodeDecodeError:
+            return media_url(store_image(cursor, bytes(value)))
+
+    value = value.strip()
+    if value.startswith('data:'):
+        parsed = parse_data_uri(value)
+        if not parsed:
+            return None
+        data, content_type = parsed
+        return media_url(store_image(cursor, data, content_type))
+
+    return value if len(value) <= MAX_URL_LENGTH else None
+
+
+def is_image_value(value):
+    """True for data URIs and binary payloads, False for text such as URLs or JSON"""
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            value = bytes(value).decode('utf-8')
+        except UnicodeDecodeError:
+            return True
+    return isinstance(value, str) and value.strip().startswith('data:')
+
+
+def migrate_blob_column(conn, table, column, url_column, images_only=False, batch_size=100):
+    """Moves legacy blob values into the media store, one row at a time to bound memory.
+
+    With images_only=True, text values (e.g. JSON kept in configs.image) stay where they are.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT id FROM {table} WHERE {column} IS NOT NULL AND {url_column} IS NULL')
+    row_ids = [row[0] for row in cursor.fetchall()]
+
+    migrated = 0
+    for row_id in row_ids:
+        cursor.execute(f'SELECT {column} FROM {table} WHERE id = %s', (row_id,))
+        row = cursor.fetchone()
+        if not row or (images_only and not is_image_value(row[0])):
+            continue
+
+        try:
+            url = media_url_from_value(cursor, row[0])
+        except Exception as e:
+            print(f"⚠️ {table}.{column} row {row_id} not migrated: {e}")
+            continue
+        if not url:
+            # Unparseable value: keep the original blob rather than losing it
+            print(f"⚠️ {table}.{column} row {row_id} not migrated: unrecognized value")
+            continue
+
+        cursor.execute(f'UPDATE {table} SET {url_column} = %s, {column} = NULL WHERE id = %s', (url, row_id))
+        migrated += 1
+        if migrated % batch_size == 0:
+            conn.commit()
+
+    conn.commit()
+    return migrated
+
+
+def migrate_user_pfps(conn):
+    return migrate_blob_column(conn, 'users', 'pfp', 'pfp_url')
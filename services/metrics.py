@@ -0,0 +1,136 @@
+import threading
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            items = list(self._values.items())
+        if not self.labelnames:
+            return items[0][1] if items else 0
+        return {','.join(key): value for key, value in items}
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = []
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            items = [(key, dict(series, counts=list(series['counts']))) for key, series in self._values.items()]
+        result = {}
+        for key, series in items:
+            result[','.join(key) or 'all'] = {
+                'count': series['count'],
+                'sum': round(series['sum'], 6),
+                'avg': round(series['sum'] / series['count'], 6) if series['count'] else 0,
+                'buckets': {str(bound): count for bound, count in zip(self.buckets, series['counts'])}
+            }
+        return result
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series['counts']))) for key, series in self._values.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series['counts']):
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", bound))} {count}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", "+Inf"))} {series["count"]}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {series["sum"]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {series["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics, one registry per worker"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, description, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, **kwargs)
+            return metric
+
+    def counter(self, name, description, labelnames=()):
+        return self._register(Counter, name, description, labelnames=labelnames)
+
+    def histogram(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, description, labelnames=labelnames, buckets=buckets)
+
+    def snapshot(self, prefix=''):
+        return {name: metric.snapshot() for name, metric in self._metrics.items() if name.startswith(prefix)}
+
+    def render_text(self, prefix=''):
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            if not name.startswith(prefix):
+                continue
+            lines.append(f'# HELP {name} {metric.description}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
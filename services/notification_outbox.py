@@ -0,0 +1,306 @@
+import json
+import os
+import secrets
+import threading
+import time
+from database import get_db
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 10
+BACKOFF_MAX = 15 * 60
+CLAIM_BATCH_SIZE = 20
+POLL_INTERVAL = 2
+# Rows stuck in 'sending' longer than this (crashed worker) are picked up again
+SENDING_TIMEOUT = 5 * 60
+
+VALID_TARGETS = ('all', 'user', 'topic', 'flight')
+
+
+def enqueue_notification(target, title, body, data=None, target_id=None, admin_user_id=None,
+                         dedup_key=None, delay=0):
+    """Queues a push notification and returns its outbox id.
+
+    A pending message with the same dedup_key is replaced in place (content and send time),
+    so a burst of edits produces one notification. The key is released once a worker claims it.
+    """
+    if target not in VALID_TARGETS:
+        raise ValueError(f'Invalid target: {target}')
+
+    now = int(time.time())
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('''
+        INSERT INTO notification_outbox
+            (target, target_id, title, body, data, status, attempts, next_attempt_at, dedup_key,
+             admin_user_id, created_at)
+        VALUES (%s, %s, %s, %s, %s, 'pending', 0, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            id = LAST_INSERT_ID(id),
+            title = VALUES(title),
+            body = VALUES(body),
+            data = VALUES(data),
+            next_attempt_at = VALUES(next_attempt_at)
+    ''', (
+        target,
+        str(target_id) if target_id is not None else None,
+        title,
+        body,
+        json.dumps(data or {}),
+        now + delay,
+        dedup_key,
+        admin_user_id,
+        now
+    ))
+    db.commit()
+    outbox_id = cursor.lastrowid
+    if not delay:
+        wake_dispatcher()
+    return outbox_id
+
+
+def get_pending_data(dedup_key):
+    """data of the not yet claimed message queued under dedup_key, or None"""
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT data FROM notification_outbox WHERE dedup_key = %s AND status = 'pending'",
+        (dedup_key,)
+    )
+    row = cursor.fetchone()
+    return json.loads(row['data']) if row and row['data'] else None
+
+
+def get_outbox_message(outbox_id):
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute('''
+        SELECT id, target, target_id, title, status, attempts, next_attempt_at,
+               created_at, sent_at, admin_user_id, result, last_error
+        FROM notification_outbox
+        WHERE id = %s
+    ''', (outbox_id,))
+    message = cursor.fetchone()
+    if message and message['result']:
+        message['result'] = json.loads(message['result'])
+    return message
+
+
+def backoff_delay(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+
+
+class FirebaseBackend:
+    """Delivers outbox messages through FirebaseAdmin"""
+
+    def deliver(self, message):
+        from services.firebase_admin import FirebaseAdmin
+
+        target = message['target']
+        if target == 'flight':
+            from services.flight_notifications import deliver_flight_update
+            result = deliver_flight_update(message)
+        elif target == 'all':
+            result = FirebaseAdmin.send_broadcast(message['title'], message['body'], message['data'])
+        elif target == 'user':
+            result = FirebaseAdmin.send_to_user(message['target_id'], message['title'], message['body'], message['data'])
+        else:
+            message_id = FirebaseAdmin.send_to_topic(message['target_id'], message['title'], message['body'], message['data'])
+            result = {'success_count': 1, 'failure_count': 0, 'message_id': message_id}
+
+        if result is None:
+            return {'success_count': 0, 'failure_count': 0, 'note': 'no subscribers'}
+        if not result['success_count'] and result.get('transport_failures'):
+            # FCM itself failed; raising keeps the row pending for the backoff retry
+            raise Exception(f"FCM delivery failed for {result['transport_failures']} token(s), none delivered")
+
+        # Per-token details can be large; keep the summary only
+        return {
+            key: value for key, value in result.items()
+            if key not in ('results', 'invalid_tokens')
+        }
+
+
+class FakeMessagingBackend:
+    """In-memory backend for local runs and tests: NOTIFICATION_BACKEND=fake"""
+
+    def __init__(self, fail_times=0):
+        self.sent = []
+        self.fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def deliver(self, message):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise Exception('Fake delivery failure')
+            self.sent.append(message)
+        print(f"📭 [fake push] {message['target']}:{message['target_id']} {message['title']}")
+        return {'success_count': 1, 'failure_count': 0, 'backend': 'fake'}
+
+
+def default_backend():
+    if os.getenv('NOTIFICATION_BACKEND', 'firebase').lower() == 'fake':
+        return FakeMessagingBackend()
+    return FirebaseBackend()
+
+
+class RateLimiter:
+    """Blocks so that at most `rate` calls happen per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next_at:
+            time.sleep(self._next_at - now)
+            now = self._next_at
+        self._next_at = now + self.interval
+
+
+class OutboxDispatcher:
+    def __init__(self, app, backend=None, rate_per_second=None):
+        self.app = app
+        self.backend = backend or default_backend()
+        if rate_per_second is None:
+            rate_per_second = float(os.getenv('NOTIFICATION_RATE_PER_SECOND', 5))
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.worker_id = secrets.token_hex(8)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run_forever, name='notification-outbox', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def run_forever(self):
+        print(f"📬 Notification dispatcher {self.worker_id} started")
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                print(f"Notification dispatcher error: {e}")
+                processed = 0
+
+            if not processed:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+
+    def run_once(self):
+        """Claims and delivers one batch of due messages; returns how many were processed"""
+        with self.app.app_context():
+            messages = self.claim_batch()
+            for message in messages:
+                self.rate_limiter.wait()
+                self.deliver(message)
+            return len(messages)
+
+    def claim_batch(self):
+        now = int(time.time())
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+
+        cursor.execute('''
+            UPDATE notification_outbox
+            SET status = 'sending', locked_by = %s, locked_at = %s, dedup_key = NULL
+            WHERE (status = 'pending' AND next_attempt_at <= %s)
+               OR (status = 'sending' AND locked_at < %s)
+            ORDER BY next_attempt_at, id
+            LIMIT %s
+        ''', (self.worker_id, now, now, now - SENDING_TIMEOUT, CLAIM_BATCH_SIZE))
+        db.commit()
+
+        if cursor.rowcount == 0:
+            return []
+
+        cursor.execute('''
+            SELECT id, target, target_id, title, body, data, attempts, locked_at
+            FROM notification_outbox
+            WHERE status = 'sending' AND locked_by = %s AND locked_at = %s
+            ORDER BY id
+        ''', (self.worker_id, now))
+        messages = cursor.fetchall()
+
+        for message in messages:
+            message['data'] = json.loads(message['data']) if message['data'] else {}
+        return messages
+
+    def deliver(self, message):
+        db = get_db()
+        cursor = db.cursor()
+        attempts = message['attempts'] + 1
+
+        try:
+            result = self.backend.deliver(message)
+        except Exception as e:
+            print(f"❌ Outbox message {message['id']} attempt {attempts} failed: {e}")
+            if attempts >= MAX_ATTEMPTS:
+                cursor.execute('''
+                    UPDATE notification_outbox
+                    SET status = 'failed', attempts = %s, last_error = %s, locked_by = NULL
+                    WHERE id = %s AND status = 'sending' AND locked_by = %s AND locked_at = %s
+                ''', (attempts, str(e)[:1000], message['id'], self.worker_id, message['locked_at']))
+            else:
+                cursor.execute('''
+                    UPDATE notification_outbox
+                    SET status = 'pending', attempts = %s, last_error = %s,
+                        next_attempt_at = %s, locked_by = NULL
+                    WHERE id = %s AND status = 'sending' AND locked_by = %s AND locked_at = %s
+                ''', (attempts, str(e)[:1000], int(time.time()) + backoff_delay(attempts), message['id'],
+                      self.worker_id, message['locked_at']))
+            db.commit()
+            self._check_still_owned(cursor, message)
+            return False
+
+        cursor.execute('''
+            UPDATE notification_outbox
+            SET status = 'sent', attempts = %s, sent_at = %s, result = %s, last_error = NULL, locked_by = NULL
+            WHERE id = %s AND status = 'sending' AND locked_by = %s AND locked_at = %s
+        ''', (attempts, int(time.time()), json.dumps(result, default=str), message['id'],
+              self.worker_id, message['locked_at']))
+        db.commit()
+        return self._check_still_owned(cursor, message)
+
+    def _check_still_owned(self, cursor, message):
+        """False when the row was reclaimed after SENDING_TIMEOUT; its new owner's status is left alone"""
+        if cursor.rowcount == 0:
+            print(f"⚠️ Outbox message {message['id']} was reclaimed by another worker, result dropped")
+            return False
+        return True
+
+
+_dispatcher = None
+
+
+def start_dispatcher(app, backend=None):
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = OutboxDispatcher(app, backend)
+        _dispatcher.start()
+    return _dispatcher
+
+
+def wake_dispatcher():
+    if _dispatcher is not None:
+        _dispatcher.wake()
+
+
+if __name__ == '__main__':
+    # Standalone worker, e.g. an always-on task: python -m services.notification_outbox
+    os.environ['NOTIFICATION_DISPATCHER'] = 'false'
+    os.environ['OAUTH_REFRESHER'] = 'false'
+    from app import app
+    OutboxDispatcher(app).run_forever()
@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+import requests
+from database import get_db
+from services.http_client import get_session, DEFAULT_TIMEOUT
+
+# Roblox access tokens live 15 minutes, so refresh well ahead and poll more often than that
+REFRESH_AHEAD = 5 * 60
+REFRESH_INTERVAL = 60
+REFRESH_BATCH_SIZE = 50
+# A claimed row is skipped by other workers for this long
+CLAIM_LEASE = 2 * 60
+RETRY_BACKOFF = 5 * 60
+
+DEFAULT_TOKEN_URLS = {
+    'discord': 'https://discord.com/api/oauth2/token',
+    'roblox': 'https://apis.roblox.com/oauth/v1/token',
+}
+
+
+class PermanentRefreshError(Exception):
+    """The provider rejected the refresh token; the user has to relink"""
+
+
+def provider_settings(app):
+    """Client credentials and token endpoints; token URLs can point at a local stub server"""
+    return {
+        'discord': {
+            'client_id': app.config.get('DISCORD_CLIENT_ID'),
+            'client_secret': app.config.get('DISCORD_CLIENT_SECRET'),
+            'token_url': app.config.get('DISCORD_TOKEN_URL') or DEFAULT_TOKEN_URLS['discord'],
+        },
+        'roblox': {
+            'client_id': app.config.get('ROBLOX_CLIENT_ID'),
+            'client_secret': app.config.get('ROBLOX_CLIENT_SECRET'),
+            'token_url': app.config.get('ROBLOX_TOKEN_URL') or DEFAULT_TOKEN_URLS['roblox'],
+        },
+    }
+
+
+def request_refresh(settings, refresh_token):
+    try:
+        response = get_session('oauth_refresh').post(
+            settings['token_url'],
+            data={
+                'client_id': settings['client_id'],
+                'client_secret': settings['client_secret'],
+                'grant_type': 'refresh_token',
+                'refresh_token': refresh_token,
+            },
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            timeout=DEFAULT_TIMEOUT
+        )
+    except requests.RequestException as e:
+        raise Exception(f'Token endpoint unreachable: {e}')
+
+    if response.status_code in (400, 401):
+        raise PermanentRefreshError(response.text[:200])
+    if response.status_code != 200:
+        raise Exception(f'Token endpoint returned {response.status_code}')
+    return response.json()
+
+
+class OAuthTokenRefresher:
+    def __init__(self, app, interval=REFRESH_INTERVAL, ahead=REFRESH_AHEAD, batch_size=REFRESH_BATCH_SIZE):
+        self.app = app
+        self.interval = interval
+        self.ahead = ahead
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.run_forever, name='oauth-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        print("🔑 OAuth token refresher started")
+        while not self._stop.is_set():
+            try:
+                while self.run_once() >= self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                print(f"OAuth refresher error: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        """Refreshes one batch of tokens nearing expiry; returns how many rows were picked"""
+        with self.app.app_context():
+            settings = provider_settings(self.app)
+            connections = self.due_connections(settings)
+            for connection in connections:
+                if self.claim(connection['id']):
+                    self.refresh(connection, settings[connection['provider']])
+            return len(connections)
+
+    def due_connections(self, settings):
+        providers = [name for name, config in settings.items() if config['client_id'] and config['client_secret']]
+        if not providers:
+            return []
+
+        now = int(time.time())
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        placeholders = ','.join(['%s'] * len(providers))
+        # Range scan on idx_oauth_expires
+        cursor.execute(f'''
+            SELECT id, user_id, provider, refresh_token
+            FROM oauth_connections
+            WHERE expires_at < %s
+              AND refresh_token IS NOT NULL
+              AND (refresh_after IS NULL OR refresh_after <= %s)
+              AND provider IN ({placeholders})
+            ORDER BY expires_at
+            LIMIT %s
+        ''', (now + self.ahead, now, *providers, self.batch_size))
+        return cursor.fetchall()
+
+    def claim(self, connection_id):
+        now = int(time.time())
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute('''
+            UPDATE oauth_connections
+            SET refresh_after = %s
+            WHERE id = %s
+              AND (refresh_after IS NULL OR refresh_after <= %s)
+        ''', (now + CLAIM_LEASE, connection_id, now))
+        db.commit()
+        return cursor.rowcount == 1
+
+    def refresh(self, connection, settings):
+        db = get_db()
+        cursor = db.cursor()
+
+        try:
+            token_json = request_refresh(settings, connection['refresh_token'])
+        except PermanentRefreshError as e:
+            print(f"❌ {connection['provider']} refresh rejected for user {connection['user_id']}: {e}")
+            cursor.execute('''
+                UPDATE oauth_connections
+                SET refresh_token = NULL, refresh_after = NULL
+                WHERE id = %s
+            ''', (connection['id'],))
+            db.commit()
+            return False
+        except Exception as e:
+            print(f"⚠️ {connection['provider']} refresh failed for user {connection['user_id']}: {e}")
+            cursor.execute(
+                'UPDATE oauth_connections SET refresh_after = %s WHERE id = %s',
+                (int(time.time()) + RETRY_BACKOFF, connection['id'])
+            )
+            db.commit()
+            return False
+
+        cursor.execute('''
+            UPDATE oauth_connections
+            SET access_token  = %s,
+                refresh_token = %s,
+                expires_at    = %s,
+                refresh_after = NULL
+            WHERE id = %s
+        ''', (
+            token_json['access_token'],
+            # Providers that rotate refresh tokens return a new one; others keep the old
+            token_json.get('refresh_token') or connection['refresh_token'],
+            int(time.time()) + int(token_json.get('expires_in', 24 * 60 * 60)),
+            connection['id']
+        ))
+        db.commit()
+        return True
+
+
+_refresher = None
+
+
+def start_token_refresher(app):
+    global _refresher
+    if _refresher is None:
+        _refresher = OAuthTokenRefresher(app)
+        _refresher.start()
+    return _refresher
+
+
+if __name__ == '__main__':
+    # One pass, e.g. against a stub server: DISCORD_TOKEN_URL=http://127.0.0.1:8000/token python -m services.oauth_refresh
+    os.environ['OAUTH_REFRESHER'] = 'false'
+    os.environ['NOTIFICATION_DISPATCHER'] = 'false'
+    from app import app
+    print(f"Refreshed batch of {OAuthTokenRefresher(app).run_once()} connection(s)")
@@ -0,0 +1,202 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app, jsonify
+from database import get_db
+
+# Cost parameters come from `python -m services.passwords`, which benchmarks this machine
+DEFAULT_SCHEME = os.getenv('PASSWORD_HASH_SCHEME', 'scrypt')
+SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 600000))
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# hashlib releases the GIL while hashing, so a pool the size of the CPU count keeps
+# concurrent logins from oversubscribing cores; extra logins queue instead
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+HASH_QUEUE_TIMEOUT = 5
+# Seconds clients are told to wait after a 503 from a saturated hash pool
+HASH_RETRY_AFTER = 5
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+
+
+class PasswordHashingBusy(Exception):
+    """Hash workers did not get to the request within HASH_QUEUE_TIMEOUT"""
+
+
+def busy_response(message):
+    """503 with Retry-After for endpoints that hit PasswordHashingBusy"""
+    response = jsonify({"error": message})
+    response.headers['Retry-After'] = str(HASH_RETRY_AFTER)
+    return response, 503
+
+
+def _b64(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _unb64(value):
+    return base64.b64decode(value + '=' * (-len(value) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL's default 32 MB limit is too small for n >= 2**15
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p + 1024 * 1024, dklen=HASH_BYTES)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, dklen=HASH_BYTES)
+
+
+def hash_password(password, scheme=None):
+    """Encoded hash string: scrypt$n$r$p$salt$hash or pbkdf2_sha256$iterations$salt$hash"""
+    scheme = scheme or DEFAULT_SCHEME
+    salt = secrets.token_bytes(SALT_BYTES)
+    if scheme == 'scrypt':
+        derived = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f'scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(derived)}'
+    if scheme == 'pbkdf2_sha256':
+        derived = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f'pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(derived)}'
+    raise ValueError(f'Unknown password hash scheme: {scheme}')
+
+
+def is_legacy_hash(stored):
+    return len(stored) == 64 and '$' not in stored
+
+
+def needs_rehash(stored):
+    """True for legacy sha256 hashes and for hashes made with other scheme or cost settings"""
+    if is_legacy_hash(stored):
+        return True
+    parts = stored.split('$')
+    if parts[0] != DEFAULT_SCHEME:
+        return True
+    if parts[0] == 'scrypt':
+        return (int(parts[1]), int(parts[2]), int(parts[3])) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return int(parts[1]) != PBKDF2_ITERATIONS
+
+
+def check_password(password, stored):
+    if not stored:
+        return False
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            derived = _scrypt(password, _unb64(parts[4]), n, r, p)
+            return hmac.compare_digest(derived, _unb64(parts[5]))
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            derived = _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+            return hmac.compare_digest(derived, _unb64(parts[3]))
+    except (ValueError, TypeError) as e:
+        print(f"Malformed password hash: {e}")
+    return False
+
+
+def _run_in_pool(fn, *args):
+    future = _hash_pool.submit(fn, *args)
+    try:
+        return future.result(timeout=HASH_QUEUE_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordHashingBusy()
+
+
+_dummy_hash = None
+_dummy_lock = threading.Lock()
+
+
+def _get_dummy_hash():
+    global _dummy_hash
+    with _dummy_lock:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password(secrets.token_hex(16))
+        return _dummy_hash
+
+
+def verify_password(password, stored):
+    """Checks on the hash pool. Unknown users (stored=None) still pay for one hash so
+    response timing does not reveal which nicknames exist"""
+    if stored is None:
+        _run_in_pool(check_password, password, _get_dummy_hash())
+        return False
+    return _run_in_pool(check_password, password, stored)
+
+
+def make_password_hash(password):
+    return _run_in_pool(hash_password, password)
+
+
+def _rehash(app, user_id, password, old_hash):
+    try:
+        new_hash = hash_password(password)
+        with app.app_context():
+            db = get_db()
+            cursor = db.cursor()
+            # Skip if the password changed in the meantime
+            cursor.execute(
+                'UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s',
+                (new_hash, user_id, old_hash)
+            )
+            db.commit()
+    except Exception as e:
+        print(f"Password rehash failed for user {user_id}: {e}")
+
+
+def schedule_rehash(user_id, password, old_hash):
+    """Upgrades a verified legacy or outdated hash after the login response is sent"""
+    app = current_app._get_current_object()
+    _hash_pool.submit(_rehash, app, user_id, password, old_hash)
+
+
+def benchmark(target_ms=250, scheme='scrypt'):
+    """Cheapest parameters whose single hash takes at least target_ms on this machine"""
+    password, salt = 'benchmark-password', secrets.token_bytes(SALT_BYTES)
+
+    if scheme == 'scrypt':
+        n = 2 ** 12
+        while True:
+            started = time.perf_counter()
+            _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= target_ms or n >= 2 ** 20:
+                return {'PASSWORD_SCRYPT_N': n, 'PASSWORD_SCRYPT_R': SCRYPT_R, 'PASSWORD_SCRYPT_P': SCRYPT_P}, elapsed
+            n *= 2
+
+    iterations = 10000
+    started = time.perf_counter()
+    _pbkdf2(password, salt, iterations)
+    per_iteration = (time.perf_counter() - started) / iterations
+    iterations = max(iterations, int(target_ms / 1000 / per_iteration) // 1000 * 1000)
+    started = time.perf_counter()
+    _pbkdf2(password, salt, iterations)
+    return {'PASSWORD_PBKDF2_ITERATIONS': iterations}, (time.perf_counter() - started) * 1000
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pick password hash parameters for a per-login CPU budget')
+    parser.add_argument('--target-ms', type=float, default=250)
+    parser.add_argument('--scheme', choices=['scrypt', 'pbkdf2_sha256'], default='scrypt')
+    args = parser.parse_args()
+
+    params, elapsed = benchmark(args.target_ms, args.scheme)
+    print(f"# {args.scheme}: {elapsed:.0f} ms per hash, ~{HASH_WORKERS * 1000 / elapsed:.0f} logins/s on {HASH_WORKERS} worker(s)")
+    print(f"PASSWORD_HASH_SCHEME={args.scheme}")
+    for name, value in params.items():
+        print(f"{name}={value}")
@@ -0,0 +1,64 @@
+import threading
+import time
+from database import get_db
+
+# Other workers pick up edits after at most this many seconds
+PAX_PRICE_TTL = 60
+
+_price_map = None
+_loaded_at = 0
+_lock = threading.Lock()
+
+
+def _load_price_map():
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute('SELECT name, price FROM pax_service')
+
+    price_map = {}
+    for row in cursor.fetchall():
+        # pax_service.name uses a case-insensitive collation
+        price_map.setdefault(row['name'].strip().casefold(), (row['name'], row['price']))
+    return price_map
+
+
+def get_pax_price_map():
+    """Cached {casefolded name: (name, price)} map of the pax_service table"""
+    global _price_map, _loaded_at
+
+    price_map = _price_map
+    if price_map is not None and time.time() - _loaded_at < PAX_PRICE_TTL:
+        return price_map
+
+    with _lock:
+        if _price_map is None or time.time() - _loaded_at >= PAX_PRICE_TTL:
+            _price_map = _load_price_map()
+            _loaded_at = time.time()
+        return _price_map
+
+
+def invalidate_pax_price_map():
+    global _price_map
+    with _lock:
+        _price_map = None
+
+
+def parse_pax_service_names(pax_service_data):
+    if not isinstance(pax_service_data, str):
+        return []
+    return [name.strip() for name in pax_service_data.split(',') if name.strip()]
+
+
+def resolve_pax_services(pax_service_data, price_map=None):
+    """Turns a bookings.pax_service string into [{'name', 'price'}]; unknown services cost 0"""
+    if price_map is None:
+        price_map = get_pax_price_map()
+
+    services = []
+    for service_name in parse_pax_service_names(pax_service_data):
+        known = price_map.get(service_name.casefold())
+        if known:
+            services.append({'name': known[0], 'price': known[1]})
+        else:
+            services.append({'name': service_name, 'price': 0})
+    return services
@@ -0,0 +1,139 @@
+import os
+import random
+import threading
+import time
+from database import get_db
+from services.metrics import registry
+from services.ttl_cache import TTLCache
+
+LOGIN_IP_BURST = int(os.getenv('LOGIN_RATE_IP_BURST', 20))
+LOGIN_NICKNAME_BURST = int(os.getenv('LOGIN_RATE_NICKNAME_BURST', 5))
+
+# (capacity, tokens refilled per second): a full IP bucket refills in 5 minutes, a nickname bucket in 15
+LOGIN_LIMITS = {
+    'ip': (LOGIN_IP_BURST, LOGIN_IP_BURST / 300),
+    'nickname': (LOGIN_NICKNAME_BURST, LOGIN_NICKNAME_BURST / 900),
+}
+# 'memory' keeps buckets per worker; 'mysql' also checks the shared rate_limit_buckets table
+LOGIN_RATE_BACKEND = os.getenv('LOGIN_RATE_BACKEND', 'memory')
+MAX_BUCKETS = 10000
+# Fraction of shared-bucket writes that also delete fully refilled rows
+PRUNE_PROBABILITY = 0.01
+
+limiter_allowed = registry.counter('login_rate_limit_allowed_total', 'Login attempts let through the rate limiter')
+limiter_rejected = registry.counter('login_rate_limit_rejected_total', 'Login attempts rejected by the rate limiter', ('scope', 'backend'))
+limiter_errors = registry.counter('login_rate_limit_backend_errors_total', 'Shared bucket lookups that failed open')
+
+
+class TokenBucketStore:
+    """Per-worker buckets; an entry expires once it would have refilled completely"""
+
+    def __init__(self, maxsize=MAX_BUCKETS):
+        self._buckets = TTLCache(ttl=0, maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now=None):
+        """Returns 0 when a token was taken, otherwise seconds until one is available"""
+        now = now or time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                self._buckets.set(key, (tokens, now), ttl=(capacity - tokens) / rate)
+                return (1 - tokens) / rate
+            tokens -= 1
+            self._buckets.set(key, (tokens, now), ttl=(capacity - tokens) / rate)
+            return 0
+
+    def reset(self, key):
+        self._buckets.invalidate(key)
+
+
+def consume_shared(key, capacity, rate, now=None):
+    """Same as TokenBucketStore.consume against rate_limit_buckets, so all workers share one budget"""
+    now = now or time.time()
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    db.start_transaction()
+    try:
+        cursor.execute('SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = %s FOR UPDATE', (key,))
+        row = cursor.fetchone()
+        tokens = capacity if not row else min(capacity, row['tokens'] + (now - row['updated_at']) * rate)
+        wait = 0 if tokens >= 1 else (1 - tokens) / rate
+        if not wait:
+            tokens -= 1
+        cursor.execute('''
+            INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE tokens = VALUES(tokens), updated_at = VALUES(updated_at)
+        ''', (key, tokens, now))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if random.random() < PRUNE_PROBABILITY:
+        longest_refill = max(capacity / rate for capacity, rate in LOGIN_LIMITS.values())
+        cursor.execute('DELETE FROM rate_limit_buckets WHERE updated_at < %s', (now - longest_refill,))
+        db.commit()
+
+    return wait
+
+
+def reset_shared(key):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('DELETE FROM rate_limit_buckets WHERE bucket_key = %s', (key,))
+    db.commit()
+
+
+class LoginRateLimiter:
+    def __init__(self, limits=LOGIN_LIMITS, backend=LOGIN_RATE_BACKEND):
+        self.limits = limits
+        self.backend = backend
+        self.local = TokenBucketStore()
+
+    def keys(self, ip, nickname):
+        return [('ip', f'login:ip:{ip}'), ('nickname', f'login:nick:{nickname.lower()}')]
+
+    def check(self, ip, nickname):
+        """Returns (scope, retry_after) for the first exhausted bucket, or None if the attempt may proceed"""
+        keys = self.keys(ip, nickname)
+
+        # The per-worker buckets reject floods without any DB work
+        for scope, key in keys:
+            capacity, rate = self.limits[scope]
+            wait = self.local.consume(key, capacity, rate)
+            if wait:
+                limiter_rejected.inc(scope=scope, backend='memory')
+                return scope, wait
+
+        if self.backend == 'mysql':
+            for scope, key in keys:
+                capacity, rate = self.limits[scope]
+                try:
+                    wait = consume_shared(key, capacity, rate)
+                except Exception as e:
+                    # Fail open: the local buckets still bound this worker
+                    limiter_errors.inc()
+                    print(f"Shared rate limit lookup failed: {e}")
+                    break
+                if wait:
+                    limiter_rejected.inc(scope=scope, backend='mysql')
+                    return scope, wait
+
+        limiter_allowed.inc()
+        return None
+
+    def reset_nickname(self, nickname):
+        """After a successful login, earlier typos should not count against the account"""
+        key = f'login:nick:{nickname.lower()}'
+        self.local.reset(key)
+        if self.backend == 'mysql':
+            try:
+                reset_shared(key)
+            except Exception as e:
+                print(f"Shared rate limit reset failed: {e}")
+
+
+login_limiter = LoginRateLimiter()
@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+from flask import request, make_response
+from database import get_db
+
+# How long a worker trusts its local copy of a generation before re-reading it from MySQL.
+# Bumps made by the same worker are visible immediately.
+GENERATION_CHECK_INTERVAL = 2
+MAX_ENTRIES = 512
+
+_generations = {}
+_entries = {}
+_lock = threading.Lock()
+
+
+def _load_generations(tables):
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    placeholders = ','.join(['%s'] * len(tables))
+    cursor.execute(
+        f'SELECT name, generation FROM cache_generations WHERE name IN ({placeholders})',
+        list(tables)
+    )
+    found = {row['name']: row['generation'] for row in cursor.fetchall()}
+    return {table: found.get(table, 0) for table in tables}
+
+
+def current_generations(tables):
+    now = time.time()
+    local = {table: _generations.get(table) for table in tables}
+    if all(entry and now - entry[1] < GENERATION_CHECK_INTERVAL for entry in local.values()):
+        return tuple(entry[0] for entry in local.values())
+
+    loaded = _load_generations(tables)
+    with _lock:
+        for table, generation in loaded.items():
+            _generations[table] = (generation, now)
+    return tuple(loaded[table] for table in tables)
+
+
+def bump_generation(*tables):
+    """Invalidates every cached response built from these tables; call after the write commits"""
+    db = get_db()
+    cursor = db.cursor()
+    for table in tables:
+        cursor.execute('''
+            INSERT INTO cache_generations (name, generation)
+            VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE generation = generation + 1
+        ''', (table,))
+    db.commit()
+
+    with _lock:
+        for table in tables:
+            _generations.pop(table, None)
+
+
+def _not_modified(etag):
+    response = make_response('', 304)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_response(*tables):
+    """Serves GET responses from memory until one of the tables' generations is bumped.
+
+    Responses carry an ETag, so clients revalidating with If-None-Match get a 304.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = (f.__name__, request.full_path)
+            version = current_generations(tables)
+
+            entry = _entries.get(key)
+            if entry and entry['version'] == version:
+                if entry['etag'] in request.headers.get('If-None-Match', ''):
+                    return _not_modified(entry['etag'])
+                response = make_response(entry['body'], 200)
+                response.headers['Content-Type'] = entry['content_type']
+                response.headers['ETag'] = entry['etag']
+                response.headers['Cache-Control'] = 'no-cache'
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+
+            body = response.get_data()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            with _lock:
+                if len(_entries) >= MAX_ENTRIES:
+                    _entries.pop(next(iter(_entries)))
+                _entries[key] = {
+                    'version': version,
+                    'body': body,
+                    'content_type': response.headers.get('Content-Type'),
+                    'etag': etag
+                }
+
+            if etag in request.headers.get('If-None-Match', ''):
+                return _not_modified(etag)
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return decorated_function
+
+    return decorator
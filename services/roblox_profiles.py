@@ -0,0 +1,198 @@
+import json
+import time
+import requests
+from database import get_db
+from services.http_client import get_session, DEFAULT_TIMEOUT
+from services.ttl_cache import TTLCache
+
+ROBLOX_USERINFO_URL = 'https://apis.roblox.com/oauth/v1/userinfo'
+# Public endpoint that resolves up to 100 Roblox ids per request, no user token needed
+ROBLOX_USERS_URL = 'https://users.roblox.com/v1/users'
+ROBLOX_USERS_BATCH_SIZE = 100
+
+ROBLOX_PROFILE_TTL = 60 * 60
+# The in-process front only saves the MySQL round-trip, so it can be short
+PROFILE_FRONT_TTL = 5 * 60
+
+profile_front = TTLCache(PROFILE_FRONT_TTL, maxsize=4096)
+
+
+def roblox_session():
+    return get_session('roblox', pool_maxsize=10)
+
+
+def profile_url(roblox_id):
+    return f'https://www.roblox.com/users/{roblox_id}/profile'
+
+
+def normalize_userinfo(userinfo):
+    """OIDC userinfo -> the profile shape served by /auth/roblox/userinfo.
+
+    The full claims (picture, created_at, ...) are kept under 'oidc' for get_roblox_user_info."""
+    return {
+        'id': userinfo.get('sub'),
+        'name': userinfo.get('name'),
+        'nickname': userinfo.get('nickname'),
+        'preferred_username': userinfo.get('preferred_username'),
+        'profile': userinfo.get('profile') or (profile_url(userinfo['sub']) if userinfo.get('sub') else None),
+        'oidc': userinfo
+    }
+
+
+def public_profile(profile):
+    """Cached record without the raw OIDC claims"""
+    if profile is None:
+        return None
+    return {key: value for key, value in profile.items() if key != 'oidc'}
+
+
+def _profile_view(profile, claims):
+    return profile['oidc'] if claims else public_profile(profile)
+
+
+def normalize_users_api(entry):
+    """users.roblox.com entry -> the same shape as normalize_userinfo"""
+    roblox_id = str(entry['id'])
+    return {
+        'id': roblox_id,
+        'name': entry.get('displayName'),
+        'nickname': entry.get('displayName'),
+        'preferred_username': entry.get('name'),
+        'profile': profile_url(roblox_id)
+    }
+
+
+def load_profiles(user_ids):
+    """{user_id: (profile, fetched_at)} from the in-process front, then one MySQL query for the rest"""
+    found = {}
+    missing = []
+    for user_id in user_ids:
+        cached = profile_front.get(user_id)
+        if cached is not None:
+            found[user_id] = cached
+        else:
+            missing.append(user_id)
+
+    if missing:
+        db = get_db()
+        cursor = db.cursor(dictionary=True)
+        placeholders = ','.join(['%s'] * len(missing))
+        cursor.execute(
+            f'SELECT user_id, data, fetched_at FROM roblox_profiles WHERE user_id IN ({placeholders})',
+            missing
+        )
+        for row in cursor.fetchall():
+            entry = (json.loads(row['data']), row['fetched_at'])
+            found[row['user_id']] = entry
+            profile_front.set(row['user_id'], entry)
+
+    return found
+
+
+def save_profiles(profiles):
+    if not profiles:
+        return
+
+    now = int(time.time())
+    db = get_db()
+    cursor = db.cursor()
+    cursor.executemany('''
+        INSERT INTO roblox_profiles (user_id, roblox_id, data, fetched_at)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            roblox_id = VALUES(roblox_id),
+            data = VALUES(data),
+            fetched_at = VALUES(fetched_at)
+    ''', [(user_id, profile['id'], json.dumps(profile), now) for user_id, profile in profiles.items()])
+    db.commit()
+
+    for user_id, profile in profiles.items():
+        profile_front.set(user_id, (profile, now))
+
+
+def invalidate_profile(user_id):
+    profile_front.invalidate(user_id)
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute('DELETE FROM roblox_profiles WHERE user_id = %s', (user_id,))
+    db.commit()
+
+
+def is_fresh(fetched_at):
+    return time.time() - fetched_at < ROBLOX_PROFILE_TTL
+
+
+def get_profile(user_id, access_token, claims=False):
+    """Cached profile for one linked user; falls back to a stale copy if Roblox is unreachable.
+
+    With claims=True the full OIDC userinfo is returned instead. Records filled by the
+    users API (get_profiles_bulk) have no claims, so they count as a miss there."""
+    cached = load_profiles([user_id]).get(user_id)
+    if cached and claims and 'oidc' not in cached[0]:
+        cached = None
+    if cached and is_fresh(cached[1]):
+        return _profile_view(cached[0], claims)
+
+    try:
+        response = roblox_session().get(
+            ROBLOX_USERINFO_URL,
+            headers={'Authorization': f'Bearer {access_token}'},
+            timeout=DEFAULT_TIMEOUT
+        )
+    except requests.RequestException as e:
+        print(f"Roblox userinfo request failed: {e}")
+        return _profile_view(cached[0], claims) if cached else None
+
+    if response.status_code != 200:
+        return _profile_view(cached[0], claims) if cached else None
+
+    profile = normalize_userinfo(response.json())
+    save_profiles({user_id: profile})
+    return _profile_view(profile, claims)
+
+
+def fetch_users_batch(roblox_ids):
+    response = roblox_session().post(
+        ROBLOX_USERS_URL,
+        json={'userIds': [int(roblox_id) for roblox_id in roblox_ids], 'excludeBannedUsers': False},
+        timeout=DEFAULT_TIMEOUT
+    )
+    response.raise_for_status()
+    return {str(entry['id']): normalize_users_api(entry) for entry in response.json().get('data', [])}
+
+
+def get_profiles_bulk(user_ids):
+    """{user_id: profile or None} for many users: cache first, then batched users API calls for the rest"""
+    user_ids = list(dict.fromkeys(user_ids))
+    cached = load_profiles(user_ids)
+    result = {user_id: public_profile(entry[0]) for user_id, entry in cached.items()}
+
+    to_refresh = [user_id for user_id in user_ids if user_id not in cached or not is_fresh(cached[user_id][1])]
+    if not to_refresh:
+        return {user_id: result.get(user_id) for user_id in user_ids}
+
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    placeholders = ','.join(['%s'] * len(to_refresh))
+    cursor.execute(f'''
+        SELECT user_id, provider_user_id
+        FROM oauth_connections
+        WHERE provider = 'roblox'
+          AND user_id IN ({placeholders})
+    ''', to_refresh)
+    roblox_ids = {row['provider_user_id']: row['user_id'] for row in cursor.fetchall()}
+
+    fetched = {}
+    id_list = [roblox_id for roblox_id in roblox_ids if str(roblox_id).isdigit()]
+    for i in range(0, len(id_list), ROBLOX_USERS_BATCH_SIZE):
+        try:
+            fetched.update(fetch_users_batch(id_list[i:i + ROBLOX_USERS_BATCH_SIZE]))
+        except Exception as e:
+            # Stale entries are still better than nothing for admin listings
+            print(f"Roblox users batch lookup failed: {e}")
+
+    fresh_profiles = {roblox_ids[roblox_id]: profile for roblox_id, profile in fetched.items() if roblox_id in roblox_ids}
+    save_profiles(fresh_profiles)
+    result.update(fresh_profiles)
+
+    return {user_id: result.get(user_id) for user_id in user_ids}
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from flask import current_app
+from database import get_db
+
+# Safety net for writes that bypass mark_user_stats_dirty (e.g. manual SQL)
+USER_STATS_MAX_AGE = 10 * 60
+
+_refreshing = False
+_refreshing_lock = threading.Lock()
+
+
+def compute_user_stats(cursor):
+    cursor.execute('''
+                   SELECT COUNT(*)                                        as total_users,
+                          COUNT(CASE WHEN status = 'active' THEN 1 END)   as active_users,
+                          COUNT(CASE WHEN status = 'inactive' THEN 1 END) as inactive_users,
+                          COUNT(CASE WHEN user_group = 'HQ' THEN 1 END)   as hq_users,
+                          COUNT(CASE WHEN user_group = 'STF' THEN 1 END)  as staff_users,
+                          COUNT(CASE WHEN user_group = 'PAX' THEN 1 END)  as passenger_users,
+                          SUM(miles)                                      as total_miles
+                   FROM users
+                   ''')
+    stats = cursor.fetchone()
+    stats['total_miles'] = int(stats['total_miles'] or 0)
+    return stats
+
+
+def refresh_user_stats():
+    """Recomputes the snapshot; returns (stats, computed_at)"""
+    # Stamped before the scan so a write that lands during it still marks the snapshot stale
+    computed_at = int(time.time())
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    stats = compute_user_stats(cursor)
+
+    cursor.execute('''
+        INSERT INTO user_stats (id, data, computed_at, changed_at)
+        VALUES (1, %s, %s, 0)
+        ON DUPLICATE KEY UPDATE
+            data = VALUES(data),
+            computed_at = VALUES(computed_at)
+    ''', (json.dumps(stats), computed_at))
+    db.commit()
+    return stats, computed_at
+
+
+def mark_user_stats_dirty():
+    """Called by user create/update/delete and miles changes; the next read recomputes"""
+    try:
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute('UPDATE user_stats SET changed_at = %s WHERE id = 1', (int(time.time()),))
+        db.commit()
+    except Exception as e:
+        print(f"Could not mark user stats dirty: {e}")
+
+
+def _refresh_in_background(app):
+    global _refreshing
+    try:
+        with app.app_context():
+            refresh_user_stats()
+    except Exception as e:
+        print(f"User stats refresh failed: {e}")
+    finally:
+        with _refreshing_lock:
+            _refreshing = False
+
+
+def schedule_refresh():
+    global _refreshing
+    with _refreshing_lock:
+        if _refreshing:
+            return False
+        _refreshing = True
+
+    app = current_app._get_current_object()
+    threading.Thread(target=_refresh_in_background, args=(app,), daemon=True).start()
+    return True
+
+
+def get_user_stats(force=False):
+    """Returns the stored snapshot with its freshness; stale snapshots are refreshed in the background"""
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute('SELECT data, computed_at, changed_at FROM user_stats WHERE id = 1')
+    row = cursor.fetchone()
+
+    if force or not row or not row['data']:
+        stats, computed_at = refresh_user_stats()
+        return dict(stats, computed_at=computed_at, stale=False)
+
+    stale = row['changed_at'] >= row['computed_at'] or time.time() - row['computed_at'] > USER_STATS_MAX_AGE
+    if stale:
+        schedule_refresh()
+
+    return dict(json.loads(row['data']), computed_at=row['computed_at'], stale=stale)
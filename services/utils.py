@@ -29,7 +29,11 @@ def get_current_user():
     if 'user_id' in session:
         db = get_db()
         cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE id = %s", (session['user_id'],))
+        cursor.execute('''
+            SELECT id, nickname, created_at, virtual_id, social_id, miles, user_group, subgroup, pfp_url
+            FROM users
+            WHERE id = %s
+        ''', (session['user_id'],))
         user = cursor.fetchone()
 
         if user:
@@ -41,7 +45,8 @@ def get_current_user():
                 "social_id": user['social_id'],
                 "miles": user['miles'],
                 "user_group": user['user_group'],
-                "subgroup": user['subgroup']
+                "subgroup": user['subgroup'],
+                "pfp": user['pfp_url'] or ""
             }
     return None
 
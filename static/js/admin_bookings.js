@@ -6,14 +6,31 @@ document.addEventListener('DOMContentLoaded', function () {
     loadBookings();
 });
 
-async function loadBookings(flightFilter = '') {
+let nextBookingsCursor = null;
+let loadedBookings = [];
+let currentFlightFilter = '';
+
+async function loadBookings(flightFilter = '', append = false) {
     const container = document.getElementById('bookingsContainer');
-    container.innerHTML = '<div class="loading">Loading bookings...</div>';
+
+    if (!append) {
+        currentFlightFilter = flightFilter;
+        nextBookingsCursor = null;
+        loadedBookings = [];
+        container.innerHTML = '<div class="loading">Loading bookings...</div>';
+    }
 
     try {
-        const url = flightFilter ?
-            `/admin/api/bookings?flight_number=${encodeURIComponent(flightFilter)}` :
-            '/admin/api/bookings';
+        const params = new URLSearchParams();
+        if (currentFlightFilter) {
+            params.set('flight_number', currentFlightFilter);
+        }
+        if (append && nextBookingsCursor) {
+            params.set('cursor', nextBookingsCursor);
+        }
+
+        const query = params.toString();
+        const url = query ? `/admin/api/bookings?${query}` : '/admin/api/bookings';
 
         const response = await fetch(url, {
             headers: {
@@ -31,8 +48,10 @@ async function loadBookings(flightFilter = '') {
             throw new Error('Failed to load bookings');
         }
 
-        const bookings = await response.json();
-        displayBookings(bookings);
+        const page = await response.json();
+        loadedBookings = loadedBookings.concat(page.bookings);
+        nextBookingsCursor = page.next_cursor;
+        displayBookings(loadedBookings, page.has_more);
 
     } catch (error) {
         console.error('Error loading bookings:', error);
@@ -40,7 +59,11 @@ async function loadBookings(flightFilter = '') {
     }
 }
 
-function displayBookings(bookings) {
+function loadMoreBookings() {
+    loadBookings(currentFlightFilter, true);
+}
+
+function displayBookings(bookings, hasMore = false) {
     const container = document.getElementById('bookingsContainer');
 
     if (bookings.length === 0) {
@@ -91,7 +114,11 @@ function displayBookings(bookings) {
             </div>
         </div>
         `;
-    }).join('');
+    }).join('') + (hasMore ? `
+        <button type="button" class="apply-btn load-more-btn" onclick="loadMoreBookings()">
+            <i class="fas fa-chevron-down"></i> Load more
+        </button>
+    ` : '');
 }
 
 function toggleBookingStatus(bookingId, status, button) {
@@ -166,6 +166,15 @@ async function processUserPayment() {
     }
 }
 
+// Same flight, amount, description and booking -> same key, so rerunning after a partial failure
+// replays the bookings that were already paid instead of paying them twice
+async function massPaymentKey(flightNumber, amount, description, bookingId) {
+    const raw = new TextEncoder().encode(`${flightNumber}|${amount}|${description}|${bookingId}`);
+    const digest = await crypto.subtle.digest('SHA-256', raw);
+    const hex = Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+    return `mass:${hex.slice(0, 59)}`;
+}
+
 async function processMassPayment() {
     const flightNumber = document.getElementById('flightNumber').value.trim();
     const amount = parseFloat(document.getElementById('massAmount').value);
@@ -199,16 +208,24 @@ async function processMassPayment() {
         processBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Processing...';
         processBtn.disabled = true;
 
-        const response = await fetch(`/admin/api/bookings?flight_number=${flightNumber}`);
-        if (!response.ok) {
-            throw new Error('Failed to load bookings');
-        }
+        const validBookings = [];
+        let cursor = null;
 
-        const bookings = await response.json();
+        do {
+            const params = new URLSearchParams({ flight_number: flightNumber, valid: '1', limit: '200' });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
 
-        const validBookings = bookings.filter(booking =>
-            booking.valid === true || booking.valid === 1
-        );
+            const response = await fetch(`/admin/api/bookings?${params.toString()}`);
+            if (!response.ok) {
+                throw new Error('Failed to load bookings');
+            }
+
+            const page = await response.json();
+            validBookings.push(...page.bookings);
+            cursor = page.next_cursor;
+        } while (cursor);
 
         console.log(`Found ${validBookings.length} valid bookings for flight ${flightNumber}`);
 
@@ -223,54 +240,50 @@ async function processMassPayment() {
         let errors = 0;
         const errorDetails = [];
 
+        const transactions = [];
         for (const booking of validBookings) {
-            try {
-                console.log('Processing booking:', booking.id);
-
-                const bookingDetailResponse = await fetch(`/admin/api/bookings/${booking.id}`);
-                if (!bookingDetailResponse.ok) {
-                    throw new Error(`Failed to get booking details for ${booking.id}`);
-                }
-
-                const bookingDetail = await bookingDetailResponse.json();
-                const userId = bookingDetail.user_id;
+            if (!booking.user_id) {
+                errors++;
+                errorDetails.push(`Booking ${booking.id}: No user ID`);
+                continue;
+            }
 
-                if (!userId) {
-                    console.warn(`No user_id found for booking ${booking.id}`);
-                    errors++;
-                    errorDetails.push(`Booking ${booking.id}: No user ID`);
-                    continue;
-                }
+            transactions.push({
+                user_id: booking.user_id,
+                booking_id: booking.id,
+                amount: amount,
+                description: `${description} - Flight ${flightNumber}`,
+                type: transactionType,
+                idempotency_key: await massPaymentKey(flightNumber, amount, description, booking.id)
+            });
+        }
 
-                const transactionResponse = await fetch('/api/post/transaction', {
+        for (let i = 0; i < transactions.length; i += 200) {
+            const chunk = transactions.slice(i, i + 200);
+            try {
+                const transactionResponse = await fetch('/api/post/transactions/bulk', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    body: JSON.stringify({
-                        user_id: userId,
-                        booking_id: booking.id,
-                        amount: amount,
-                        description: `${description} - Flight ${flightNumber}`,
-                        type: transactionType
-                    })
+                    body: JSON.stringify({ transactions: chunk })
                 });
 
                 const transactionResult = await transactionResponse.json();
 
                 if (transactionResponse.ok) {
-                    processed++;
-                    console.log(`✅ Processed ${actionType} for user ${userId}, booking ${booking.id}`);
+                    processed += chunk.length;
+                    console.log(`✅ Processed ${actionType} for ${chunk.length} bookings`);
                 } else {
-                    errors++;
-                    errorDetails.push(`Booking ${booking.id}: ${transactionResult.error || 'Transaction failed'}`);
-                    console.warn(`❌ Failed ${actionType} for booking ${booking.id}:`, transactionResult.error);
+                    errors += chunk.length;
+                    errorDetails.push(`Bookings ${i + 1}-${i + chunk.length}: ${transactionResult.error || 'Transaction failed'}`);
+                    console.warn(`❌ Failed ${actionType} for bookings ${i + 1}-${i + chunk.length}:`, transactionResult.error);
                 }
 
             } catch (error) {
-                errors++;
-                errorDetails.push(`Booking ${booking.id}: ${error.message}`);
-                console.error(`❌ Error processing booking ${booking.id}:`, error);
+                errors += chunk.length;
+                errorDetails.push(`Bookings ${i + 1}-${i + chunk.length}: ${error.message}`);
+                console.error(`❌ Error processing bookings ${i + 1}-${i + chunk.length}:`, error);
             }
         }
 
@@ -300,8 +313,16 @@ async function processMassPayment() {
     }
 }
 
-async function loadUserTransactions() {
-    const userId = document.getElementById('searchUserId').value.trim();
+let transactionsUserId = null;
+let transactionsCursor = null;
+let loadedTransactions = [];
+
+const transactionDateFormat = new Intl.DateTimeFormat(undefined, {
+    year: 'numeric', month: '2-digit', day: '2-digit', hour: '2-digit', minute: '2-digit', second: '2-digit'
+});
+
+async function loadUserTransactions(loadMore = false) {
+    const userId = loadMore ? transactionsUserId : document.getElementById('searchUserId').value.trim();
     if (!userId) {
         alert('Please enter user ID');
         return;
@@ -309,17 +330,29 @@ async function loadUserTransactions() {
 
     try {
         const container = document.getElementById('transactionsList');
-        container.innerHTML = '<div class="loading">Loading transactions...</div>';
+        if (!loadMore) {
+            transactionsUserId = userId;
+            transactionsCursor = null;
+            loadedTransactions = [];
+            container.innerHTML = '<div class="loading">Loading transactions...</div>';
+        }
+
+        const params = new URLSearchParams({ limit: '50' });
+        if (transactionsCursor) {
+            params.set('cursor', transactionsCursor);
+        }
 
-        const response = await fetch(`/api/get/transactions/user/${userId}`);
+        const response = await fetch(`/api/get/transactions/user/${userId}?${params.toString()}`);
 
         if (!response.ok) {
             const errorData = await response.json();
             throw new Error(errorData.error || 'Failed to load transactions');
         }
 
-        const transactions = await response.json();
-        displayTransactions(transactions);
+        const page = await response.json();
+        loadedTransactions.push(...page.transactions);
+        transactionsCursor = page.next_cursor;
+        displayTransactions(loadedTransactions, page.has_more);
 
     } catch (error) {
         console.error('Load transactions error:', error);
@@ -328,7 +361,7 @@ async function loadUserTransactions() {
     }
 }
 
-function displayTransactions(transactions) {
+function displayTransactions(transactions, hasMore = false) {
     const container = document.getElementById('transactionsList');
 
     if (transactions.length === 0) {
@@ -345,7 +378,7 @@ function displayTransactions(transactions) {
                 <div class="transaction-amount ${amount >= 0 ? 'amount-positive' : 'amount-negative'}">
                     ${amount >= 0 ? '+' : ''}$${amount.toFixed(2)}
                 </div>
-                <div class="transaction-date">${transaction.created_at_formatted}</div>
+                <div class="transaction-date">${transactionDateFormat.format(new Date(transaction.created_at * 1000))}</div>
             </div>
             <div class="transaction-details">
                 <div class="transaction-detail">
@@ -360,6 +393,10 @@ function displayTransactions(transactions) {
                     <span class="detail-label">Booking ID:</span>
                     <span>${transaction.booking_id || 'N/A'}</span>
                 </div>
+                <div class="transaction-detail">
+                    <span class="detail-label">Balance after:</span>
+                    <span>${transaction.balance_after !== null ? (transaction.balance_estimated ? '≈ ' : '') + transaction.balance_after.toLocaleString() : 'N/A'}</span>
+                </div>
                 <div class="transaction-detail">
                     <span class="detail-label">Admin:</span>
                     <span>${transaction.admin_nickname}</span>
@@ -367,7 +404,11 @@ function displayTransactions(transactions) {
             </div>
         </div>
         `;
-    }).join('');
+    }).join('') + (hasMore ? `
+        <button onclick="loadUserTransactions(true)" class="load-btn">
+            <i class="fas fa-chevron-down"></i> Load More
+        </button>
+    ` : '');
 }
 
 function resetForms() {
@@ -60,7 +60,7 @@ function renderTeamTable() {
             <td>
                 <div style="display: flex; align-items: center; gap: 10px;">
                     ${member.image ?
-            `<img src="${member.image}" alt="${member.name}" style="width: 40px; height: 40px; border-radius: 50%; object-fit: cover;">` :
+            `<img src="${member.image_thumb || member.image}" alt="${member.name}" style="width: 40px; height: 40px; border-radius: 50%; object-fit: cover;">` :
             `<div style="width: 40px; height: 40px; border-radius: 50%; background: #2d5cc4; display: flex; align-items: center; justify-content: center;">
                             <i class="fas fa-user" style="color: #8fa3d8;"></i>
                         </div>`
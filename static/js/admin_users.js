@@ -1,6 +1,8 @@
 
 let currentPage = 1;
 const perPage = 20;
+// pageCursors[n] is the cursor that loads page n + 1
+let pageCursors = [null];
 let currentUserId = null;
 
 document.addEventListener('DOMContentLoaded', function () {
@@ -52,10 +54,16 @@ function displayStats(stats) {
             <div class="stat-value">${stats.total_miles}</div>
             <div class="stat-label">Total Miles</div>
         </div>
+        <div class="stats-updated">
+            Updated ${new Date(stats.computed_at * 1000).toLocaleString()}${stats.stale ? ' · refreshing…' : ''}
+        </div>
     `;
 }
 
 async function loadUsers(page = 1) {
+    if (page === 1) {
+        pageCursors = [null];
+    }
     currentPage = page;
     const container = document.getElementById('usersContainer');
     container.innerHTML = '<div class="loading">Loading users...</div>';
@@ -65,9 +73,10 @@ async function loadUsers(page = 1) {
     const status = document.getElementById('statusFilter').value;
 
     try {
+        const cursor = pageCursors[page - 1];
         const params = new URLSearchParams({
-            page: page,
             per_page: perPage,
+            ...(cursor && { cursor: cursor }),
             ...(search && { search: search }),
             ...(group && { group: group }),
             ...(status && { status: status })
@@ -79,6 +88,7 @@ async function loadUsers(page = 1) {
         }
 
         const data = await response.json();
+        pageCursors[page] = data.next_cursor;
         displayUsers(data);
 
     } catch (error) {
@@ -135,7 +145,7 @@ function displayUsers(data) {
         <span class="pagination-info">
             Page ${currentPage} of ${data.total_pages}
         </span>
-        <button onclick="loadUsers(${currentPage + 1})" ${currentPage >= data.total_pages ? 'disabled' : ''}>
+        <button onclick="loadUsers(${currentPage + 1})" ${!data.has_more ? 'disabled' : ''}>
             Next <i class="fas fa-chevron-right"></i>
         </button>
     `;
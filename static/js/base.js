@@ -118,6 +118,13 @@ function closeMobileMenu() {
     toggleButton.querySelector('i').className = 'fas fa-bars';
 }
 
+function clearUserCaches() {
+    // Cached boarding passes belong to the passenger who is logging out
+    if ('serviceWorker' in navigator && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage({ type: 'clear-user-caches' });
+    }
+}
+
 async function logout() {
     try {
         const response = await fetch('/api/auth/logout', {
@@ -128,6 +135,7 @@ async function logout() {
         });
 
         if (response.ok) {
+            clearUserCaches();
             window.location.href = '/';
         }
     } catch (error) {
@@ -82,7 +82,10 @@ function renderFleet() {
         <div class="fleet-card">
             <div class="fleet-image">
                 ${aircraft.image ?
-            `<img src="${aircraft.image}" alt="${aircraft.name}" loading="lazy">` :
+            `<picture>
+                ${aircraft.image_webp ? `<source srcset="${aircraft.image_webp}" type="image/webp">` : ''}
+                <img src="${aircraft.image}" alt="${aircraft.name}" loading="lazy">
+            </picture>` :
             `<div class="placeholder"><i class="fas fa-plane"></i></div>`
         }
             </div>
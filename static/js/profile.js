@@ -206,6 +206,7 @@ document.getElementById('logoutBtn').addEventListener('click', async function ()
             });
 
             if (response.ok) {
+                clearUserCaches();
                 window.location.href = '/';
             } else {
                 alert('Failed to logout');
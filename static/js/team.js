@@ -83,7 +83,7 @@ function renderTeam() {
         <div class="team-card">
             <div class="team-image">
                 ${member.image ?
-            `<img src="${member.image}" alt="${member.name}" loading="lazy">` :
+            `<img src="${member.image_thumb || member.image}" alt="${member.name}" loading="lazy">` :
             `<div class="placeholder"><i class="fas fa-user"></i></div>`
         }
             </div>